@@ -1,13 +1,22 @@
 import argparse
+import inspect
 import os
 import sys
+from pathlib import Path
 
 # Import main functions from the modules
-from icfree.sampler import main as sampler_main
-from icfree.plate_designer import main as plate_designer_main
-from icfree.instructor import main as instructor_main
+from icfree.sampler import main as sampler_main, generate_lhs_samples, write_samples
+from icfree.plate_designer import main as plate_designer_main, design_plates, write_output_files
+from icfree.instructor import main as instructor_main, stack_destination_plates, stream_instruction_files
+from icfree.cache import run_step
+from icfree.plate import Plate
 
-def generate_snakefile(args):
+# Code of each step, part of its cache key
+SAMPLER_CODE = [inspect.getsourcefile(sampler_main)]
+PLATE_DESIGNER_CODE = [inspect.getsourcefile(plate_designer_main), inspect.getsourcefile(Plate)]
+INSTRUCTOR_CODE = [inspect.getsourcefile(instructor_main)] + PLATE_DESIGNER_CODE
+
+def generate_snakefile(args, snakefile='Snakefile'):
     output_folder = args.plate_designer_output_folder
     os.makedirs(output_folder, exist_ok=True)
 
@@ -67,46 +76,88 @@ rule INSTRUCTOR:
         max_transfer_volume={args.instructor_max_transfer_volume},
         split_threshold={args.instructor_split_threshold},
         source_plate_type="{args.instructor_source_plate_type}",
-        split_components="{args.instructor_split_components}"
+        split_components="{args.instructor_split_components}",
+        default_dead_volume={args.plate_designer_default_dead_volume},
+        dead_volumes="{args.plate_designer_dead_volumes}"
     shell:
-        "python -m icfree.instructor {{input.source_plate}} {{input.destination_plate}} {{output.instructions}} --max_transfer_volume {{params.max_transfer_volume}} --split_threshold {{params.split_threshold}} --source_plate_type '{{params.source_plate_type}}' --split_components '{{params.split_components}}'"
+        "python -m icfree.instructor {{input.source_plate}} {{input.destination_plate}} {{output.instructions}} --max_transfer_volume {{params.max_transfer_volume}} --split_threshold {{params.split_threshold}} --source_plate_type '{{params.source_plate_type}}' --split_components '{{params.split_components}}' --default_dead_volume {{params.default_dead_volume}} --dead_volumes '{{params.dead_volumes}}'"
     """
-    with open('Snakefile', 'w') as file:
+    with open(snakefile, 'w') as file:
         file.write(snakefile_content)
 
 def run_snakemake(args):
-    # Simulating Snakemake workflow by directly calling the main functions
+    # Simulating Snakemake workflow by directly calling the step functions, results being passed in memory
+    # Each step is skipped, its outputs restored, when its inputs, code and parameters are cached
+    cache_dir = None if getattr(args, 'no_cache', False) else getattr(args, 'cache_dir', None)
+    write_intermediate = getattr(args, 'write_intermediate', False)
+    output_folder = args.plate_designer_output_folder
 
     # SAMPLER
-    sampler_main(args.sampler_input_filename, args.plate_designer_sampling_file, args.sampler_nb_samples, args.sampler_step, args.sampler_seed)
+    sampler_params = {
+        'nb_samples': args.sampler_nb_samples,
+        'step': args.sampler_step,
+        'seed': args.sampler_seed,
+        'output': args.plate_designer_sampling_file if write_intermediate else None,
+    }
+    def sample():
+        samples_df = generate_lhs_samples(args.sampler_input_filename, args.sampler_nb_samples,
+                                          step=args.sampler_step, seed=args.sampler_seed)
+        if write_intermediate:
+            write_samples([samples_df], args.plate_designer_sampling_file)
+            print(f"Generated {len(samples_df)} samples and saved to {args.plate_designer_sampling_file}")
+        else:
+            print(f"Generated {len(samples_df)} samples")
+        return samples_df
+    _, _, samples_df = run_step(
+        cache_dir, 'SAMPLER', [args.sampler_input_filename] + SAMPLER_CODE, sampler_params,
+        [args.plate_designer_sampling_file] if write_intermediate else [], sample
+    )
     
     # PLATE_DESIGNER
-    plate_designer_main(
-        args.plate_designer_sampling_file,
-        args.plate_designer_sample_volume,
-        args.plate_designer_start_well_src_plt,
-        args.plate_designer_start_well_dst_plt,
-        "16x24",  # Assuming default plate dimensions
-        args.plate_designer_well_capacity,
-        args.plate_designer_default_well_capacity,
-        args.plate_designer_dead_volumes,
-        args.plate_designer_default_dead_volume,
-        args.plate_designer_num_replicates,
-        args.plate_designer_output_folder
+    plate_designer_params = {
+        'sample_volume': args.plate_designer_sample_volume,
+        'start_well_src_plt': args.plate_designer_start_well_src_plt,
+        'start_well_dst_plt': args.plate_designer_start_well_dst_plt,
+        'plate_dims': "16x24",  # Assuming default plate dimensions
+        'well_capacity': args.plate_designer_well_capacity,
+        'default_well_capacity': args.plate_designer_default_well_capacity,
+        'dead_volumes': args.plate_designer_dead_volumes,
+        'default_dead_volume': args.plate_designer_default_dead_volume,
+        'num_replicates': args.plate_designer_num_replicates,
+    }
+    def design():
+        source_data, destination_data = design_plates(samples_df, **plate_designer_params)
+        output_files = []
+        if write_intermediate:
+            os.makedirs(output_folder, exist_ok=True)
+            output_files = write_output_files(source_data, destination_data, Path(output_folder))
+        return source_data, destination_data, output_files
+    _, _, (source_data, destination_data, _) = run_step(
+        cache_dir, 'PLATE_DESIGNER', [samples_df] + PLATE_DESIGNER_CODE,
+        dict(plate_designer_params, output_folder=output_folder if write_intermediate else None),
+        lambda result: result[2], design
     )
     
     # INSTRUCTOR
-    instructor_main(
-        f"{args.plate_designer_output_folder}/source_plate.csv",
-        f"{args.plate_designer_output_folder}/destination_plate.csv",
-        args.instructor_output_filename,
-        args.instructor_source_plate_type,
-        args.instructor_max_transfer_volume,
-        args.instructor_split_threshold,
-        args.instructor_split_components
+    instructor_params = {
+        'source_plate_type': args.instructor_source_plate_type,
+        'max_transfer_volume': args.instructor_max_transfer_volume,
+        'split_threshold': args.instructor_split_threshold,
+        # Components spread over several source plates are shared as the designer sized their wells
+        'dead_volumes': args.plate_designer_dead_volumes,
+        'default_dead_volume': args.plate_designer_default_dead_volume,
+    }
+    def instruct():
+        # Streamed block by block; designs spanning several destination plates get one run per source plate
+        return stream_instruction_files(source_data, stack_destination_plates(destination_data), args.instructor_output_filename,
+                                        args.instructor_split_components, len(destination_data) > 1, **instructor_params)
+    run_step(
+        cache_dir, 'INSTRUCTOR', [source_data, destination_data] + INSTRUCTOR_CODE,
+        dict(instructor_params, output_file=args.instructor_output_filename, split_components=args.instructor_split_components),
+        lambda output_files: output_files, instruct
     )
 
-def main():
+def build_parser():
     parser = argparse.ArgumentParser(description="Generate and run a Snakemake workflow based on user parameters.")
     parser.add_argument('--sampler_input_filename', required=True, help="Input filename for the SAMPLER step.")
     parser.add_argument('--sampler_nb_samples', default=100, type=int, help="Number of samples (default: 100).")
@@ -127,8 +178,18 @@ def main():
     parser.add_argument('--instructor_split_threshold', default=580, type=int, help="Split threshold (default: 580).")
     parser.add_argument('--instructor_source_plate_type', default="default:384PP_AQ_GP3", help="Source plate type for the INSTRUCTOR (default: 'default:384PP_AQ_GP3').")
     parser.add_argument('--instructor_split_components', default="", help="Split components for the INSTRUCTOR (default: '').")
+    parser.add_argument('--cache_dir', default=".icfree_cache", help="Cache directory: steps whose input files, code and parameters are unchanged are skipped and their outputs restored (default: '.icfree_cache').")
+    parser.add_argument('--no_cache', action='store_true', help="Always run every step.")
+    parser.add_argument('--write_intermediate', action='store_true', help="Also write the sampling file and the plate files; steps otherwise hand their results over in memory.")
+    return parser
+
+def main():
+    # python -m icfree campaign <manifest> runs the plates of a campaign in parallel
+    if sys.argv[1:2] == ['campaign']:
+        from icfree.campaign import main as campaign_main
+        sys.exit(campaign_main(sys.argv[2:]))
     
-    args = parser.parse_args()
+    args = build_parser().parse_args()
     
     generate_snakefile(args)
     
@@ -0,0 +1,210 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import pandas as pd
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """
+    SHA-256 digest of the contents of a file.
+
+    Args:
+        path (str): Path to the file.
+        chunk_size (int): Number of bytes read at a time.
+
+    Returns:
+        str: Hexadecimal digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def data_digest(data):
+    """
+    SHA-256 digest of the contents of an input of a step: a file, a DataFrame (values,
+    index, columns and dtypes), or a list or tuple of them.
+
+    Args:
+        data (str, pd.DataFrame, list or tuple): Path to a file, or data.
+
+    Returns:
+        str: Hexadecimal digest.
+    """
+    if isinstance(data, (list, tuple)):
+        return hashlib.sha256(''.join(data_digest(item) for item in data).encode()).hexdigest()
+    if isinstance(data, pd.DataFrame):
+        digest = hashlib.sha256(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+        digest.update(json.dumps([list(map(str, data.columns)), list(map(str, data.dtypes))]).encode())
+        return digest.hexdigest()
+    return file_digest(data)
+
+
+def step_key(step, inputs, params):
+    """
+    Key of a pipeline step: digest of its name, the contents of its inputs and its parameters.
+
+    Inputs are keyed by contents only, so renaming or touching input files does not change
+    the key; output paths belong to the parameters.
+
+    Args:
+        step (str): Name of the step (e.g., 'SAMPLER').
+        inputs (list): Inputs of the step (see data_digest): paths to files, including its code, or DataFrames.
+        params (dict): Parameters of the step, JSON-serializable (or converted with str).
+
+    Returns:
+        str: Hexadecimal key.
+    """
+    payload = {
+        'step': step,
+        'inputs': [data_digest(data) for data in inputs],
+        'params': params,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _object_path(cache_dir, digest):
+    return os.path.join(cache_dir, 'objects', digest[:2], digest)
+
+
+def _entry_path(cache_dir, key):
+    return os.path.join(cache_dir, 'steps', f"{key}.json")
+
+
+def lookup(cache_dir, key):
+    """
+    Outputs recorded for a step key.
+
+    Args:
+        cache_dir (str): Cache directory.
+        key (str): Step key (see step_key).
+
+    Returns:
+        dict: 'outputs', the digest of each output file by path, and 'result', the digest of
+        the pickled result of the step (None if it returned nothing), or None if the key
+        is not cached or some of its outputs are missing from the cache.
+    """
+    try:
+        with open(_entry_path(cache_dir, key)) as f:
+            entry = json.load(f)
+        digests = list(entry['outputs'].values()) + ([entry['result']] if entry.get('result') else [])
+    except (OSError, ValueError, KeyError, AttributeError):
+        return None
+    if not all(os.path.exists(_object_path(cache_dir, digest)) for digest in digests):
+        return None
+    return entry
+
+
+def _store_object(cache_dir, path, digest):
+    object_path = _object_path(cache_dir, digest)
+    if not os.path.exists(object_path):
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        # Unique temporary name: steps of several processes may share the cache
+        temp_path = f"{object_path}.{os.getpid()}.tmp"
+        shutil.copyfile(path, temp_path)
+        os.replace(temp_path, object_path)
+
+
+def store(cache_dir, key, output_files, result=None):
+    """
+    Record the outputs of a step: their contents are stored once per digest.
+
+    Args:
+        cache_dir (str): Cache directory.
+        key (str): Step key (see step_key).
+        output_files (list): Paths to the output files of the step.
+        result (object): Result of the step, pickled (optional).
+
+    Returns:
+        dict: Entry of the step (see lookup).
+    """
+    outputs = {}
+    for path in output_files:
+        outputs[path] = file_digest(path)
+        _store_object(cache_dir, path, outputs[path])
+    entry = {'outputs': outputs, 'result': None}
+    os.makedirs(os.path.join(cache_dir, 'steps'), exist_ok=True)
+    if result is not None:
+        result_path = os.path.join(cache_dir, 'steps', f"{key}.pickle.{os.getpid()}.tmp")
+        with open(result_path, 'wb') as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        entry['result'] = file_digest(result_path)
+        _store_object(cache_dir, result_path, entry['result'])
+        os.remove(result_path)
+    entry_path = _entry_path(cache_dir, key)
+    with open(f"{entry_path}.{os.getpid()}.tmp", 'w') as f:
+        json.dump(entry, f, indent=2)
+    os.replace(f"{entry_path}.{os.getpid()}.tmp", entry_path)
+    return entry
+
+
+def load_result(cache_dir, entry):
+    """
+    Unpickle the result of a step (see lookup), None if it returned nothing.
+    """
+    if not entry.get('result'):
+        return None
+    with open(_object_path(cache_dir, entry['result']), 'rb') as f:
+        return pickle.load(f)
+
+
+def materialize(cache_dir, outputs):
+    """
+    Restore the outputs of a step from the cache, leaving up-to-date files untouched.
+
+    Args:
+        cache_dir (str): Cache directory.
+        outputs (dict): Digest of each output file, by path (see lookup).
+
+    Returns:
+        list: Paths of the files restored.
+    """
+    restored = []
+    for path, digest in outputs.items():
+        if os.path.exists(path) and file_digest(path) == digest:
+            continue
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copyfile(_object_path(cache_dir, digest), path)
+        restored.append(path)
+    return restored
+
+
+def run_step(cache_dir, step, inputs, params, output_files, run):
+    """
+    Run a pipeline step unless its key is cached, in which case its outputs are restored.
+    
+    The outputs of a step are the files it declares, and the value returned by run,
+    e.g. DataFrames handed over to the next step in memory. Only the declared files are
+    cached, whatever else is written next to them while the step runs (logs...).
+    
+    Args:
+        cache_dir (str): Cache directory; the step always runs if None.
+        step (str): Name of the step (e.g., 'SAMPLER').
+        inputs (list): Inputs of the step (see data_digest): paths to files, including its code, or DataFrames.
+        params (dict): Parameters of the step.
+        output_files (list or callable): Paths of the files the step writes, or function of
+            the result of run returning them, when they depend on it.
+        run (callable): Function running the step, called without arguments.
+    
+    Returns:
+        tuple: True if the step was skipped, the paths of its output files (None if the step
+        ran without cache), and the result of run.
+    """
+    if cache_dir is None:
+        return False, None, run()
+    key = step_key(step, inputs, params)
+    entry = lookup(cache_dir, key)
+    if entry is not None:
+        restored = materialize(cache_dir, entry['outputs'])
+        print(f"{step}: up to date ({len(entry['outputs'])} output file(s), {len(restored)} restored from cache)")
+        return True, list(entry['outputs']), load_result(cache_dir, entry)
+    result = run()
+    if callable(output_files):
+        output_files = output_files(result)
+    entry = store(cache_dir, key, [str(path) for path in output_files], result)
+    return False, list(entry['outputs']), result
@@ -0,0 +1,172 @@
+import argparse
+import contextlib
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from icfree.__main__ import build_parser, generate_snakefile, run_snakemake
+from icfree.instructor import read_instructions
+
+# Options holding paths, relative to the manifest
+PATH_OPTIONS = ('sampler_input_filename', 'plate_designer_sampling_file', 'plate_designer_output_folder',
+                'instructor_output_filename', 'cache_dir')
+
+
+def read_manifest(manifest_file):
+    """
+    Read a campaign manifest (YAML, or JSON for a .json file).
+
+    The manifest lists the plates of the campaign under 'plates', each with the options of
+    `python -m icfree` (without the leading dashes) that differ from the shared ones, under
+    'defaults'. A plate may have a 'name' (plate<i> by default), used as its output folder
+    if plate_designer_output_folder is not given; the sampling and instructions files
+    default to sampling.csv and instructions.csv in its output folder. Relative paths are
+    relative to the manifest.
+
+    Args:
+        manifest_file (str): Path to the manifest.
+
+    Returns:
+        list: Name and options (dict) of each plate.
+
+    Raises:
+        ImportError: If the manifest is YAML and PyYAML is not installed.
+        ValueError: If the manifest has no plate, or an unknown option.
+    """
+    with open(manifest_file) as f:
+        if str(manifest_file).endswith('.json'):
+            manifest = json.load(f)
+        else:
+            try:
+                import yaml
+            except ImportError as e:
+                raise ImportError("Reading YAML manifests requires the 'pyyaml' package.") from e
+            manifest = yaml.safe_load(f)
+    manifest = manifest or {}
+    if not manifest.get('plates'):
+        raise ValueError(f"No plate in the campaign manifest {manifest_file}.")
+    options = {action.dest for action in build_parser()._actions} - {'help'}
+    folder = os.path.dirname(os.path.abspath(manifest_file))
+    plates = []
+    for i, plate in enumerate(manifest['plates'], 1):
+        plate_options = dict(manifest.get('defaults') or {}, **(plate or {}))
+        name = str(plate_options.pop('name', f"plate{i}"))
+        unknown = set(plate_options) - options
+        if unknown:
+            raise ValueError(f"Unknown option(s) for plate '{name}': {', '.join(sorted(unknown))}.")
+        plate_options.setdefault('plate_designer_output_folder', name)
+        for option in PATH_OPTIONS:
+            if option in plate_options:
+                plate_options[option] = os.path.join(folder, str(plate_options[option]))
+        output_folder = plate_options['plate_designer_output_folder']
+        plate_options.setdefault('plate_designer_sampling_file', os.path.join(output_folder, 'sampling.csv'))
+        plate_options.setdefault('instructor_output_filename', os.path.join(output_folder, 'instructions.csv'))
+        plate_options.setdefault('cache_dir', os.path.join(folder, '.icfree_cache'))
+        plates.append((name, plate_options))
+    names = [name for name, _ in plates]
+    folders = [plate_options['plate_designer_output_folder'] for _, plate_options in plates]
+    if len(set(names)) < len(names) or len(set(folders)) < len(folders):
+        raise ValueError("Plates of a campaign need distinct names and output folders.")
+    return plates
+
+
+def plate_args(options):
+    """
+    Parse the options of a plate (see read_manifest) as `python -m icfree` would.
+
+    Args:
+        options (dict): Options of the plate, without the leading dashes.
+
+    Returns:
+        argparse.Namespace: Arguments of the plate.
+    """
+    argv = []
+    for option, value in options.items():
+        if isinstance(value, bool):
+            argv += [f"--{option}"] if value else []
+        elif value is not None:
+            argv += [f"--{option}", str(value)]
+    return build_parser().parse_args(argv)
+
+
+def run_plate(name, options):
+    """
+    Run the pipeline of a plate, its output and errors going to icfree.log in its output folder.
+
+    Args:
+        name (str): Name of the plate.
+        options (dict): Options of the plate (see read_manifest).
+
+    Returns:
+        dict: Summary of the run: plate name, status, time, output folder, number of transfers and error.
+    """
+    output_folder = options['plate_designer_output_folder']
+    os.makedirs(output_folder, exist_ok=True)
+    summary = {'Plate': name, 'Status': 'done', 'Seconds': 0.0, 'Output folder': output_folder,
+               'Transfers': None, 'Error': ''}
+    start = time.perf_counter()
+    with open(os.path.join(output_folder, 'icfree.log'), 'w') as log, \
+            contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        try:
+            args = plate_args(options)
+            generate_snakefile(args, os.path.join(output_folder, 'Snakefile'))
+            run_snakemake(args)
+            summary['Transfers'] = len(read_instructions(args.instructor_output_filename, args.instructor_split_components))
+        except (Exception, SystemExit) as e:
+            # Errors, including argument errors (SystemExit), stay with their plate; interrupts stop the campaign
+            traceback.print_exc()
+            summary['Status'] = 'failed'
+            summary['Error'] = f"{type(e).__name__}: {e}"
+    summary['Seconds'] = round(time.perf_counter() - start, 2)
+    return summary
+
+
+def run_campaign(manifest_file, n_jobs=None, summary_file=None):
+    """
+    Run the plates of a campaign in parallel, one process per plate.
+
+    Each plate writes to its own output folder, with its log; a failing plate does not
+    stop the others. Steps are cached in a cache directory shared by the plates (see
+    run_snakemake), .icfree_cache next to the manifest by default.
+
+    Args:
+        manifest_file (str): Path to the campaign manifest (see read_manifest).
+        n_jobs (int): Number of worker processes (one per plate, up to the number of cores, if None).
+        summary_file (str): Path to the summary table, <manifest>_summary.csv if None.
+
+    Returns:
+        pd.DataFrame: Summary of each plate (see run_plate).
+    """
+    plates = read_manifest(manifest_file)
+    if n_jobs is None:
+        n_jobs = min(len(plates), os.cpu_count() or 1)
+    if n_jobs == 1:
+        summaries = [run_plate(name, options) for name, options in plates]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            futures = [executor.submit(run_plate, name, options) for name, options in plates]
+            summaries = [future.result() for future in futures]
+    summary_df = pd.DataFrame(summaries).astype({'Transfers': 'Int64'})
+    summary_file = summary_file or f"{os.path.splitext(manifest_file)[0]}_summary.csv"
+    summary_df.to_csv(summary_file, index=False)
+    return summary_df
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m icfree campaign",
+                                     description="Run the plates of a campaign manifest in parallel.")
+    parser.add_argument('manifest', help="Campaign manifest (YAML or JSON): shared 'defaults' and per-plate options under 'plates'.")
+    parser.add_argument('--n_jobs', type=int, default=None, help="Number of worker processes (default: one per plate, up to the number of cores).")
+    parser.add_argument('--summary', default=None, help="Summary table file (default: <manifest>_summary.csv).")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    summary_df = run_campaign(args.manifest, args.n_jobs, args.summary)
+    print(summary_df.to_string(index=False))
+    num_failed = int((summary_df['Status'] == 'failed').sum())
+    print(f"{len(summary_df) - num_failed} plate(s) done, {num_failed} failed in {time.perf_counter() - start:.1f} s")
+    return 1 if num_failed else 0
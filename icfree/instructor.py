@@ -1,6 +1,11 @@
 import pandas as pd
+import numpy as np
 import argparse
 import os
+import shutil
+import tempfile
+from icfree.plate import well_indices, well_names
+from icfree.plate_designer import select_wells, parse_component_values
 
 def parse_plate_types(plate_types_str, default_type="384PP_AQ_GP3"):
     """
@@ -23,8 +28,263 @@ def parse_plate_types(plate_types_str, default_type="384PP_AQ_GP3"):
         plate_types["default"] = default_type
     return plate_types
 
+def plate_names(plate_df, prefix):
+    """
+    Returns the plate name of each row of plate data: <prefix>[i] from its 'Plate' column,
+    or <prefix>[1] when there is no such column.
+    """
+    if 'Plate' not in plate_df.columns:
+        return pd.Series(f"{prefix}[1]", index=plate_df.index, dtype=object)
+    return prefix + '[' + plate_df['Plate'].astype(str) + ']'
+
+def read_destination_plates(destination_plate_file):
+    """
+    Reads a destination plate file, or a manifest of destination plate files (see
+    plate_designer), in which case the plates are stacked with their number in a 'Plate' column.
+    
+    Parameters:
+    - destination_plate_file: Path to a destination plate file, or to a manifest with 'Plate'
+      and 'File' columns, files being relative to the manifest.
+    
+    Returns:
+    - DataFrame containing destination plate data.
+    """
+    destination_plate_df = pd.read_csv(destination_plate_file)
+    if 'File' not in destination_plate_df.columns:
+        return destination_plate_df
+    folder = os.path.dirname(destination_plate_file)
+    plates = [
+        pd.read_csv(os.path.join(folder, file)).assign(Plate=plate)
+        for plate, file in zip(destination_plate_df['Plate'], destination_plate_df['File'])
+    ]
+    # Components missing from a plate are not dispensed in it
+    return pd.concat(plates, ignore_index=True).fillna(0)
+
+def source_pools(source_plate_df, component, dead_volume=15000):
+    """
+    Returns the pools of source wells of a component, one per source plate holding it:
+    Source[1], or Source[i] when the source plate file has a 'Plate' column (see
+    plate_designer), a component larger than a plate spilling over several plates.
+    
+    Parameters:
+    - source_plate_df: DataFrame containing source plate data.
+    - component: Name of the component.
+    - dead_volume: Dead volume of the wells of the component.
+    
+    Returns:
+    - Lists of the plate names, of the wells ('A1', or '{A1;B1}' for several wells) and
+      of the usable volumes (volume minus dead volume of each well) of the pools, in plate order.
+    
+    Raises:
+    - ValueError: If no source well holds the component.
+    """
+    if component not in source_plate_df.columns:
+        raise ValueError(f"Component '{component}' is not in the source plate.")
+    held = source_plate_df[source_plate_df[component] > 0]
+    if held.empty:
+        raise ValueError(f"No source well holds component '{component}'.")
+    names, wells, usable = [], [], []
+    for name, pool in held.groupby(plate_names(held, 'Source'), sort=False):
+        names.append(name)
+        wells.append("{%s}" % ";".join(pool['Well']) if len(pool) > 1 else pool['Well'].iloc[0])
+        usable.append(float(np.clip(pool[component].to_numpy(dtype=float) - dead_volume, 0, None).sum()))
+    return names, wells, usable
+
+def plan_transfers(instructions_df, max_transfer_volume=None, split_threshold=None, droplet_volume=2.5):
+    """
+    Plans the fewest transfers for each (source, destination, component), with balanced chunks.
+    
+    Transfers sharing a source plate and well, a destination well and a component are
+    merged. A merged volume up to split_threshold stays a single transfer; above it, it
+    is split into the fewest chunks of at most max(max_transfer_volume, split_threshold)
+    (the largest transfer the threshold-based splitting can produce), in whole droplets,
+    their sizes differing by at most one droplet. No transfer is thus smaller than needed,
+    and the count never exceeds that of generate_echo_instructions.
+    
+    Parameters:
+    - instructions_df: DataFrame of instructions (see generate_echo_instructions).
+    - max_transfer_volume: Maximum volume for a single transfer, if specified.
+    - split_threshold: Volume threshold above which transfers need to be split, if specified.
+    - droplet_volume: Volume of a droplet, in nL; chunks are whole numbers of droplets.
+    
+    Returns:
+    - DataFrame of planned instructions, in order of first occurrence.
+    - Dictionary with the number of transfers before and after planning and the number saved.
+    """
+    keys = [column for column in instructions_df.columns if column != 'Transfer Volume']
+    merged = instructions_df.groupby(keys, sort=False, as_index=False)['Transfer Volume'].sum()
+    merged = merged[instructions_df.columns]
+    volumes = merged['Transfer Volume'].to_numpy(dtype=float)
+    
+    if max_transfer_volume is None or split_threshold is None:
+        num_chunks = np.ones(len(merged), dtype=np.int64)
+    else:
+        max_droplets = max(int(max(max_transfer_volume, split_threshold) // droplet_volume), 1)
+        droplets = np.floor(volumes / droplet_volume + 1e-9).astype(np.int64)
+        num_chunks = np.where(volumes > split_threshold, np.maximum(-(-droplets // max_droplets), 1), 1)
+    
+    # Balanced chunks: the first (droplets % n) chunks take one more droplet, the last one any fraction of a droplet
+    rows = np.repeat(np.arange(len(merged)), num_chunks)
+    chunks = np.arange(rows.size) - np.repeat(np.cumsum(num_chunks) - num_chunks, num_chunks)
+    if max_transfer_volume is None or split_threshold is None:
+        chunk_volumes = volumes[rows]
+    else:
+        base, extra = np.divmod(droplets, num_chunks)
+        fractions = volumes - droplets * droplet_volume
+        chunk_volumes = (base[rows] + (chunks < extra[rows])) * droplet_volume
+        chunk_volumes = np.where(chunks == num_chunks[rows] - 1, chunk_volumes + fractions[rows], chunk_volumes)
+    
+    planned_df = merged.iloc[rows].reset_index(drop=True)
+    planned_df['Transfer Volume'] = chunk_volumes
+    report = {
+        'transfers_before': len(instructions_df),
+        'transfers_after': len(planned_df),
+        'transfers_saved': len(instructions_df) - len(planned_df),
+    }
+    return planned_df, report
+
+def split_transfer_counts(volumes, max_transfer_volume=None, split_threshold=None):
+    """
+    Number of full-size chunks of each transfer, and volume left for a last chunk.
+    
+    A transfer above split_threshold gives chunks of max_transfer_volume, drawn while
+    the remaining volume is above split_threshold (the last of them holding all of the
+    remaining volume if it is below max_transfer_volume), and a last chunk with what is
+    left, if anything.
+    
+    Parameters:
+    - volumes: Array of transfer volumes.
+    - max_transfer_volume: Maximum volume for a single transfer, if specified.
+    - split_threshold: Volume threshold above which transfers need to be split, if specified.
+    
+    Returns:
+    - Arrays of the number of chunks drawn above the threshold and of the volume left.
+    """
+    if max_transfer_volume is None or split_threshold is None:
+        return np.zeros(len(volumes), dtype=np.int64), volumes
+    # Number of i >= 0 such that volume - i * max_transfer_volume > split_threshold
+    counts = np.maximum(np.ceil((volumes - split_threshold) / max_transfer_volume), 0).astype(np.int64)
+    # Guard the division against rounding
+    counts -= (counts > 0) & (volumes - (counts - 1) * max_transfer_volume <= split_threshold)
+    counts += volumes - counts * max_transfer_volume > split_threshold
+    return counts, volumes - counts * max_transfer_volume
+
+INSTRUCTION_COLUMNS = ['Source Plate Name', 'Source Plate Type', 'Source Well', 'Destination Plate Name',
+                       'Destination Well', 'Transfer Volume', 'Sample ID']
+
+# Destination transfers per block of streamed instructions (see iter_echo_instructions)
+BLOCK_SIZE = 10000
+
+def iter_echo_instructions(source_plate_df, destination_plate_df, source_plate_types,
+                           max_transfer_volume=None, split_threshold=None, dispense_order=None, block_size=BLOCK_SIZE,
+                           dead_volumes=None, default_dead_volume=15000):
+    """
+    Generates ECHO liquid handler instructions block by block, one component at a time.
+    
+    The destination plate is melted once into one row per (well, component) transfer,
+    the source wells, plate name and plate type of each component are looked up once,
+    and split transfers are expanded with np.repeat, block_size destination transfers
+    at a time. Destination plate data stacking several plates (see
+    read_destination_plates) is handled in the same pass, the transfers of plate i
+    going to Destination[i]. Components are checked against the source plate before
+    the first block is yielded.
+    
+    A component held by several source plates (see source_pools) is drawn from one
+    plate after the other, in instruction order, each plate up to the usable volume of
+    its wells; a transfer straddling the end of a plate is split between the two plates.
+    
+    Parameters:
+    - source_plate_df: DataFrame containing source plate data.
+    - destination_plate_df: DataFrame containing destination plate data.
+    - source_plate_types: Dictionary specifying the source plate type per component or a default type.
+    - max_transfer_volume: Maximum volume for a single transfer, if specified.
+    - split_threshold: Volume threshold above which transfers need to be split, if specified.
+    - dispense_order: List of component names dispensed first, in this order (see reorder_by_dispense_order).
+    - block_size: Maximum number of destination transfers, before splitting, per block.
+    - dead_volumes: Dictionary of dead volumes for specific components (optional).
+    - default_dead_volume: Dead volume of the source wells of other components.
+    
+    Yields:
+    - DataFrames of instructions, by component (in dispense order, then sorted by component
+      name), then in destination plate order.
+    """
+    id_columns = [col for col in ['Well', 'Plate'] if col in destination_plate_df.columns]
+    component_columns = [col for col in destination_plate_df.columns if col not in id_columns]
+    transfers = destination_plate_df.assign(**{'Destination Plate Name': plate_names(destination_plate_df, 'Destination')})
+    transfers = transfers.melt(id_vars=id_columns + ['Destination Plate Name'], value_vars=component_columns,
+                               var_name='Sample ID', value_name='Transfer Volume')
+    transfers = transfers[transfers['Transfer Volume'] > 0]
+    
+    # Components in dispense order, then by name
+    positions = transfers.groupby('Sample ID', sort=False).indices
+    order_mapping = {component: i for i, component in enumerate(dispense_order or [])}
+    components = sorted(positions, key=lambda component: (order_mapping.get(component, len(order_mapping)), component))
+    
+    # Source plates, wells and usable volumes of each component, once
+    dead_volumes = dead_volumes or {}
+    pools = {
+        component: source_pools(source_plate_df, component, dead_volumes.get(component, default_dead_volume))
+        for component in components
+    }
+    
+    volumes = transfers['Transfer Volume'].to_numpy()
+    destination_wells = transfers['Well'].to_numpy()
+    destination_plates = transfers['Destination Plate Name'].to_numpy(dtype=object)
+    for component in components:
+        plate_type = source_plate_types.get(component, source_plate_types.get("default"))
+        pool_names, pool_wells, pool_usable = (np.asarray(values, dtype=object) for values in pools[component])
+        pool_ends = np.cumsum(pool_usable.astype(float))
+        pool_starts = pool_ends - pool_usable.astype(float)
+        # The last plate takes any excess, which validation reports as an overdraw
+        pool_ends[-1] = np.inf
+        drawn = 0.0
+        for start in range(0, len(positions[component]), block_size):
+            block = positions[component][start:start + block_size]
+            # Expand split transfers: full-size chunks, then what is left
+            counts, remainders = split_transfer_counts(volumes[block], max_transfer_volume, split_threshold)
+            num_chunks = counts + (remainders > 0)
+            rows = block[np.repeat(np.arange(len(block)), num_chunks)]
+            chunks = np.arange(rows.size) - np.repeat(np.cumsum(num_chunks) - num_chunks, num_chunks)
+            if max_transfer_volume is None or split_threshold is None:
+                chunk_volumes = volumes[rows]
+            else:
+                chunk_counts = np.repeat(counts, num_chunks)
+                chunk_volumes = np.where(
+                    chunks < chunk_counts,
+                    np.minimum(volumes[rows] - chunks * max_transfer_volume, max_transfer_volume),
+                    np.repeat(remainders, num_chunks)
+                )
+            pool_ids = np.zeros(rows.size, dtype=np.int64)
+            if pool_names.size > 1 and rows.size:
+                # Draw from the plates one after the other, splitting transfers straddling two plates
+                ends = drawn + np.cumsum(chunk_volumes, dtype=float)
+                starts = ends - chunk_volumes
+                drawn = ends[-1]
+                first_pools = np.minimum(np.searchsorted(pool_ends, starts, side='right'), pool_names.size - 1)
+                last_pools = np.maximum(np.searchsorted(pool_ends, ends, side='left'), first_pools)
+                num_pieces = last_pools - first_pools + 1
+                pieces = np.repeat(np.arange(rows.size), num_pieces)
+                pool_ids = first_pools[pieces] + np.arange(pieces.size) - np.repeat(np.cumsum(num_pieces) - num_pieces, num_pieces)
+                piece_volumes = np.where(
+                    num_pieces[pieces] == 1, chunk_volumes[pieces],
+                    np.minimum(ends[pieces], pool_ends[pool_ids]) - np.maximum(starts[pieces], pool_starts[pool_ids])
+                )
+                keep = piece_volumes > 0
+                if chunk_volumes.dtype.kind in 'iu' and (piece_volumes == np.round(piece_volumes)).all():
+                    piece_volumes = piece_volumes.astype(chunk_volumes.dtype)
+                rows, pool_ids, chunk_volumes = rows[pieces][keep], pool_ids[keep], piece_volumes[keep]
+            yield pd.DataFrame({
+                "Source Plate Name": pool_names[pool_ids],
+                "Source Plate Type": np.full(rows.size, plate_type, dtype=object),
+                "Source Well": pool_wells[pool_ids],
+                "Destination Plate Name": destination_plates[rows],
+                "Destination Well": destination_wells[rows],
+                "Transfer Volume": chunk_volumes,
+                "Sample ID": np.full(rows.size, component, dtype=object),
+            })
+
 def generate_echo_instructions(source_plate_df, destination_plate_df, source_plate_types,
-                               max_transfer_volume=None, split_threshold=None):
+                               max_transfer_volume=None, split_threshold=None, dead_volumes=None, default_dead_volume=15000):
     """
     Generates ECHO liquid handler instructions considering multiple source wells for each component.
     Allows each component to have a specified source plate type, or a default if not specified.
@@ -35,62 +295,337 @@ def generate_echo_instructions(source_plate_df, destination_plate_df, source_pla
     - source_plate_types: Dictionary specifying the source plate type per component or a default type.
     - max_transfer_volume: Maximum volume for a single transfer, if specified.
     - split_threshold: Volume threshold above which transfers need to be split, if specified.
+    - dead_volumes: Dictionary of dead volumes for specific components, for components
+      spread over several source plates (optional).
+    - default_dead_volume: Dead volume of the source wells of other components.
     
     Returns:
-    - DataFrame containing all transfer instructions, grouped by component.
-    """
-    instructions = []
-    component_columns = [col for col in destination_plate_df.columns if col != 'Well']
-    
-    def split_volumes(source_well, dest_well, volume, component, plate_type):
-        """
-        Splits volumes greater than split_threshold into multiple instructions, each with a maximum of max_transfer_volume.
-        """
-        if max_transfer_volume is not None and split_threshold is not None:
-            while volume > split_threshold:
-                instructions.append({
-                    "Source Plate Name": "Source[1]",
-                    "Source Plate Type": plate_type,
-                    "Source Well": source_well,
-                    "Destination Plate Name": "Destination[1]",
-                    "Destination Well": dest_well,
-                    "Transfer Volume": min(volume, max_transfer_volume),
-                    "Sample ID": component
-                })
-                volume -= max_transfer_volume
-        if volume > 0:
-            instructions.append({
-                "Source Plate Name": "Source[1]",
-                "Source Plate Type": plate_type,
-                "Source Well": source_well,
-                "Destination Plate Name": "Destination[1]",
-                "Destination Well": dest_well,
-                "Transfer Volume": volume,
-                "Sample ID": component
-            })
+    - DataFrame containing all transfer instructions, grouped by component (sorted by
+      component name, then in destination plate order), see iter_echo_instructions.
+    """
+    blocks = list(iter_echo_instructions(source_plate_df, destination_plate_df, source_plate_types,
+                                         max_transfer_volume, split_threshold, dead_volumes=dead_volumes,
+                                         default_dead_volume=default_dead_volume))
+    if not blocks:
+        return pd.DataFrame({column: pd.Series(dtype=object) for column in INSTRUCTION_COLUMNS})
+    return pd.concat(blocks, ignore_index=True)
 
-    for _, dest_row in destination_plate_df.iterrows():
-        for component in component_columns:
-            volume = dest_row[component]
-            if volume > 0:
-                source_rows = source_plate_df[source_plate_df[component] > 0]
-                source_wells = "{%s}" % ";".join(source_rows["Well"]) if len(source_rows) > 1 else source_rows["Well"].iloc[0]
-                plate_type = source_plate_types.get(component, source_plate_types.get("default"))
-                if max_transfer_volume is not None and split_threshold is not None and volume > split_threshold:
-                    split_volumes(source_wells, dest_row["Well"], volume, component, plate_type)
-                else:
-                    instructions.append({
-                        "Source Plate Name": "Source[1]",
-                        "Source Plate Type": plate_type,
-                        "Source Well": source_wells,
-                        "Destination Plate Name": "Destination[1]",
-                        "Destination Well": dest_row["Well"],
-                        "Transfer Volume": volume,
-                        "Sample ID": component
-                    })
-
-    instructions_df = pd.DataFrame(instructions)
-    return instructions_df.groupby('Sample ID', as_index=False).apply(lambda x: x)
+def assign_source_wells(instructions_df, source_plate_df, dead_volumes=None, default_dead_volume=15000):
+    """
+    Assigns each transfer to a concrete source well, keeping a ledger of the volume drawn from each well.
+    
+    The usable volume of each source well (its volume minus its dead volume) is laid
+    out, component after component (and source plate after source plate for a component
+    spread over several plates, see source_pools), on one cumulative axis, and so are
+    the transfers, in instruction order. A transfer is drawn from the well its interval falls into,
+    wells being used up in source plate order; a transfer straddling the end of a well
+    is split, the rest of it falling over to the next well. The whole plate takes one
+    cumulative-sum and one searchsorted pass.
+    
+    Parameters:
+    - instructions_df: DataFrame of instructions (see generate_echo_instructions).
+    - source_plate_df: DataFrame containing source plate data.
+    - dead_volumes: Dictionary of dead volumes for specific components (optional).
+    - default_dead_volume: Dead volume of the wells of other components.
+    
+    Returns:
+    - DataFrame of instructions with one source well each, in the same order.
+    - DataFrame ledger with the 'Initial Volume', 'Drawn Volume' and 'Remaining Volume' of each
+      source well, and its 'Plate' if the source plate file has such a column.
+    
+    Raises:
+    - ValueError: If the source wells of a component do not hold enough usable volume.
+    """
+    dead_volumes = dead_volumes or {}
+    # Pools of source wells: one per component and source plate, in instruction order
+    pool_keys = instructions_df['Sample ID'].astype(str) + '\0' + instructions_df['Source Plate Name'].astype(str)
+    pools = list(dict.fromkeys(zip(instructions_df['Sample ID'], instructions_df['Source Plate Name'])))
+    components = [component for component, _ in pools]
+    
+    # Source wells of each pool, in source plate order, and their usable volumes
+    source_names = plate_names(source_plate_df, 'Source')
+    holds = [(source_plate_df[component] > 0) & (source_names == plate) for component, plate in pools]
+    ledger = pd.DataFrame({
+        'Well': np.concatenate([source_plate_df.loc[hold, 'Well'].to_numpy(dtype=object) for hold in holds] + [np.empty(0, dtype=object)]),
+        'Component': np.repeat(np.array(components, dtype=object), [int(hold.sum()) for hold in holds]),
+        'Initial Volume': np.concatenate([source_plate_df.loc[hold, component].to_numpy(dtype=float) for hold, component in zip(holds, components)] + [np.empty(0)]),
+    })
+    if 'Plate' in source_plate_df.columns:
+        ledger.insert(0, 'Plate', np.concatenate([source_plate_df.loc[hold, 'Plate'].to_numpy() for hold in holds] + [np.empty(0, dtype=np.int64)]))
+    dead = ledger['Component'].map(lambda component: dead_volumes.get(component, default_dead_volume)).to_numpy(dtype=float)
+    usable = np.clip(ledger['Initial Volume'].to_numpy(dtype=float) - dead, 0, None)
+    well_ends = np.cumsum(usable)
+    
+    # Usable volume of each pool on the cumulative axis
+    well_components = np.repeat(np.arange(len(pools)), [int(hold.sum()) for hold in holds])
+    component_ends = np.bincount(well_components, weights=usable, minlength=len(pools)).cumsum()
+    component_starts = component_ends - np.bincount(well_components, weights=usable, minlength=len(pools))
+    
+    # Interval of each transfer on the cumulative axis
+    transfer_components = pd.Series(range(len(pools)), index=list(dict.fromkeys(pool_keys)))[pool_keys].to_numpy()
+    volumes = instructions_df['Transfer Volume'].to_numpy(dtype=float)
+    drawn = instructions_df['Transfer Volume'].groupby(transfer_components).cumsum().to_numpy(dtype=float)
+    ends = component_starts[transfer_components] + drawn
+    starts = ends - volumes
+    shortfalls = np.bincount(transfer_components, weights=volumes, minlength=len(pools)) - (component_ends - component_starts)
+    if (shortfalls > 1e-9).any():
+        component, plate = pools[np.argmax(shortfalls > 1e-9)]
+        shortfall = shortfalls[np.argmax(shortfalls > 1e-9)]
+        on_plate = f" on {plate}" if 'Plate' in source_plate_df.columns else ""
+        raise ValueError(f"Source wells of component '{component}'{on_plate} lack {shortfall:g} nL of usable volume.")
+    
+    # Wells spanned by each transfer: one piece per well
+    first_wells = np.searchsorted(well_ends, starts, side='right')
+    last_wells = np.maximum(np.searchsorted(well_ends, ends, side='left'), first_wells)
+    num_pieces = last_wells - first_wells + 1
+    rows = np.repeat(np.arange(len(instructions_df)), num_pieces)
+    pieces = first_wells[rows] + np.arange(rows.size) - np.repeat(np.cumsum(num_pieces) - num_pieces, num_pieces)
+    well_starts = well_ends - usable
+    piece_volumes = np.minimum(ends[rows], well_ends[pieces]) - np.maximum(starts[rows], well_starts[pieces])
+    # Wells with no usable volume left get no piece
+    keep = (piece_volumes > 0) | (num_pieces[rows] == 1)
+    rows, pieces, piece_volumes = rows[keep], pieces[keep], piece_volumes[keep]
+    
+    assigned_df = instructions_df.iloc[rows].reset_index(drop=True)
+    assigned_df['Source Well'] = ledger['Well'].to_numpy()[pieces]
+    transfer_volumes = np.where(num_pieces[rows] == 1, volumes[rows], piece_volumes)
+    if instructions_df['Transfer Volume'].dtype.kind in 'iu' and (transfer_volumes == np.round(transfer_volumes)).all():
+        transfer_volumes = transfer_volumes.astype(instructions_df['Transfer Volume'].dtype)
+    assigned_df['Transfer Volume'] = transfer_volumes
+    
+    ledger['Drawn Volume'] = np.bincount(pieces, weights=piece_volumes, minlength=len(ledger))
+    ledger['Remaining Volume'] = ledger['Initial Volume'] - ledger['Drawn Volume']
+    return assigned_df, ledger
+
+VALIDATION_COLUMNS = ['Check', 'Plate', 'Well', 'Component', 'Expected Volume', 'Actual Volume']
+
+def validate_instructions(instructions_df, source_plate_df, destination_plate_df, dead_volumes=None,
+                          default_dead_volume=15000, tolerance=1e-6):
+    """
+    Replays instructions against the plate maps and reports the discrepancies.
+    
+    Transfers are summed per (source plate, source well, component) and per (destination
+    plate, destination well, component) with np.bincount on encoded indices: distinct
+    wells are factorized and decoded once, so a 100k-transfer file replays in well under
+    a second. A transfer from a pool of source wells ('{A1;B1}', see
+    generate_echo_instructions) draws from the summed usable volume of the pool.
+    
+    Parameters:
+    - instructions_df: DataFrame of instructions (see generate_echo_instructions).
+    - source_plate_df: DataFrame containing source plate data.
+    - destination_plate_df: DataFrame containing destination plate data.
+    - dead_volumes: Dictionary of dead volumes for specific components (optional).
+    - default_dead_volume: Dead volume of the wells of other components.
+    - tolerance: Volume difference, in nL, below which volumes are considered equal.
+    
+    Returns:
+    - DataFrame with one row per discrepancy, empty if the instructions are valid:
+      'source overdraw' (more than the usable volume drawn from a source well),
+      'source missing' (a source well not holding the component) and 'destination
+      volume' (a destination well not receiving its volume of a component).
+    """
+    dead_volumes = dead_volumes or {}
+    volumes = instructions_df['Transfer Volume'].to_numpy(dtype=float)
+    
+    # Source side: volume drawn per (source plate, source well, component)
+    source_codes, source_keys = pd.MultiIndex.from_arrays([
+        instructions_df['Source Plate Name'], instructions_df['Source Well'], instructions_df['Sample ID']
+    ]).factorize()
+    drawn = np.bincount(source_codes, weights=volumes, minlength=len(source_keys))
+    source_volumes = (
+        source_plate_df.assign(**{'Source Plate Name': plate_names(source_plate_df, 'Source')})
+        .melt(id_vars=['Source Plate Name', 'Well'], value_vars=[col for col in source_plate_df.columns if col not in ('Well', 'Plate')],
+              var_name='Component', value_name='Volume')
+        .groupby(['Source Plate Name', 'Well', 'Component'])['Volume'].sum()
+        .to_dict()
+    )
+    usable = np.zeros(len(source_keys))
+    held = np.zeros(len(source_keys), dtype=bool)
+    for key, (plate, wells, component) in enumerate(source_keys):
+        dead = dead_volumes.get(component, default_dead_volume)
+        for well in wells.strip('{}').split(';'):
+            volume = source_volumes.get((plate, well, component), 0)
+            usable[key] += max(volume - dead, 0)
+            held[key] |= volume > 0
+    overdrawn = held & (drawn > usable + tolerance)
+    flagged = ~held | overdrawn
+    
+    # Destination side: volume received per (destination plate, well, component), wells decoded once
+    expected = (
+        destination_plate_df.assign(**{'Destination Plate Name': plate_names(destination_plate_df, 'Destination')})
+        .melt(id_vars=['Destination Plate Name', 'Well'], value_vars=[col for col in destination_plate_df.columns if col not in ('Well', 'Plate')],
+              var_name='Component', value_name='Volume')
+    )
+    expected = expected[expected['Volume'] != 0]
+    # Expected volumes come first, then the transfers
+    plate_codes, destination_plates = pd.factorize(pd.concat([expected['Destination Plate Name'], instructions_df['Destination Plate Name']]))
+    well_codes, wells = pd.factorize(pd.concat([expected['Well'], instructions_df['Destination Well']]).str.strip().str.upper())
+    component_codes, components = pd.factorize(pd.concat([expected['Component'], instructions_df['Sample ID']]))
+    rows, cols = well_indices(wells)
+    num_rows, num_cols = rows.max(initial=0) + 1, cols.max(initial=0) + 1
+    codes = ((plate_codes * num_rows + rows[well_codes]) * num_cols + cols[well_codes]) * len(components) + component_codes
+    size = max(len(destination_plates), 1) * num_rows * num_cols * len(components)
+    expected_volumes = np.bincount(codes[:len(expected)], weights=expected['Volume'].to_numpy(dtype=float), minlength=size)
+    delivered = np.bincount(codes[len(expected):], weights=volumes, minlength=size)
+    mismatches = np.flatnonzero(np.abs(delivered - expected_volumes) > tolerance)
+    mismatch_plates, mismatch_rest = np.divmod(mismatches // len(components), num_rows * num_cols)
+    mismatch_rows, mismatch_cols = np.divmod(mismatch_rest, num_cols)
+    
+    discrepancies = [
+        pd.DataFrame({
+            'Check': np.where(held[flagged], 'source overdraw', 'source missing'),
+            'Plate': source_keys.get_level_values(0)[flagged],
+            'Well': source_keys.get_level_values(1)[flagged],
+            'Component': source_keys.get_level_values(2)[flagged],
+            'Expected Volume': usable[flagged],
+            'Actual Volume': drawn[flagged],
+        }),
+        pd.DataFrame({
+            'Check': 'destination volume',
+            'Plate': np.asarray(destination_plates, dtype=object)[mismatch_plates],
+            'Well': well_names(mismatch_rows, mismatch_cols),
+            'Component': np.asarray(components, dtype=object)[mismatches % len(components)],
+            'Expected Volume': expected_volumes[mismatches],
+            'Actual Volume': delivered[mismatches],
+        }),
+    ]
+    discrepancies = [df for df in discrepancies if len(df)]
+    if not discrepancies:
+        return pd.DataFrame({column: pd.Series(dtype=float if column.endswith('Volume') else object) for column in VALIDATION_COLUMNS})
+    return pd.concat(discrepancies, ignore_index=True)
+
+TRANSFER_ORDERS = ('serpentine', 'nearest')
+
+def _nearest_neighbour_order(rows, cols):
+    """
+    Greedy nearest-neighbour tour of well coordinates, starting from the first well in plate order.
+    
+    The Chebyshev distances between all the wells (at most one destination plate, e.g.
+    1536 wells) are computed at once, so that each step of the tour is a single argmin
+    over a row of the matrix, visited wells being masked column by column.
+    """
+    rows, cols = np.asarray(rows, dtype=np.int32), np.asarray(cols, dtype=np.int32)
+    order = np.empty(rows.size, dtype=np.int64)
+    if rows.size == 0:
+        return order
+    distances = np.maximum(np.abs(rows[:, None] - rows), np.abs(cols[:, None] - cols))
+    visited = distances.max() + 1
+    current = int(np.lexsort((cols, rows))[0])
+    for step in range(rows.size):
+        order[step] = current
+        distances[:, current] = visited
+        current = int(np.argmin(distances[current]))
+    return order
+
+def order_transfers(instructions_df, method='serpentine'):
+    """
+    Reorders transfers within each run of instructions sharing a source plate, a component
+    and a destination plate, to shorten the travel of the destination stage.
+    
+    The order of the runs is kept, so the component order (see reorder_by_dispense_order)
+    is unchanged; chunks of a split transfer stay together.
+    
+    Parameters:
+    - instructions_df: DataFrame of instructions.
+    - method: 'serpentine' to snake along destination rows (left to right on even rows,
+      right to left on odd rows) or along columns, whichever travels less, or 'nearest' for
+      a greedy nearest-neighbour tour of the destination wells (Chebyshev distance, both
+      stage axes moving at once).
+    
+    Returns:
+    - Reordered DataFrame, with a fresh index.
+    """
+    if method not in TRANSFER_ORDERS:
+        raise ValueError(f"Unknown transfer order '{method}'. Use one of {', '.join(TRANSFER_ORDERS)}.")
+    keys = instructions_df['Source Plate Name'].astype(str) + '\0' + instructions_df['Sample ID'].astype(str)
+    if 'Destination Plate Name' in instructions_df.columns:
+        keys = keys + '\0' + instructions_df['Destination Plate Name'].astype(str)
+    runs = (keys != keys.shift()).cumsum().to_numpy()
+    rows, cols = well_indices(instructions_df['Destination Well'])
+    if method == 'serpentine':
+        # Snake along rows or along columns, whichever travels less
+        positions = np.arange(len(instructions_df))
+        orders = [
+            np.lexsort((positions, np.where(rows % 2 == 0, cols, -cols), rows, runs)),
+            np.lexsort((positions, np.where(cols % 2 == 0, rows, -rows), cols, runs)),
+        ]
+        travels = [
+            np.maximum(np.abs(np.diff(rows[o])), np.abs(np.diff(cols[o]))).sum() for o in orders
+        ]
+        order = orders[int(np.argmin(travels))]
+    else:
+        order = np.arange(len(instructions_df))
+        # Runs are consecutive: split the positions at their boundaries
+        bounds = np.concatenate([[0], np.flatnonzero(np.diff(runs)) + 1, [len(runs)]])
+        # Runs visiting the same wells, e.g. the components of a plate, share one tour
+        tours = {}
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            positions = np.arange(start, stop)
+            # Visit each destination well once, all its chunks at once
+            wells = rows[positions] * (cols.max() + 1) + cols[positions]
+            unique_wells, first, inverse = np.unique(wells, return_index=True, return_inverse=True)
+            key = unique_wells.tobytes()
+            if key not in tours:
+                tour = _nearest_neighbour_order(rows[positions][first], cols[positions][first])
+                tours[key] = np.empty(len(tour), dtype=np.int64)
+                tours[key][tour] = np.arange(len(tour))
+            order[positions] = positions[np.lexsort((positions, tours[key][inverse]))]
+    return instructions_df.iloc[order].reset_index(drop=True)
+
+def estimate_run_time(instructions_df, droplet_volume=2.5, droplet_rate=500, transfer_overhead=0.1,
+                      well_pitch=4.5, stage_speed=100, plate_swap_time=30):
+    """
+    Estimates the run time of an instruction file on an Echo liquid handler.
+    
+    The model adds up a fixed overhead per transfer, the ejection of droplets of
+    droplet_volume at droplet_rate, the travel of the source and destination stages
+    between consecutive wells (Chebyshev distance in well pitches, both axes moving at
+    once) at stage_speed, and a plate swap time for each source plate loaded. Default
+    values are indicative and should be calibrated on the instrument.
+    
+    Parameters:
+    - instructions_df: DataFrame of instructions.
+    - droplet_volume: Volume of a droplet, in nL.
+    - droplet_rate: Droplets ejected per second.
+    - transfer_overhead: Fixed time per transfer, in seconds.
+    - well_pitch: Distance between neighbouring wells, in mm.
+    - stage_speed: Stage speed, in mm/s.
+    - plate_swap_time: Time to load a source plate, in seconds.
+    
+    Returns:
+    - Dictionary with the number of transfers, droplets, source plate loads, stage travel (mm)
+      and the estimated time in seconds.
+    """
+    num_transfers = len(instructions_df)
+    droplets = float(np.ceil(instructions_df['Transfer Volume'].to_numpy(dtype=float) / droplet_volume - 1e-9).sum())
+    # Source and destination stages move at the same time, the longest move sets the pace
+    step_travel = np.zeros(max(num_transfers - 1, 0))
+    for column in ['Source Well', 'Destination Well']:
+        # Multi-well sources ({A1;A2}) are counted at their first well
+        wells = instructions_df[column].astype(str).str.strip('{}').str.split(';').str[0]
+        rows, cols = well_indices(wells)
+        step_travel = np.maximum(step_travel, np.maximum(np.abs(np.diff(rows)), np.abs(np.diff(cols))) * well_pitch)
+    travel = float(step_travel.sum())
+    source_plates = instructions_df['Source Plate Name']
+    plate_loads = int((source_plates != source_plates.shift()).sum())
+    seconds = (num_transfers * transfer_overhead + droplets / droplet_rate
+               + travel / stage_speed + plate_loads * plate_swap_time)
+    return {
+        'transfers': num_transfers,
+        'droplets': int(droplets),
+        'source_plate_loads': plate_loads,
+        'stage_travel_mm': travel,
+        'estimated_seconds': seconds,
+    }
+
+def print_run_time(instructions_df):
+    """
+    Prints the estimated run time of instructions (see estimate_run_time).
+    """
+    estimate = estimate_run_time(instructions_df)
+    minutes, seconds = divmod(round(estimate['estimated_seconds']), 60)
+    print(f"  Estimated run time: {minutes} min {seconds} s ({estimate['transfers']} transfers, "
+          f"{estimate['droplets']} droplets, {estimate['stage_travel_mm']:g} mm of stage travel)")
 
 def reorder_by_dispense_order(df, dispense_order):
     """
@@ -111,52 +646,399 @@ def reorder_by_dispense_order(df, dispense_order):
         df = df.sort_values(by=['Dispense Order', 'Sample ID']).drop(columns=['Dispense Order'])
     return df
 
-def main(source_plate_file, destination_plate_file, output_file, source_plate_type="default:384PP_AQ_GP3",
-         max_transfer_volume=None, split_threshold=None, split_components=None, dispense_order=None):
+def plan_runs(instructions_df):
     """
-    Main function to read input files, generate ECHO instructions, and write the output to files.
+    Groups instructions into one run per source plate, so each source plate is loaded once.
+    
+    Within a run, transfers are grouped by destination plate, so each destination plate
+    is loaded once per source plate, and keep their order otherwise (component, dispense
+    and transfer orders). Source and destination plates come in order of first use.
     
     Parameters:
-    - source_plate_file: Path to the source plate file.
-    - destination_plate_file: Path to the destination plate file.
-    - output_file: Path to the output instructions file.
-    - source_plate_type: Comma-separated list of component and plate type pairs.
-    - max_transfer_volume: Maximum volume for a single transfer. If not specified, no splitting will be performed.
-    - split_threshold: Volume threshold above which transfers need to be split. If not specified, no splitting will be performed.
-    - split_components: Comma-separated list of component names to create separate files for.
-    - dispense_order: Comma-separated list of component names specifying dispensing order.
+    - instructions_df: DataFrame of instructions, possibly to several destination plates.
+    
+    Returns:
+    - List of DataFrames of instructions, one per run.
+    - DataFrame run plan with the 'Run', 'Source Plate Name', number of 'Destination Plates',
+      'Transfers' and 'Volume' of each run.
     """
-    source_plate_types = parse_plate_types(source_plate_type)
-    source_plate_df = pd.read_csv(source_plate_file)
-    destination_plate_df = pd.read_csv(destination_plate_file)
-    instructions_df = generate_echo_instructions(source_plate_df, destination_plate_df, source_plate_types,
-                                                 max_transfer_volume, split_threshold)
+    source_codes, source_plates = pd.factorize(instructions_df['Source Plate Name'])
+    destination_codes = pd.factorize(instructions_df['Destination Plate Name'])[0]
+    order = np.lexsort((np.arange(len(instructions_df)), destination_codes, source_codes))
+    bounds = np.searchsorted(source_codes[order], np.arange(len(source_plates) + 1))
+    runs = [instructions_df.iloc[order[start:end]].reset_index(drop=True) for start, end in zip(bounds[:-1], bounds[1:])]
+    runs_df = pd.DataFrame({
+        'Run': np.arange(1, len(runs) + 1),
+        'Source Plate Name': np.asarray(source_plates, dtype=object),
+        'Destination Plates': [run_df['Destination Plate Name'].nunique() for run_df in runs],
+        'Transfers': [len(run_df) for run_df in runs],
+        'Volume': [run_df['Transfer Volume'].sum() for run_df in runs],
+    })
+    return runs, runs_df
+
+def write_instructions(instructions_df, output_file, split_components=None, estimate_time=False):
+    """
+    Writes instructions to the output file, the components of split_components to their own
+    <output_file>_<component>.csv files.
     
-    if dispense_order:
-        dispense_order_list = dispense_order.split(',')
-        instructions_df = reorder_by_dispense_order(instructions_df, dispense_order_list)
+    Parameters:
+    - instructions_df: DataFrame of instructions.
+    - output_file: Path to the output instructions file.
+    - split_components: Comma-separated list of component names to create separate files for.
+    - estimate_time: If True, print the estimated run time of each file (see estimate_run_time).
     
+    Returns:
+    - List of the files written.
+    """
+    output_files = []
     if split_components:
         split_components_list = split_components.split(',')
         for component in split_components_list:
             component_df = instructions_df[instructions_df['Sample ID'] == component]
             component_output_file = f"{os.path.splitext(output_file)[0]}_{component}.csv"
             component_df.to_csv(component_output_file, index=False)
+            output_files.append(component_output_file)
             print(f"Instructions for {component} saved to {component_output_file}")
+            if estimate_time:
+                print_run_time(component_df)
         
         remaining_df = instructions_df[~instructions_df['Sample ID'].isin(split_components_list)]
         if not remaining_df.empty:
             remaining_df.to_csv(output_file, index=False)
+            output_files.append(output_file)
             print(f"Remaining instructions saved to {output_file}")
+            if estimate_time:
+                print_run_time(remaining_df)
     else:
         instructions_df.to_csv(output_file, index=False)
+        output_files.append(output_file)
+        print(f"Instructions saved to {output_file}")
+        if estimate_time:
+            print_run_time(instructions_df)
+    return output_files
+
+def stack_destination_plates(destination_data):
+    """
+    Stacks the data of several destination plates (see plate_designer.design_plates), with
+    their number in a 'Plate' column; the data of a single plate is returned as is.
+    """
+    if len(destination_data) == 1:
+        return destination_data[0]
+    return pd.concat([plate.assign(Plate=i) for i, plate in enumerate(destination_data, 1)], ignore_index=True).fillna(0)
+
+def prepare_instructions(source_plate_df, destination_plate_df, source_plate_type="default:384PP_AQ_GP3",
+                         max_transfer_volume=None, split_threshold=None, dispense_order=None, plan=False,
+                         transfer_order=None, assign_wells=False, dead_volumes='', default_dead_volume=15000):
+    """
+    Generates the instructions of source and destination plates in memory, with the options of main.
+    
+    Parameters:
+    - source_plate_df: DataFrame containing source plate data.
+    - destination_plate_df: DataFrame containing destination plate data, possibly of several
+      plates (see stack_destination_plates).
+    - Other parameters as for main.
+    
+    Returns:
+    - DataFrame of instructions.
+    - DataFrame ledger of the source wells if assign_wells is True (see assign_source_wells), None otherwise.
+    """
+    dead_volumes_dict, default_dead_volume = parse_component_values(dead_volumes, default_dead_volume)
+    instructions_df = generate_echo_instructions(source_plate_df, destination_plate_df, parse_plate_types(source_plate_type),
+                                                 max_transfer_volume, split_threshold, dead_volumes_dict, default_dead_volume)
+    
+    if plan:
+        instructions_df, report = plan_transfers(instructions_df, max_transfer_volume, split_threshold)
+        print(f"Planned {report['transfers_after']} transfers, {report['transfers_saved']} fewer than without planning")
+    
+    if transfer_order:
+        instructions_df = order_transfers(instructions_df, transfer_order)
+    
+    ledger_df = None
+    if assign_wells:
+        instructions_df, ledger_df = assign_source_wells(instructions_df, source_plate_df, dead_volumes_dict, default_dead_volume)
+    
+    if dispense_order:
+        dispense_order_list = dispense_order.split(',')
+        instructions_df = reorder_by_dispense_order(instructions_df, dispense_order_list)
+    return instructions_df, ledger_df
+
+def write_instruction_files(instructions_df, output_file, split_components=None, estimate_time=False, runs=False):
+    """
+    Writes instructions (see write_instructions), as one file per run if runs is True (see plan_runs):
+    run i to <output_file>_run<i>.csv, or to output_file if there is one run, and the run
+    plan to <output_file>_runs.csv. Returns the list of the files written.
+    """
+    if not runs:
+        return write_instructions(instructions_df, output_file, split_components, estimate_time)
+    # Several destination plates: one run, and instruction file, per source plate
+    runs, runs_df = plan_runs(instructions_df)
+    stem = os.path.splitext(output_file)[0]
+    runs_df['File'] = [os.path.basename(output_file)] if len(runs) == 1 else [f"{os.path.basename(stem)}_run{run}.csv" for run in runs_df['Run']]
+    output_files = []
+    for run_df, run_file in zip(runs, runs_df['File']):
+        output_files += write_instructions(run_df, os.path.join(os.path.dirname(output_file), run_file), split_components, estimate_time)
+    runs_df.to_csv(f"{stem}_runs.csv", index=False)
+    print(f"Run plan saved to {stem}_runs.csv")
+    return output_files + [f"{stem}_runs.csv"]
+
+def stream_instructions(blocks, output_file, split_components=None):
+    """
+    Writes blocks of instructions of one component each (see iter_echo_instructions) as they
+    come, to the same files as write_instructions: one block is held in memory at a time.
+    
+    Parameters:
+    - blocks: Iterable of DataFrames of instructions, each of a single component.
+    - output_file: Path to the output instructions file.
+    - split_components: Comma-separated list of component names to create separate files for.
+    
+    Returns:
+    - List of the files written.
+    """
+    split_components_list = split_components.split(',') if split_components else []
+    component_files = {component: f"{os.path.splitext(output_file)[0]}_{component}.csv" for component in split_components_list}
+    handles = {}
+    try:
+        for block in blocks:
+            file = component_files.get(block['Sample ID'].iat[0], output_file)
+            if file in handles:
+                block.to_csv(handles[file], index=False, header=False)
+            else:
+                handles[file] = open(file, 'w', newline='')
+                block.to_csv(handles[file], index=False)
+    finally:
+        for handle in handles.values():
+            handle.close()
+    
+    # Files with no instruction only hold the header; no remaining instructions, no file
+    for file in list(component_files.values()) + ([] if split_components_list else [output_file]):
+        if file not in handles:
+            pd.DataFrame(columns=INSTRUCTION_COLUMNS).to_csv(file, index=False)
+    for component, file in component_files.items():
+        print(f"Instructions for {component} saved to {file}")
+    if not split_components_list:
         print(f"Instructions saved to {output_file}")
+    elif output_file in handles:
+        print(f"Remaining instructions saved to {output_file}")
+    return list(component_files.values()) + ([output_file] if output_file in handles or not split_components_list else [])
+
+def stream_runs(blocks, output_file, split_components=None):
+    """
+    Writes blocks of instructions of one component each (see iter_echo_instructions) as one file
+    per run, to the same files as write_instruction_files with runs (see plan_runs), with one
+    block held in memory at a time.
+    
+    The transfers of each block are spooled, as they come, to temporary files by source plate,
+    destination plate and output file; the files of each run are then assembled from them, source
+    and destination plates in order of first use.
+    
+    Parameters:
+    - blocks: Iterable of DataFrames of instructions, each of a single component.
+    - output_file: Path to the output instructions file.
+    - split_components: Comma-separated list of component names to create separate files for.
+    
+    Returns:
+    - List of the files written.
+    """
+    split_components_list = split_components.split(',') if split_components else []
+    stem = os.path.splitext(output_file)[0]
+    # Transfers, volume and destination plates of each source plate, and destination plates, in order of first use
+    runs, destination_plates = {}, {}
+    output_files = []
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(output_file))) as spool_folder:
+        spools = {}
+        for block in blocks:
+            component = block['Sample ID'].iat[0] if len(block) else None
+            target = component if component in split_components_list else None
+            for (source_plate, destination_plate), part in block.groupby(['Source Plate Name', 'Destination Plate Name'], sort=False):
+                run = runs.setdefault(source_plate, {'Transfers': 0, 'Volume': 0, 'Destination Plates': set()})
+                run['Transfers'] += len(part)
+                run['Volume'] += part['Transfer Volume'].sum()
+                run['Destination Plates'].add(destination_plate)
+                destination_plates.setdefault(destination_plate, len(destination_plates))
+                spool = spools.setdefault((source_plate, destination_plate, target), os.path.join(spool_folder, f"{len(spools)}.csv"))
+                with open(spool, 'a', newline='') as f:
+                    part.to_csv(f, index=False, header=False)
+        
+        run_files = [os.path.basename(output_file)] if len(runs) == 1 else [f"{os.path.basename(stem)}_run{run}.csv" for run in range(1, len(runs) + 1)]
+        for source_plate, run_file in zip(runs, run_files):
+            run_file = os.path.join(os.path.dirname(output_file), run_file)
+            # Component files are written even if empty, remaining instructions only if any (see write_instructions)
+            targets = [(component, f"{os.path.splitext(run_file)[0]}_{component}.csv") for component in split_components_list]
+            targets.append((None, run_file))
+            for target, file in targets:
+                parts = [spools[key] for key in ((source_plate, destination_plate, target) for destination_plate in destination_plates) if key in spools]
+                if target is None and split_components_list and not parts:
+                    continue
+                with open(file, 'w', newline='') as f:
+                    pd.DataFrame(columns=INSTRUCTION_COLUMNS).to_csv(f, index=False)
+                    for part in parts:
+                        with open(part, newline='') as spool:
+                            shutil.copyfileobj(spool, f)
+                output_files.append(file)
+                if target is not None:
+                    print(f"Instructions for {target} saved to {file}")
+                elif split_components_list:
+                    print(f"Remaining instructions saved to {file}")
+                else:
+                    print(f"Instructions saved to {file}")
+    
+    runs_df = pd.DataFrame({
+        'Run': np.arange(1, len(runs) + 1),
+        'Source Plate Name': list(runs),
+        'Destination Plates': [len(run['Destination Plates']) for run in runs.values()],
+        'Transfers': [run['Transfers'] for run in runs.values()],
+        'Volume': [run['Volume'] for run in runs.values()],
+        'File': run_files,
+    })
+    runs_df.to_csv(f"{stem}_runs.csv", index=False)
+    print(f"Run plan saved to {stem}_runs.csv")
+    return output_files + [f"{stem}_runs.csv"]
+
+def stream_instruction_files(source_plate_df, destination_plate_df, output_file, split_components=None, runs=False,
+                             source_plate_type="default:384PP_AQ_GP3", max_transfer_volume=None, split_threshold=None,
+                             dispense_order=None, dead_volumes='', default_dead_volume=15000):
+    """
+    Generates instructions block by block (see iter_echo_instructions) and streams them to the
+    same files as write_instruction_files: one file, or one file per run if runs is True (see
+    stream_runs). The counterpart of prepare_instructions without the steps needing all the
+    instructions at once (plan, transfer_order, assign_wells).
+    
+    Parameters:
+    - source_plate_df: DataFrame containing source plate data.
+    - destination_plate_df: DataFrame containing destination plate data, possibly of several
+      plates (see stack_destination_plates).
+    - output_file: Path to the output instructions file.
+    - split_components: Comma-separated list of component names to create separate files for.
+    - runs: If True, write one file per run (source plate).
+    - Other parameters as for main.
+    
+    Returns:
+    - List of the files written.
+    """
+    dead_volumes_dict, default_dead_volume = parse_component_values(dead_volumes, default_dead_volume)
+    blocks = iter_echo_instructions(source_plate_df, destination_plate_df, parse_plate_types(source_plate_type),
+                                    max_transfer_volume, split_threshold, dispense_order.split(',') if dispense_order else None,
+                                    dead_volumes=dead_volumes_dict, default_dead_volume=default_dead_volume)
+    if runs:
+        return stream_runs(blocks, output_file, split_components)
+    return stream_instructions(blocks, output_file, split_components)
+
+def read_instructions(output_file, split_components=None):
+    """
+    Reads back the instructions written by main: the output file, or the run files listed in
+    <output_file>_runs.csv, and their per-component files, if any.
+    """
+    runs_file = f"{os.path.splitext(output_file)[0]}_runs.csv"
+    if os.path.exists(runs_file):
+        outputs = [os.path.join(os.path.dirname(output_file), file) for file in pd.read_csv(runs_file)['File']]
+    else:
+        outputs = [output_file]
+    files = []
+    for output in outputs:
+        files += [f"{os.path.splitext(output)[0]}_{component}.csv" for component in split_components.split(',')] if split_components else []
+        files.append(output)
+    files = [file for file in files if os.path.exists(file)]
+    if not files:
+        raise FileNotFoundError(f"No instructions file found for {output_file}.")
+    instructions = [pd.read_csv(file) for file in files]
+    return pd.concat([df for df in instructions if len(df)] or instructions[:1], ignore_index=True)
+
+def write_validation(instructions_df, source_plate_df, destination_plate_df, output_file, dead_volumes='',
+                     default_dead_volume=15000):
+    """
+    Validates instructions (see validate_instructions) and writes the discrepancies to <output_file>_validation.csv.
+    
+    Returns:
+    - DataFrame of discrepancies, empty if the instructions are valid.
+    """
+    dead_volumes_dict, default_dead_volume = parse_component_values(dead_volumes, default_dead_volume)
+    discrepancies = validate_instructions(instructions_df, source_plate_df, destination_plate_df, dead_volumes_dict, default_dead_volume)
+    validation_file = f"{os.path.splitext(output_file)[0]}_validation.csv"
+    discrepancies.to_csv(validation_file, index=False)
+    if discrepancies.empty:
+        print(f"Validated {len(instructions_df)} transfers: no discrepancy")
+    else:
+        print(f"Validated {len(instructions_df)} transfers: {len(discrepancies)} discrepancies saved to {validation_file}")
+    return discrepancies
+
+def main(source_plate_file, destination_plate_file, output_file, source_plate_type="default:384PP_AQ_GP3",
+         max_transfer_volume=None, split_threshold=None, split_components=None, dispense_order=None, wells=None,
+         assign_wells=False, dead_volumes='', default_dead_volume=15000, transfer_order=None, estimate_time=False,
+         plan=False, validate=False):
+    """
+    Main function to read input files, generate ECHO instructions, and write the output to files.
+    
+    Parameters:
+    - source_plate_file: Path to the source plate file.
+    - destination_plate_file: Path to the destination plate file, or to a manifest of destination
+      plate files (see read_destination_plates). With several destination plates, one run is
+      planned per source plate (see plan_runs): run i is written to <output_file>_run<i>.csv and
+      the run plan to <output_file>_runs.csv.
+    - output_file: Path to the output instructions file.
+    - source_plate_type: Comma-separated list of component and plate type pairs.
+    - max_transfer_volume: Maximum volume for a single transfer. If not specified, no splitting will be performed.
+    - split_threshold: Volume threshold above which transfers need to be split. If not specified, no splitting will be performed.
+    - split_components: Comma-separated list of component names to create separate files for.
+    - dispense_order: Comma-separated list of component names specifying dispensing order.
+    - wells: Comma-separated list of destination wells to generate instructions for, e.g. wells
+      to redo; all wells if not specified.
+    - assign_wells: If True, each transfer is drawn from one concrete source well (see assign_source_wells)
+      and the volume drawn from each well is written to <output_file>_ledger.csv.
+    - dead_volumes: Dead volumes for specific components in format component1=volume1,component2=volume2,...
+    - default_dead_volume: Dead volume of the source wells of other components, used with assign_wells
+      and validate, and to share the transfers of a component spread over several source plates.
+    - transfer_order: 'serpentine' or 'nearest' to reorder transfers within each component
+      and source plate (see order_transfers), destination plate order if not specified.
+    - estimate_time: If True, print the estimated run time of each instruction file (see estimate_run_time).
+    - plan: If True, merge and split transfers into the fewest balanced chunks (see plan_transfers).
+    - validate: If True, replay the instructions against the plate files (see validate_instructions)
+      and write the discrepancies to <output_file>_validation.csv.
+    
+    Unless plan, transfer_order, assign_wells, validate or estimate_time is set, instructions
+    are streamed to the output files block by block (see stream_instruction_files) rather than
+    held in memory, including the runs of several destination plates.
+    
+    Returns:
+    - DataFrame of discrepancies if validate is True, None otherwise.
+    """
+    source_plate_df = pd.read_csv(source_plate_file)
+    destination_plate_df = read_destination_plates(destination_plate_file)
+    # Fail early on malformed well names rather than in the liquid handler
+    well_indices(source_plate_df['Well'])
+    well_indices(destination_plate_df['Well'])
+    if wells:
+        if 'Plate' in destination_plate_df.columns:
+            raise ValueError("Wells to redo can only be selected on a single destination plate.")
+        destination_plate_df = select_wells(destination_plate_df, wells.split(','))
+    
+    # Without steps needing all the instructions at once, stream them to the output files
+    if not (plan or transfer_order or assign_wells or validate or estimate_time):
+        stream_instruction_files(source_plate_df, destination_plate_df, output_file, split_components,
+                                 'Plate' in destination_plate_df.columns, source_plate_type, max_transfer_volume,
+                                 split_threshold, dispense_order, dead_volumes, default_dead_volume)
+        return None
+    
+    instructions_df, ledger_df = prepare_instructions(
+        source_plate_df, destination_plate_df, source_plate_type, max_transfer_volume, split_threshold,
+        dispense_order, plan, transfer_order, assign_wells, dead_volumes, default_dead_volume
+    )
+    if ledger_df is not None:
+        ledger_file = f"{os.path.splitext(output_file)[0]}_ledger.csv"
+        ledger_df.to_csv(ledger_file, index=False)
+        print(f"Source well ledger saved to {ledger_file}")
+    
+    write_instruction_files(instructions_df, output_file, split_components, estimate_time,
+                            runs='Plate' in destination_plate_df.columns)
+    
+    if validate:
+        return write_validation(instructions_df, source_plate_df, destination_plate_df, output_file,
+                                dead_volumes, default_dead_volume)
 
 if __name__ == "__main__":
     import sys
     parser = argparse.ArgumentParser(description="Generate ECHO liquid handler instructions.")
     parser.add_argument("source_plate_file", type=str, help="Path to the source plate file.")
-    parser.add_argument("destination_plate_file", type=str, help="Path to the destination plate file.")
+    parser.add_argument("destination_plate_file", type=str, help="Path to the destination plate file, or to a manifest of destination plate files (destination_plates.csv).")
     parser.add_argument("output_file", type=str, help="Path to the output instructions file.")
     parser.add_argument("--source_plate_type", type=str, default="default:384PP_AQ_GP3",
                         help="Comma-separated list of component and plate type pairs, e.g., 'Component_1:384PP_AQ_CP,Component_2:384PP_AQ_GP3'. Default for all is 384PP_AQ_GP3.")
@@ -164,7 +1046,29 @@ if __name__ == "__main__":
     parser.add_argument("--split_threshold", type=int, help="Volume threshold for splitting transfers. No splitting if not specified.")
     parser.add_argument("--split_components", type=str, help="Comma-separated list of components for separate output files.")
     parser.add_argument("--dispense_order", type=str, help="Comma-separated list of components specifying dispensing order.")
+    parser.add_argument("--assign_wells", action="store_true", help="Draw each transfer from one concrete source well, tracking the volume left in each well, and write a ledger file.")
+    parser.add_argument("--dead_volumes", type=str, default='', help="Dead volumes for specific components in format component1=volume1,component2=volume2,... (used with --assign_wells, --validate and components spread over several source plates).")
+    parser.add_argument("--default_dead_volume", type=int, default=15000, help="Default dead volume in nL of the source wells (used with --assign_wells, --validate and components spread over several source plates, default: 15000).")
+    parser.add_argument("--transfer_order", type=str, choices=TRANSFER_ORDERS, help="Reorder transfers within each component to shorten stage travel: serpentine rows or nearest-neighbour tour of the destination wells.")
+    parser.add_argument("--plan_transfers", action="store_true", help="Merge transfers sharing source, destination and component, and split them into the fewest balanced chunks.")
+    parser.add_argument("--estimate_time", action="store_true", help="Print the estimated run time of each instruction file.")
+    parser.add_argument("--wells", type=str, help="Comma-separated list of destination wells to generate instructions for (e.g., wells to redo). All wells if not specified.")
+    parser.add_argument("--validate", action="store_true", help="Replay the instructions against the source and destination plates and write the discrepancies to <output_file>_validation.csv.")
+    parser.add_argument("--validate_only", action="store_true", help="Only validate the existing output file (and per-component files) and exit.")
     args = parser.parse_args()
     
-    main(args.source_plate_file, args.destination_plate_file, args.output_file, args.source_plate_type,
-         args.max_transfer_volume, args.split_threshold, args.split_components, args.dispense_order)
+    if args.validate_only:
+        destination_plate_df = read_destination_plates(args.destination_plate_file)
+        if args.wells:
+            destination_plate_df = select_wells(destination_plate_df, args.wells.split(','))
+        discrepancies = write_validation(read_instructions(args.output_file, args.split_components),
+                                         pd.read_csv(args.source_plate_file), destination_plate_df, args.output_file,
+                                         args.dead_volumes, args.default_dead_volume)
+        sys.exit(1 if len(discrepancies) else 0)
+    
+    discrepancies = main(args.source_plate_file, args.destination_plate_file, args.output_file, args.source_plate_type,
+         args.max_transfer_volume, args.split_threshold, args.split_components, args.dispense_order, args.wells,
+         args.assign_wells, args.dead_volumes, args.default_dead_volume, args.transfer_order, args.estimate_time,
+         args.plan_transfers, args.validate)
+    if discrepancies is not None and len(discrepancies):
+        sys.exit(1)
@@ -1,5 +1,7 @@
 import pandas as pd
+import numpy as np
 import argparse
+from icfree.plate import is_well_name, well_indices
 
 def find_n_m_from_sampling(df_sampling):
     """
@@ -21,6 +23,21 @@ def find_n_m_from_sampling(df_sampling):
     
     return n, has_repetitions
 
+def select_well_columns(df_initial):
+    """
+    Select the well columns (A1, B1...) of a plate reader export, in column-major plate order.
+
+    Parameters:
+    df_initial (DataFrame): The initial data DataFrame, e.g. with time and temperature columns first.
+
+    Returns:
+    DataFrame: The well columns, sorted by plate column then row (A1, B1, ..., A2, ...).
+    """
+    is_well = is_well_name(df_initial.columns)
+    df_wells = df_initial.loc[:, is_well]
+    rows, cols = well_indices(df_wells.columns)
+    return df_wells.iloc[:, np.lexsort((rows, cols))]
+
 def infer_replicates(df_initial, df_sampling, num_samples):
     """
     Infer the number of replicates from the initial data file and sampling file.
@@ -33,8 +50,8 @@ def infer_replicates(df_initial, df_sampling, num_samples):
     Returns:
     int: Inferred number of replicates.
     """
-    # Remove the first two columns from the initial data
-    df_initial = df_initial.iloc[:, 2:]
+    # Keep the well columns only
+    df_initial = select_well_columns(df_initial)
     
     # Infer replicates based on the number of columns
     total_columns = df_initial.shape[1]
@@ -62,8 +79,8 @@ def process_data(df_initial, num_samples, num_replicates):
     Returns:
     DataFrame: The reshaped DataFrame.
     """
-    # Remove the first two columns
-    df_initial = df_initial.iloc[:, 2:]
+    # Keep the well columns only, in plate order
+    df_initial = select_well_columns(df_initial)
     
     # Reshape data based on num_samples and num_replicates
     total_values = num_samples * num_replicates
@@ -0,0 +1,261 @@
+import numpy as np
+
+# Number of rows and columns of the standard microplate formats
+PLATE_FORMATS = {
+    96: (8, 12),
+    384: (16, 24),
+    1536: (32, 48),
+}
+
+FILL_ORDERS = ('column', 'row')
+
+_A = ord('A')
+
+
+def row_names(rows):
+    """
+    Encode 0-based row indices into row names: A-Z, then AA, AB... (bijective base 26).
+
+    Args:
+        rows (array-like): 0-based row indices.
+
+    Returns:
+        np.ndarray: Array of row names.
+    """
+    remaining = np.asarray(rows, dtype=np.int64).reshape(-1) + 1
+    if (remaining < 1).any():
+        raise ValueError("Row indices must be non-negative.")
+    names = np.full(remaining.shape, '', dtype='U1')
+    # One letter per iteration, from the last one; 3 letters cover 18278 rows
+    while (remaining > 0).any():
+        letters = (remaining - 1) % 26
+        letter_names = np.where(remaining > 0, (letters + _A).astype(np.uint32).view('U1'), '')
+        names = np.char.add(letter_names, names)
+        remaining = (remaining - 1) // 26
+    return names
+
+
+def well_names(rows, cols):
+    """
+    Encode 0-based (row, column) indices into well names (e.g., (0, 0) -> 'A1', (26, 3) -> 'AA4').
+
+    Args:
+        rows (array-like): 0-based row indices.
+        cols (array-like): 0-based column indices.
+
+    Returns:
+        np.ndarray: Array of well names.
+    """
+    cols = np.asarray(cols, dtype=np.int64).reshape(-1)
+    if (cols < 0).any():
+        raise ValueError("Column indices must be non-negative.")
+    return np.char.add(row_names(rows), (cols + 1).astype(str))
+
+
+def _decode(names):
+    """
+    Decode well names on their Unicode code points, all at once.
+
+    Returns:
+        tuple: Arrays of 0-based row indices, column indices, and validity of the names.
+    """
+    names = np.char.upper(np.char.strip(np.asarray(names, dtype=str).reshape(-1)))
+    width = max(names.dtype.itemsize // 4, 1)
+    codes = np.ascontiguousarray(names, dtype=f'U{width}').view(np.uint32).reshape(names.size, width).astype(np.int64)
+    is_letter = (codes >= _A) & (codes <= ord('Z'))
+    is_digit = (codes >= ord('0')) & (codes <= ord('9'))
+    num_letters = np.cumprod(is_letter, axis=1).sum(axis=1)
+    num_digits = is_digit.sum(axis=1)
+    positions = np.arange(codes.shape[1])
+    # One or more letters, then one or more digits, then padding only
+    expected_digits = (positions >= num_letters[:, None]) & (positions < (num_letters + num_digits)[:, None])
+    valid = (
+        (num_letters > 0) & (num_digits > 0)
+        & ((codes > 0).sum(axis=1) == num_letters + num_digits)
+        & (is_digit == expected_digits).all(axis=1)
+    )
+    rows = np.zeros(names.size, dtype=np.int64)
+    cols = np.zeros(names.size, dtype=np.int64)
+    for position in range(codes.shape[1]):
+        code = codes[:, position]
+        rows = np.where(is_letter[:, position], rows * 26 + code - _A + 1, rows)
+        cols = np.where(is_digit[:, position], cols * 10 + code - ord('0'), cols)
+    return rows - 1, cols - 1, valid & (cols > 0)
+
+
+def well_indices(names):
+    """
+    Decode well names into 0-based (row, column) indices (e.g., 'A1' -> (0, 0), 'AA4' -> (26, 3)).
+
+    A valid name is made of one or more letters followed by a positive column number
+    (case-insensitive).
+
+    Args:
+        names (array-like): Well names (e.g., ['A1', 'P24', 'AF48']).
+
+    Returns:
+        tuple: Arrays of 0-based row indices and column indices.
+
+    Raises:
+        ValueError: If a name is not a valid well name.
+    """
+    rows, cols, valid = _decode(names)
+    if not valid.all():
+        invalid = np.asarray(names, dtype=str).reshape(-1)[~valid]
+        raise ValueError(f"Invalid well name(s): {', '.join(invalid[:5])}{'...' if invalid.size > 5 else ''}")
+    return rows, cols
+
+
+def is_well_name(names):
+    """
+    Tell which names are valid well names.
+
+    Args:
+        names (array-like): Candidate names (e.g., the columns of a plate reader export).
+
+    Returns:
+        np.ndarray: Boolean mask.
+    """
+    return _decode([str(name) for name in names])[2]
+
+
+class Plate:
+    """
+    Microplate of num_rows x num_cols wells, addressed by 0-based (row, column) index arrays.
+    """
+
+    def __init__(self, num_rows, num_cols):
+        if num_rows < 1 or num_cols < 1:
+            raise ValueError(f"Invalid plate dimensions: {num_rows}x{num_cols}.")
+        self.num_rows = int(num_rows)
+        self.num_cols = int(num_cols)
+
+    @classmethod
+    def from_dims(cls, plate_dims):
+        """
+        Build a plate from its dimensions (e.g., '16x24') or its number of wells (e.g., '1536').
+
+        Args:
+            plate_dims (str or int): Plate dimensions in format NxM, or a standard number of wells.
+
+        Returns:
+            Plate: The plate.
+        """
+        plate_dims = str(plate_dims).strip().lower()
+        if 'x' in plate_dims:
+            num_rows, num_cols = map(int, plate_dims.split('x'))
+            return cls(num_rows, num_cols)
+        if int(plate_dims) not in PLATE_FORMATS:
+            raise ValueError(f"Unknown plate format: {plate_dims}. Use NxM or one of {', '.join(map(str, PLATE_FORMATS))}.")
+        return cls(*PLATE_FORMATS[int(plate_dims)])
+
+    @property
+    def size(self):
+        return self.num_rows * self.num_cols
+
+    @property
+    def dims(self):
+        return f"{self.num_rows}x{self.num_cols}"
+
+    def __repr__(self):
+        return f"Plate({self.num_rows}, {self.num_cols})"
+
+    def __eq__(self, other):
+        return isinstance(other, Plate) and (self.num_rows, self.num_cols) == (other.num_rows, other.num_cols)
+
+    def indices(self, names):
+        """
+        Decode well names into 0-based (row, column) indices, checking they are on the plate.
+
+        Args:
+            names (array-like): Well names.
+
+        Returns:
+            tuple: Arrays of 0-based row indices and column indices.
+
+        Raises:
+            ValueError: If a name is invalid or outside the plate.
+        """
+        rows, cols = well_indices(names)
+        outside = (rows >= self.num_rows) | (cols >= self.num_cols)
+        if outside.any():
+            outside_names = well_names(rows[outside], cols[outside])
+            raise ValueError(f"Well(s) outside a {self.dims} plate: {', '.join(outside_names[:5])}{'...' if outside_names.size > 5 else ''}")
+        return rows, cols
+
+    def names(self, rows, cols):
+        """
+        Encode 0-based (row, column) indices of wells of the plate into well names.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        if (rows >= self.num_rows).any() or (cols >= self.num_cols).any():
+            raise ValueError(f"Well indices outside a {self.dims} plate.")
+        return well_names(rows, cols)
+
+    def flat_indices(self, rows, cols, order='column'):
+        """
+        Rank of wells in the column-major (A1, B1...) or row-major (A1, A2...) order of the plate.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        if order == 'column':
+            return cols * self.num_rows + rows
+        if order == 'row':
+            return rows * self.num_cols + cols
+        raise ValueError(f"Unknown fill order '{order}'. Use one of {', '.join(FILL_ORDERS)}.")
+
+    def capacity(self, start_well='A1'):
+        """
+        Number of wells of the rectangle whose top-left corner is the starting well.
+        """
+        (start_row,), (start_col,) = self.indices([start_well])
+        return int((self.num_rows - start_row) * (self.num_cols - start_col))
+
+    def fill(self, num_positions, start_well='A1', order='column'):
+        """
+        Indices of the wells used by num_positions positions filled from a starting well.
+
+        Wells are taken from the rectangle whose top-left corner is the starting well,
+        column by column (A1, B1...) or row by row (A1, A2...).
+
+        Args:
+            num_positions (int): Number of wells to fill.
+            start_well (str): Starting well position (e.g., 'A1').
+            order (str): 'column' or 'row'.
+
+        Returns:
+            tuple: Arrays of 0-based row indices and column indices.
+
+        Raises:
+            ValueError: If the plate does not have enough wells from the starting well on.
+        """
+        (start_row,), (start_col,) = self.indices([start_well])
+        num_rows = self.num_rows - start_row
+        num_cols = self.num_cols - start_col
+        if num_positions > num_rows * num_cols:
+            raise ValueError(
+                f"{num_positions} wells needed but only {num_rows * num_cols} available "
+                f"from {start_well} on a {self.dims} plate."
+            )
+        ranks = np.arange(num_positions, dtype=np.int64)
+        if order == 'column':
+            return start_row + ranks % num_rows, start_col + ranks // num_rows
+        if order == 'row':
+            return start_row + ranks // num_cols, start_col + ranks % num_cols
+        raise ValueError(f"Unknown fill order '{order}'. Use one of {', '.join(FILL_ORDERS)}.")
+
+    def positions(self, num_positions, start_well='A1', order='column'):
+        """
+        Names of the wells used by num_positions positions filled from a starting well (see fill).
+
+        Returns:
+            list: List of well positions.
+        """
+        return self.names(*self.fill(num_positions, start_well, order)).tolist()
+
+    def sort_wells(self, names, order='column'):
+        """
+        Positions that sort well names in the column-major or row-major order of the plate.
+        """
+        return np.argsort(self.flat_indices(*self.indices(names), order=order), kind='stable')
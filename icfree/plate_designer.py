@@ -2,6 +2,8 @@ import argparse
 import pandas as pd
 import numpy as np
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from icfree.plate import Plate, FILL_ORDERS, well_indices, well_names
 
 
 def parse_args():
@@ -18,7 +20,11 @@ def parse_args():
     # Optional arguments
     parser.add_argument('--start_well_src_plt', type=str, default='A1', help='Starting well for the source plate')
     parser.add_argument('--start_well_dst_plt', type=str, default='A1', help='Starting well for the destination plate')
-    parser.add_argument('--plate_dims', type=str, default='16x24', help='Plate dimensions (Format: NxM)')
+    parser.add_argument('--plate_dims', type=str, default='16x24', help='Plate dimensions (Format: NxM, or 96, 384, 1536)')
+    parser.add_argument('--src_plate_dims', type=str, default=None, help='Source plate dimensions (Format: NxM, or 96, 384, 1536), same as --plate_dims if not given')
+    parser.add_argument('--replan', type=str, default=None, help='Comma-separated wells of the existing destination plate in output_folder to redo; only *_replan.csv files are written')
+    parser.add_argument('--replan_plate', type=int, default=None, help='Destination plate (1, 2...) of the wells to redo, when the design spans several plates')
+    parser.add_argument('--fill_order', type=str, choices=FILL_ORDERS, default='column', help='Fill the destination plate column by column (A1, B1...) or row by row (A1, A2...)')
     parser.add_argument('--well_capacity', type=str, default='', help='Well capacities for specific components in format component1=capacity1,component2=capacity2,...')
     parser.add_argument('--default_well_capacity', type=int, default=60000, help='Default well capacity in nL for components not specified in well_capacity')
     parser.add_argument('--dead_volumes', type=str, default='', help='Dead volumes for specific components in format component1=volume1,component2=volume2,...')
@@ -29,32 +35,23 @@ def parse_args():
     return parser.parse_args()
 
 
-def generate_well_positions(start_well, plate_dims, num_positions):
+def generate_well_positions(start_well, plate_dims, num_positions, fill_order='column'):
     """
     Generate well positions in a plate given a starting well, plate dimensions, and the number of positions needed.
     
     Args:
         start_well (str): Starting well position (e.g., 'A1').
-        plate_dims (str): Dimensions of the plate (e.g., '16x24').
+        plate_dims (str): Dimensions of the plate (e.g., '16x24', or '1536').
         num_positions (int): Number of well positions to generate.
+        fill_order (str): 'column' to fill the plate column by column (A1, B1...), 'row' for row by row (A1, A2...).
     
     Returns:
         list: List of well positions.
-    """
-    rows, cols = map(int, plate_dims.split('x'))
-    start_row = ord(start_well[0].upper()) - ord('A')
-    start_col = int(start_well[1:]) - 1
     
-    positions = []
-    for col in range(start_col, cols):
-        for row in range(start_row, rows):
-            if len(positions) < num_positions:
-                positions.append(f"{chr(ord('A') + row)}{col + 1}")
-            else:
-                break
-        if len(positions) >= num_positions:
-            break
-    return positions
+    Raises:
+        ValueError: If the plate has not enough wells from the starting well on.
+    """
+    return Plate.from_dims(plate_dims).positions(num_positions, start_well, fill_order)
 
 
 def parse_component_values(component_values_str, default_value):
@@ -77,7 +74,7 @@ def parse_component_values(component_values_str, default_value):
     return component_values, default_value
 
 
-def prepare_destination_plate(sampling_data, start_well, plate_dims, sample_volume, num_replicates):
+def prepare_destination_plate(sampling_data, start_well, plate_dims, sample_volume, num_replicates, fill_order='column'):
     """
     Prepare the destination plate data by replicating the sampling data and assigning well positions.
     
@@ -87,14 +84,15 @@ def prepare_destination_plate(sampling_data, start_well, plate_dims, sample_volu
         plate_dims (str): Dimensions of the plate (e.g., '16x24').
         sample_volume (int): Desired sample volume in each well of the destination plate.
         num_replicates (int): Number of replicates for each sample.
+        fill_order (str): 'column' or 'row' order in which wells are filled.
     
     Returns:
         pd.DataFrame: DataFrame with destination plate data, including well positions and water volumes.
     """
     # Replicate the sampling data according to the specified number of replicates
-    replicated_data = pd.concat([sampling_data] * num_replicates, ignore_index=True)
+    replicated_data = replicate_samples(sampling_data, num_replicates)
     num_wells_needed = len(replicated_data)
-    well_positions = generate_well_positions(start_well, plate_dims, num_wells_needed)
+    well_positions = generate_well_positions(start_well, plate_dims, num_wells_needed, fill_order)
     
     # Insert the well positions and calculate the water volume needed to reach the desired sample volume
     replicated_data.insert(0, 'Well', well_positions)
@@ -103,21 +101,81 @@ def prepare_destination_plate(sampling_data, start_well, plate_dims, sample_volu
     return replicated_data
 
 
-def prepare_source_plate(destination_data, dead_volumes_str, default_dead_volume, well_capacity_str, default_well_capacity, start_well, extra_wells_str):
+def replicate_samples(sampling_data, num_replicates):
+    """
+    Replicate the sampling data: all samples, then all samples again, num_replicates times.
+    
+    Args:
+        sampling_data (pd.DataFrame): DataFrame containing the sampling data.
+        num_replicates (int): Number of replicates for each sample.
+    
+    Returns:
+        pd.DataFrame: Replicated sampling data, with a fresh index.
+    """
+    rows = np.tile(np.arange(len(sampling_data)), num_replicates)
+    return sampling_data.iloc[rows].reset_index(drop=True)
+
+
+def prepare_destination_plates(sampling_data, start_well, plate_dims, sample_volume, num_replicates, fill_order='column'):
+    """
+    Prepare the destination plates, splitting the replicated sampling data across as many plates as needed.
+    
+    Every plate is filled from the starting well on, in fill order; the replicated
+    samples are laid out in order over the successive plates.
+    
+    Args:
+        sampling_data (pd.DataFrame): DataFrame containing the sampling data.
+        start_well (str): Starting well position on each destination plate.
+        plate_dims (str): Dimensions of the plates (e.g., '16x24', or '1536').
+        sample_volume (int): Desired sample volume in each well of the destination plates.
+        num_replicates (int): Number of replicates for each sample.
+        fill_order (str): 'column' or 'row' order in which wells are filled.
+    
+    Returns:
+        list: DataFrames with destination plate data, one per plate.
+    """
+    plate = Plate.from_dims(plate_dims)
+    wells_per_plate = plate.capacity(start_well)
+    replicated_data = replicate_samples(sampling_data, num_replicates)
+    num_plates = max(-(-len(replicated_data) // wells_per_plate), 1)
+    well_positions = np.asarray(plate.positions(wells_per_plate, start_well, fill_order), dtype=object)
+    
+    # Well of each replicated sample on its plate
+    ranks = np.arange(len(replicated_data))
+    replicated_data.insert(0, 'Well', well_positions[ranks % wells_per_plate])
+    replicated_data['Water'] = sample_volume - replicated_data.drop('Well', axis=1).sum(axis=1)
+    
+    plate_numbers = ranks // wells_per_plate
+    return [
+        replicated_data[plate_numbers == plate_number].reset_index(drop=True)
+        for plate_number in range(num_plates)
+    ]
+
+
+def prepare_source_plate(destination_data, dead_volumes_str, default_dead_volume, well_capacity_str, default_well_capacity, start_well, extra_wells_str, plate_dims='16x24'):
     """
     Prepare the source plate data by calculating the total volume needed for each component, adding extra wells, and assigning well positions.
     
+    Each component needs ceil(total / (capacity - dead volume)) wells, all full but the
+    last one, plus its extra wells. The wells of a component are consecutive and kept on
+    one source plate: a component that does not fit the rest of a plate starts the next
+    one (Source[2], Source[3]...). A component larger than a whole plate fills the rest
+    of the current plate and spills over the next ones; the instructor then draws its
+    transfers from one plate after the other (see instructor.source_pools).
+    
     Args:
         destination_data (pd.DataFrame): DataFrame with destination plate data.
         dead_volumes_str (str): Dead volumes for specific components (format: component1=volume1,component2=volume2,...).
         default_dead_volume (int): Default dead volume to use if not specified in dead_volumes_str.
         well_capacity_str (str): Well capacities for specific components (format: component1=capacity1,component2=capacity2,...).
         default_well_capacity (int): Default well capacity to use if not specified in well_capacity_str.
-        start_well (str): Starting well position for the source plate.
+        start_well (str): Starting well position on each source plate.
         extra_wells_str (str): Extra wells for specific components in format component1=num1,component2=num2,...
+        plate_dims (str): Dimensions of the source plates (e.g., '16x24').
     
     Returns:
         pd.DataFrame: DataFrame with source plate data, including well positions and volumes for each component.
+        A 'Plate' column (1, 2...) is added when several source plates are needed.
     """
     # Parse dead volumes, well capacities, and extra wells
     dead_volumes, default_dead_volume = parse_component_values(dead_volumes_str, default_dead_volume)
@@ -126,81 +184,190 @@ def prepare_source_plate(destination_data, dead_volumes_str, default_dead_volume
     
     # Calculate total volume needed for each component from the destination data
     component_totals = destination_data.drop(columns='Well').sum()
-
-    # List to store source well allocations
-    source_rows = []
-    well_positions = generate_well_positions(start_well, '16x24', 1000)  # Generate ample well positions
-    current_position = 0
-
-    for component, total_volume in component_totals.items():
-        dead_volume = dead_volumes.get(component, default_dead_volume)
-        well_capacity = well_capacities.get(component, default_well_capacity)
-        remaining_volume = total_volume
-
-        # Distribute the component across source wells
-        while remaining_volume > 0:
-            # Calculate effective capacity for the current well
-            effective_capacity = well_capacity - dead_volume
-            volume_this_well = min(remaining_volume, effective_capacity)
-            actual_volume_in_well = volume_this_well + dead_volume
-            source_rows.append({
-                'Well': well_positions[current_position],
-                'Component': component,
-                'Volume': actual_volume_in_well
-            })
-            remaining_volume -= volume_this_well
-            if remaining_volume > 0:
-                current_position += 1
-
-        current_position += 1
-
-        # Add extra wells for this component, if specified
-        if component in extra_wells:
-            for _ in range(extra_wells[component]):
-                source_rows.append({
-                    'Well': well_positions[current_position],
-                    'Component': component,
-                    'Volume': well_capacity
-                })
-                current_position += 1
-
-    # Convert source well allocations to a DataFrame and pivot for the desired format
-    source_df = pd.DataFrame(source_rows)
-    source_df_pivoted = source_df.pivot(index='Well', columns='Component', values='Volume').fillna(0)
+    components = component_totals.index.to_numpy()
+    totals = component_totals.to_numpy(dtype=float)
+    dead = np.array([dead_volumes.get(component, default_dead_volume) for component in components], dtype=float)
+    capacities = np.array([well_capacities.get(component, default_well_capacity) for component in components], dtype=float)
+    extras = np.array([extra_wells.get(component, 0) for component in components], dtype=np.int64)
+    effective_capacities = capacities - dead
+    if ((effective_capacities <= 0) & (totals > 0)).any():
+        raise ValueError("Well capacities must be larger than dead volumes.")
+    
+    # Closed-form number of wells and volume of the last (partially filled) well of each component
+    num_volume_wells = np.where(totals > 0, np.ceil(totals / np.where(effective_capacities > 0, effective_capacities, 1)), 0).astype(np.int64)
+    last_volumes = totals - (num_volume_wells - 1) * effective_capacities + dead
+    
+    num_wells = num_volume_wells + extras
+    
+    # First well of each component, counted over the successive source plates
+    source_plate = Plate.from_dims(plate_dims)
+    wells_per_plate = source_plate.capacity(start_well)
+    starts = np.zeros(len(components), dtype=np.int64)
+    plate, used = 0, 0
+    for i, n in enumerate(num_wells):
+        if used > 0 and used + n > wells_per_plate and n <= wells_per_plate:
+            # Start the next plate rather than splitting a component that fits on one
+            plate, used = plate + 1, 0
+        starts[i] = plate * wells_per_plate + used
+        plate, used = plate + (used + n) // wells_per_plate, (used + n) % wells_per_plate
+    
+    # One row per source well
+    component_ids = np.repeat(np.arange(len(components)), num_wells)
+    positions = np.arange(num_wells.sum()) - np.repeat(np.cumsum(num_wells) - num_wells, num_wells) + starts[component_ids]
+    ranks = positions - starts[component_ids]
+    volumes = np.where(ranks == num_volume_wells[component_ids] - 1, last_volumes[component_ids], capacities[component_ids])
+    well_positions = np.asarray(source_plate.positions(wells_per_plate, start_well), dtype=object)
+    source_df = pd.DataFrame({
+        'Plate': positions // wells_per_plate + 1,
+        'Well': well_positions[positions % wells_per_plate],
+        'Component': components[component_ids],
+        'Volume': volumes
+    })
+    
+    # Pivot for the desired format, with the 'Plate' column only if several plates are used
+    index = ['Plate', 'Well'] if source_df['Plate'].nunique() > 1 else 'Well'
+    source_df_pivoted = source_df.pivot(index=index, columns='Component', values='Volume').fillna(0)
     source_df_pivoted.reset_index(inplace=True)
+    source_df_pivoted.columns.name = None
+    
+    return source_df_pivoted
 
-    # Ensure 'Well' is the first column
-    cols = ['Well'] + [col for col in source_df_pivoted.columns if col != 'Well']
-    source_df_final = source_df_pivoted[cols]
 
-    return source_df_final
+def destination_file_names(num_plates):
+    """
+    Names of the destination plate files: destination_plate.csv for a single plate,
+    destination_plate_1.csv, destination_plate_2.csv... otherwise.
+    """
+    if num_plates == 1:
+        return ['destination_plate.csv']
+    return [f'destination_plate_{plate + 1}.csv' for plate in range(num_plates)]
 
 
 def write_output_files(source_data, destination_data, output_folder):
     """
     Write the source and destination plate data to CSV files in the specified output folder.
     
+    With several destination plates, each plate is written to its own file, in
+    parallel, and a manifest (destination_plates.csv) lists the plates with their file
+    and number of wells.
+    
     Args:
         source_data (pd.DataFrame): DataFrame with source plate data.
-        destination_data (pd.DataFrame): DataFrame with destination plate data.
+        destination_data (pd.DataFrame or list): DataFrame with destination plate data, or one DataFrame per plate.
         output_folder (Path): Path to the output folder.
+    
+    Returns:
+        list: Paths of the files written.
     """
-    destination_path = output_folder / 'destination_plate.csv'
+    if isinstance(destination_data, pd.DataFrame):
+        destination_data = [destination_data]
+    destination_paths = [output_folder / name for name in destination_file_names(len(destination_data))]
     source_path = output_folder / 'source_plate.csv'
     
-    destination_data.to_csv(destination_path, index=False)
-    source_data.to_csv(source_path, index=False)
+    with ThreadPoolExecutor() as executor:
+        futures = [
+            executor.submit(plate_data.to_csv, path, index=False)
+            for plate_data, path in zip(destination_data, destination_paths)
+        ]
+        futures.append(executor.submit(source_data.to_csv, source_path, index=False))
+        for future in futures:
+            future.result()
     
-    print(f"Destination plate data written to {destination_path}")
+    if len(destination_data) > 1:
+        manifest_path = output_folder / 'destination_plates.csv'
+        pd.DataFrame({
+            'Plate': np.arange(1, len(destination_data) + 1),
+            'File': [path.name for path in destination_paths],
+            'Wells': [len(plate_data) for plate_data in destination_data],
+        }).to_csv(manifest_path, index=False)
+        for path in destination_paths:
+            print(f"Destination plate data written to {path}")
+        print(f"Destination plates manifest written to {manifest_path}")
+    else:
+        print(f"Destination plate data written to {destination_paths[0]}")
     print(f"Source plate data written to {source_path}")
+    return [str(path) for path in destination_paths + [source_path]] + ([str(manifest_path)] if len(destination_data) > 1 else [])
+
+
+def select_wells(destination_data, wells):
+    """
+    Select the rows of destination plate data for some wells.
+    
+    Args:
+        destination_data (pd.DataFrame): DataFrame with destination plate data.
+        wells (list): Well names (case-insensitive), e.g. of wells that failed QC.
+    
+    Returns:
+        pd.DataFrame: Rows of the wells, in the order of wells.
+    
+    Raises:
+        ValueError: If a well is not on the destination plate data.
+    """
+    wells = well_names(*well_indices(wells))
+    positions = pd.Index(well_names(*well_indices(destination_data['Well']))).get_indexer(wells)
+    if (positions < 0).any():
+        raise ValueError(f"Well(s) not in the destination plate: {', '.join(wells[positions < 0])}")
+    return destination_data.iloc[positions].reset_index(drop=True)
+
+
+def replan(destination_data, wells, dead_volumes_str, default_dead_volume, well_capacity_str, default_well_capacity, start_well, plate_dims='16x24'):
+    """
+    Re-plan some wells of a destination plate, e.g. wells that failed QC.
+    
+    Only the rows of the wells to redo are taken from the destination plate data; they
+    keep their well positions, on a new destination plate. The source wells holding the
+    volume they need are allocated from the starting well of a new source plate (see
+    prepare_source_plate), with the same dead volumes and capacities as the first run.
+    
+    Args:
+        destination_data (pd.DataFrame): DataFrame with destination plate data.
+        wells (list): Well names of the wells to redo.
+        dead_volumes_str (str): Dead volumes for specific components (format: component1=volume1,component2=volume2,...).
+        default_dead_volume (int): Default dead volume to use if not specified in dead_volumes_str.
+        well_capacity_str (str): Well capacities for specific components (format: component1=capacity1,component2=capacity2,...).
+        default_well_capacity (int): Default well capacity to use if not specified in well_capacity_str.
+        start_well (str): Starting well position on the new source plate.
+        plate_dims (str): Dimensions of the source plates (e.g., '16x24').
+    
+    Returns:
+        tuple: DataFrames with the source plate data and the destination plate data of the wells to redo.
+    """
+    replan_destination = select_wells(destination_data, wells)
+    replan_source = prepare_source_plate(replan_destination, dead_volumes_str, default_dead_volume, well_capacity_str, default_well_capacity, start_well, '', plate_dims)
+    return replan_source, replan_destination
+
+
+def design_plates(
+    sampling_data, sample_volume, start_well_src_plt='A1', start_well_dst_plt='A1',
+    plate_dims='16x24', well_capacity='', default_well_capacity=60000,
+    dead_volumes='', default_dead_volume=15000, num_replicates=1, extra_wells='', fill_order='column',
+    src_plate_dims=None):
+    """
+    Prepare the source and destination plates of a design, in memory.
+    
+    Args:
+        sampling_data (pd.DataFrame): Samples (see sampler), one column per component.
+        Other arguments as for main.
+    
+    Returns:
+        tuple: Source plate data (pd.DataFrame), and list of destination plate data (pd.DataFrame), one per plate.
+    """
+    # Prepare the destination plates data, on as many plates as needed
+    destination_data = prepare_destination_plates(sampling_data, start_well_dst_plt, plate_dims, sample_volume, num_replicates, fill_order)
+    
+    # Prepare the source plate data, shared by all destination plates
+    source_data = prepare_source_plate(pd.concat(destination_data, ignore_index=True), dead_volumes, default_dead_volume, well_capacity, default_well_capacity, start_well_src_plt, extra_wells, src_plate_dims or plate_dims)
+    return source_data, destination_data
 
 
 def main(
     sampling_file, sample_volume, start_well_src_plt='A1', start_well_dst_plt='A1', 
     plate_dims='16x24', well_capacity='', default_well_capacity=60000, 
-    dead_volumes='', default_dead_volume=15000, num_replicates=1, extra_wells='', output_folder='.'):
+    dead_volumes='', default_dead_volume=15000, num_replicates=1, extra_wells='', output_folder='.', fill_order='column',
+    src_plate_dims=None, replan_wells=None, replan_plate=None):
     """
     Main function to prepare source and destination well-plate mappings and write the results to files.
+    Designs that do not fit one destination plate are split across several plates.
     
     Args:
         sampling_file (str): Path to the sampling file.
@@ -215,15 +382,35 @@ def main(
         num_replicates (int): Number of wanted replicates.
         extra_wells (str): Extra wells for specific components in format component1=num1,component2=num2,...
         output_folder (str): Output folder for the result files.
+        fill_order (str): Fill the destination plate column by column ('column') or row by row ('row').
+        src_plate_dims (str): Source plate dimensions (Format: NxM), plate_dims if None.
+        replan_wells (str): Comma-separated wells of an existing destination plate of output_folder to redo (see replan).
+            Only <name>_replan.csv files are then written, next to the existing files which are left untouched.
+        replan_plate (int): Number of the destination plate of the wells to redo, when the design spans several plates.
     """
+    if replan_wells:
+        output_folder = Path(output_folder)
+        destination_path = output_folder / ('destination_plate.csv' if replan_plate is None else f'destination_plate_{replan_plate}.csv')
+        source_data, destination_data = replan(
+            pd.read_csv(destination_path), replan_wells.split(','), dead_volumes, default_dead_volume,
+            well_capacity, default_well_capacity, start_well_src_plt, src_plate_dims or plate_dims
+        )
+        replan_destination_path = destination_path.with_name(f"{destination_path.stem}_replan.csv")
+        replan_source_path = output_folder / 'source_plate_replan.csv'
+        destination_data.to_csv(replan_destination_path, index=False)
+        source_data.to_csv(replan_source_path, index=False)
+        print(f"Re-planned destination plate data written to {replan_destination_path}")
+        print(f"Re-planned source plate data written to {replan_source_path}")
+        return
+    
     # Read the sampling data from the specified file
     sampling_data = pd.read_csv(sampling_file)
     
-    # Prepare the destination plate data
-    destination_data = prepare_destination_plate(sampling_data, start_well_dst_plt, plate_dims, sample_volume, num_replicates)
-    
-    # Prepare the source plate data
-    source_data = prepare_source_plate(destination_data, dead_volumes, default_dead_volume, well_capacity, default_well_capacity, start_well_src_plt, extra_wells)
+    source_data, destination_data = design_plates(
+        sampling_data, sample_volume, start_well_src_plt, start_well_dst_plt, plate_dims, well_capacity,
+        default_well_capacity, dead_volumes, default_dead_volume, num_replicates, extra_wells, fill_order,
+        src_plate_dims
+    )
     
     # Write the output files to the specified output folder
     write_output_files(source_data, destination_data, Path(output_folder))
@@ -244,5 +431,9 @@ if __name__ == "__main__":
         default_dead_volume=args.default_dead_volume,
         num_replicates=args.num_replicates,
         extra_wells=args.extra_wells,
-        output_folder=args.output_folder
+        output_folder=args.output_folder,
+        fill_order=args.fill_order,
+        src_plate_dims=args.src_plate_dims,
+        replan_wells=args.replan,
+        replan_plate=args.replan_plate
     )
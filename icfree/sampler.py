@@ -1,14 +1,817 @@
 import argparse
 import pandas as pd
 import numpy as np
-import random
-from pyDOE2 import lhs
 import ast
+import json
+import os
+import sys
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from scipy.spatial import cKDTree
+from scipy.spatial.distance import pdist
+from scipy.stats import qmc
 
-def generate_lhs_samples(input_file, num_samples, step=None, ratios=None, fixed_values=None, seed=None):
+def discrete_ranges(components_df, step=None, ratios=None, fixed_values=None):
+    """
+    Builds the discrete range of values allowed for each component.
+    
+    Parameters:
+    - components_df: DataFrame with 'Component' and 'maxValue' columns.
+    - step: Step size for creating discrete ranges.
+    - ratios: List of ratios for creating discrete ranges.
+    - fixed_values: Dictionary of components with fixed values (optional).
+    
+    Returns:
+    - List of 1-D arrays, one per component, holding the values it can take.
+    """
+    ranges = []
+    for component_name, max_value in zip(components_df['Component'], components_df['maxValue']):
+        if fixed_values and component_name in fixed_values:
+            # If the component has a fixed value, use a single-element array
+            component_range = np.array([fixed_values[component_name]], dtype=float)
+        elif ratios is not None:
+            # Use ratios to create the discrete range
+            component_range = np.asarray(ratios, dtype=float) * max_value
+        else:
+            # Use step to create the discrete range
+            component_range = np.arange(0, max_value + step, step, dtype=float)
+        if component_range.size == 0:
+            raise IndexError(f"Component '{component_name}' has no value to sample from.")
+        ranges.append(component_range)
+    return ranges
+
+# Number of Feistel rounds used to build the keyed stratum permutations
+FEISTEL_ROUNDS = 6
+
+def _mix64(x):
+    """
+    SplitMix64 finalizer, used as the round function of the Feistel network.
+    """
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+def keyed_permutation(positions, size, keys):
+    """
+    Evaluates a pseudo-random permutation of range(size) at the given positions.
+    
+    The permutation is a balanced Feistel network over the smallest even-bit domain
+    covering size, restricted to range(size) by cycle walking. Any slice of the
+    permutation can therefore be computed without materializing the whole of it.
+    
+    Parameters:
+    - positions: Array of positions in range(size).
+    - size: Size of the permuted range.
+    - keys: Array of FEISTEL_ROUNDS uint64 round keys.
+    
+    Returns:
+    - Array of the permuted positions (int64).
+    """
+    half_bits = max(1, (int(size - 1).bit_length() + 1) // 2)
+    shift = np.uint64(half_bits)
+    mask = np.uint64((1 << half_bits) - 1)
+    keys = np.asarray(keys, dtype=np.uint64)
+
+    def encrypt(x):
+        left, right = x >> shift, x & mask
+        for key in keys:
+            left, right = right, left ^ (_mix64(right ^ key) & mask)
+        return (left << shift) | right
+
+    values = encrypt(np.asarray(positions, dtype=np.uint64))
+    # Cycle walking: re-encrypt the values that fell outside of range(size)
+    outside = np.flatnonzero(values >= np.uint64(size))
+    while outside.size:
+        values[outside] = encrypt(values[outside])
+        outside = outside[values[outside] >= np.uint64(size)]
+    return values.astype(np.int64)
+
+def iter_lhs_indices(level_counts, num_samples, rng, chunk_size):
+    """
+    Draws a Latin Hypercube design on the level indices of each component, chunk by chunk.
+    
+    Each component axis is cut into num_samples equiprobable strata, every stratum is
+    used exactly once, and the quantile drawn inside a stratum is mapped to the level
+    floor(quantile * number_of_levels). Strata are assigned to rows by keyed
+    permutations and the jitter comes from a counter-based Philox stream, so every
+    chunk is computed independently in O(chunk_size) memory and the concatenated
+    chunks do not depend on chunk_size.
+    
+    Parameters:
+    - level_counts: Number of discrete levels of each component.
+    - num_samples: Number of samples to generate.
+    - rng: numpy.random.Generator the permutation and jitter keys are drawn from.
+    - chunk_size: Number of rows per chunk.
+    
+    Yields:
+    - Arrays of shape (rows_in_chunk, num_components) with the level index of each sample.
+    """
+    level_counts = np.asarray(level_counts, dtype=np.int64)
+    num_components = level_counts.size
+    permutation_keys = rng.integers(0, 2**64, size=(num_components, FEISTEL_ROUNDS), dtype=np.uint64, endpoint=False)
+    jitter_key = int(rng.integers(0, 2**63))
+    for start in range(0, num_samples, chunk_size):
+        rows = np.arange(start, min(start + chunk_size, num_samples))
+        strata = np.column_stack([keyed_permutation(rows, num_samples, keys) for keys in permutation_keys]) \
+            if num_components else np.empty((rows.size, 0), dtype=np.int64)
+        # Jump the Philox stream to the first draw of this chunk (one counter step = 4 draws)
+        offset = start * num_components
+        bit_generator = np.random.Philox(key=jitter_key)
+        bit_generator.advance(offset // 4)
+        jitter_rng = np.random.Generator(bit_generator)
+        jitter_rng.random(offset % 4)
+        quantiles = (strata + jitter_rng.random(strata.shape)) / num_samples
+        yield np.minimum((quantiles * level_counts).astype(np.int64), level_counts - 1)
+
+def lhs_indices(level_counts, num_samples, rng):
+    """
+    Draws a Latin Hypercube design on the level indices of each component in one block.
+    
+    Parameters:
+    - level_counts: Number of discrete levels of each component.
+    - num_samples: Number of samples to generate.
+    - rng: numpy.random.Generator the permutation and jitter keys are drawn from.
+    
+    Returns:
+    - Array of shape (num_samples, num_components) with the level index of each sample.
+    """
+    blocks = list(iter_lhs_indices(level_counts, num_samples, rng, max(num_samples, 1)))
+    return blocks[0] if blocks else np.empty((0, len(level_counts)), dtype=np.int64)
+
+def iter_qmc_indices(level_counts, num_samples, method, seed=None, skip=0, chunk_size=None):
+    """
+    Draws a scrambled Sobol or Halton sequence on the level indices of each component, chunk by chunk.
+    
+    Only components with more than one level take a dimension of the sequence. The
+    points of a sequence only depend on the seed, so a design can be extended later
+    by drawing the same sequence again while skipping the points already used.
+    
+    Parameters:
+    - level_counts: Number of discrete levels of each component.
+    - num_samples: Number of samples to generate.
+    - method: 'sobol' or 'halton'.
+    - seed: Random seed of the scrambling.
+    - skip: Number of points of the sequence to skip.
+    - chunk_size: Number of rows per chunk (all rows at once if None).
+    
+    Yields:
+    - Arrays of shape (rows_in_chunk, num_components) with the level index of each sample.
+    """
+    level_counts = np.asarray(level_counts, dtype=np.int64)
+    varying = np.flatnonzero(level_counts > 1)
+    engine = None
+    if varying.size:
+        if method == 'sobol':
+            engine = qmc.Sobol(varying.size, scramble=True, seed=np.random.default_rng(seed))
+        elif method == 'halton':
+            engine = qmc.Halton(varying.size, scramble=True, seed=np.random.default_rng(seed))
+        else:
+            raise ValueError(f"Unknown method '{method}'. Use 'lhs', 'sobol' or 'halton'.")
+        if skip:
+            engine.fast_forward(skip)
+    chunk_size = chunk_size or max(num_samples, 1)
+    for start in range(0, num_samples, chunk_size):
+        indices = np.zeros((min(chunk_size, num_samples - start), level_counts.size), dtype=np.int64)
+        if engine is not None:
+            with warnings.catch_warnings():
+                # Sobol' balance warnings for sizes that are not powers of 2 do not apply to top-ups
+                warnings.simplefilter('ignore', UserWarning)
+                points = engine.random(len(indices))
+            indices[:, varying] = np.minimum((points * level_counts[varying]).astype(np.int64), level_counts[varying] - 1)
+        yield indices
+
+def qmc_indices(level_counts, num_samples, method, seed=None, skip=0):
+    """
+    Draws a scrambled Sobol or Halton sequence on the level indices of each component in one block.
+    
+    Parameters:
+    - level_counts: Number of discrete levels of each component.
+    - num_samples: Number of samples to generate.
+    - method: 'sobol' or 'halton'.
+    - seed: Random seed of the scrambling.
+    - skip: Number of points of the sequence to skip.
+    
+    Returns:
+    - Array of shape (num_samples, num_components) with the level index of each sample.
+    """
+    blocks = list(iter_qmc_indices(level_counts, num_samples, method, seed, skip))
+    return blocks[0] if blocks else np.empty((0, len(level_counts)), dtype=np.int64)
+
+def design_score(indices, level_counts, criterion):
+    """
+    Scores a design given as level indices; the higher the score, the better the design.
+    
+    Level indices are mapped to the centers of their level cells in the unit hypercube,
+    so components with a single level do not contribute to the score. Scores are tuples
+    compared in order, the second item breaking ties of the first: on coarse grids, many
+    designs share the same minimum distance (0 as soon as a sample is repeated), and the
+    one with the fewest pairs of samples at that distance is then preferred.
+    
+    Parameters:
+    - indices: Array of shape (num_samples, num_components) with level indices.
+    - level_counts: Number of discrete levels of each component.
+    - criterion: 'maximin' to maximize the minimum distance between samples, then minimize
+      the number of pairs at that distance, or 'correlation' to minimize the maximum, then
+      the mean, absolute correlation between components.
+    
+    Returns:
+    - Score of the design (tuple of two floats).
+    """
+    level_counts = np.asarray(level_counts)
+    varying = level_counts > 1
+    points = (indices[:, varying] + 0.5) / level_counts[varying]
+    if criterion == 'maximin':
+        if len(points) < 2:
+            return (0.0, 0.0)
+        distances = pdist(points, 'sqeuclidean')
+        shortest = distances.min()
+        num_shortest = np.count_nonzero(distances <= shortest * (1 + 1e-9) + 1e-12)
+        return (float(np.sqrt(shortest)), -float(num_shortest))
+    if criterion == 'correlation':
+        # Constant columns have no defined correlation, leave them out
+        points = points[:, points.std(axis=0) > 0]
+        if points.shape[1] < 2:
+            return (0.0, 0.0)
+        correlations = np.corrcoef(points, rowvar=False)
+        correlations = np.abs(correlations[np.triu_indices_from(correlations, k=1)])
+        return (-float(correlations.max()), -float(correlations.mean()))
+    raise ValueError(f"Unknown criterion '{criterion}'. Use 'maximin' or 'correlation'.")
+
+def _seed_sequence(seed):
+    """
+    Returns seed as a SeedSequence, seed being None, an integer or already a SeedSequence.
+    """
+    return seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+
+def _score_candidate(level_counts, num_samples, seed_sequence, criterion):
+    """
+    Draws one candidate LHS design and returns its score.
+    """
+    indices = lhs_indices(level_counts, num_samples, np.random.default_rng(seed_sequence))
+    return design_score(indices, level_counts, criterion)
+
+def optimized_lhs_indices(level_counts, num_samples, seed=None, criterion='maximin', iterations=100, n_jobs=None):
+    """
+    Draws several candidate LHS designs and keeps the best one for the given criterion.
+    
+    Each candidate uses its own child of a SeedSequence, so the result only depends on
+    the seed and the number of iterations, not on how candidates are spread over processes.
+    Candidates are scored in a process pool and only the winner is drawn again in the caller.
+    
+    Parameters:
+    - level_counts: Number of discrete levels of each component.
+    - num_samples: Number of samples to generate.
+    - seed: Random seed (or SeedSequence) for reproducibility.
+    - criterion: 'maximin' or 'correlation' (see design_score).
+    - iterations: Number of candidate designs.
+    - n_jobs: Number of worker processes (all cores if None, no pool if 1).
+    
+    Returns:
+    - Array of shape (num_samples, num_components) with the level index of each sample.
+    """
+    if iterations < 1:
+        raise ValueError("The number of iterations must be at least 1.")
+    seed_sequences = _seed_sequence(seed).spawn(iterations)
+    args = ([level_counts] * iterations, [num_samples] * iterations, seed_sequences, [criterion] * iterations)
+    if n_jobs == 1:
+        scores = list(map(_score_candidate, *args))
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            scores = list(executor.map(_score_candidate, *args, chunksize=max(1, iterations // 64)))
+    # First best score, ties of the first item being broken by the second one
+    best = max(range(iterations), key=scores.__getitem__)
+    return lhs_indices(level_counts, num_samples, np.random.default_rng(seed_sequences[best]))
+
+def parse_constraints(constraints_str):
+    """
+    Parses linear volume constraints.
+    
+    Parameters:
+    - constraints_str: Semicolon-separated constraints, each in format
+      component1=weight1,component2=weight2<=bound (e.g., "Hela lysate=1,Reaction mix=1<=1200").
+    
+    Returns:
+    - List of (weights, bound) tuples, weights being a dictionary of component weights.
+    """
+    constraints = []
+    if constraints_str:
+        for constraint in constraints_str.split(';'):
+            terms, bound = constraint.split('<=')
+            weights = {}
+            for term in terms.split(','):
+                component, weight = term.split('=')
+                weights[component.strip()] = float(weight)
+            constraints.append((weights, float(bound)))
+    return constraints
+
+def constraint_matrix(components, max_total_volume=None, constraints=None):
+    """
+    Builds the matrix form A.x <= b of the volume constraints.
+    
+    Parameters:
+    - components: List of component names, in column order.
+    - max_total_volume: Upper bound on the summed volume of all components (optional).
+    - constraints: List of (weights, bound) tuples as returned by parse_constraints (optional).
+    
+    Returns:
+    - Tuple of the constraint matrix (num_constraints x num_components) and the bounds.
+    """
+    components = list(components)
+    rows, bounds = [], []
+    if max_total_volume is not None:
+        rows.append(np.ones(len(components)))
+        bounds.append(float(max_total_volume))
+    for weights, bound in constraints or []:
+        row = np.zeros(len(components))
+        for component, weight in weights.items():
+            if component not in components:
+                raise ValueError(f"Component '{component}' of constraint not found in the input file.")
+            row[components.index(component)] = weight
+        rows.append(row)
+        bounds.append(bound)
+    return np.array(rows).reshape(-1, len(components)), np.array(bounds)
+
+def _conditional_indices(table, level_counts, A, b, tolerance, num_samples, rng):
+    """
+    Draws samples on sorted level tables so that the linear constraints stay satisfiable.
+    
+    Components are visited in a random order per sample. At each step, the interval of
+    levels of the visited component that still leaves room for every remaining component
+    at its most favorable level is computed for all samples at once, and the LHS quantile
+    of the sample is mapped into that interval. Samples for which the interval gets empty
+    (only possible with weights of mixed signs) are returned as infeasible.
+    
+    Returns:
+    - Tuple of the level indices in the sorted tables and a boolean feasibility mask.
+    """
+    num_components = len(level_counts)
+    lowest = np.minimum(A * table[:, 0], A * table[np.arange(num_components), level_counts - 1])
+    quantiles = (rng.permuted(np.broadcast_to(np.arange(num_samples), (num_components, num_samples)), axis=1).T
+                 + rng.random((num_samples, num_components))) / num_samples
+    order = rng.permuted(np.broadcast_to(np.arange(num_components), (num_samples, num_components)), axis=1)
+    remaining = np.broadcast_to(lowest.sum(axis=1), (num_samples, len(b))).copy()
+    partial = np.zeros((num_samples, len(b)))
+    indices = np.zeros((num_samples, num_components), dtype=np.int64)
+    feasible = np.ones(num_samples, dtype=bool)
+    for step in range(num_components):
+        for j in range(num_components):
+            rows = np.flatnonzero(order[:, step] == j)
+            if rows.size == 0:
+                continue
+            remaining[rows] -= lowest[:, j]
+            slack = b + tolerance - partial[rows] - remaining[rows]
+            weights = A[:, j]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                bounds = slack / weights
+            upper = np.min(np.where(weights > 0, bounds, np.inf), axis=1)
+            lower = np.max(np.where(weights < 0, bounds, -np.inf), axis=1)
+            levels = table[j, :level_counts[j]]
+            first = np.searchsorted(levels, lower, side='left')
+            stop = np.searchsorted(levels, upper, side='right')
+            valid = (stop > first) & np.all((weights != 0) | (slack >= 0), axis=1)
+            width = np.maximum(stop - first, 1)
+            chosen = np.minimum(first + (quantiles[rows, j] * width).astype(np.int64), level_counts[j] - 1)
+            indices[rows, j] = chosen
+            partial[rows] += np.multiply.outer(table[j, chosen], weights)
+            feasible[rows] &= valid
+    feasible &= (partial <= b + tolerance).all(axis=1)
+    return indices, feasible
+
+def feasible_lhs_indices(ranges, num_samples, rng, A, b, max_draws=None, max_batch_size=1000000,
+                         pilot_size=10000, min_acceptance_rate=0.05):
+    """
+    Draws LHS samples whose component values satisfy the linear constraints A.x <= b.
+    
+    Levels that cannot be part of any feasible sample, even with every other component
+    at its most favorable level, are pruned first. A pilot LHS batch then estimates the
+    fraction of feasible samples. Above min_acceptance_rate, LHS batches are drawn and
+    checked at once (rejection sampling), the size of the next batch being derived from
+    the acceptance rate observed so far. Below it, samples are built directly inside the
+    feasible region, component by component (see _conditional_indices), which keeps
+    large designs fast when feasible samples are rare.
+    
+    Parameters:
+    - ranges: List of discrete ranges, one per component.
+    - num_samples: Number of feasible samples to generate.
+    - rng: numpy.random.Generator.
+    - A: Constraint matrix (num_constraints x num_components).
+    - b: Constraint bounds.
+    - max_draws: Maximum number of samples drawn before giving up (default: max(1e6, 1000 * num_samples)).
+    - max_batch_size: Maximum number of samples drawn in a single batch.
+    - pilot_size: Number of samples of the pilot batch.
+    - min_acceptance_rate: Acceptance rate below which samples are built directly.
+    
+    Returns:
+    - Tuple of the level indices in ranges (num_samples x num_components) and the
+      acceptance rate of the LHS draws (the pilot estimate when samples are built directly).
+    """
+    num_components = len(ranges)
+    if max_draws is None:
+        max_draws = max(10**6, 1000 * num_samples)
+    tolerance = 1e-9 * np.maximum(1.0, np.abs(b))
+    # Sort the levels so that every constraint bounds them by an interval
+    orders = [np.argsort(r, kind='stable') for r in ranges]
+    # Contribution of each level to each constraint, and the most favorable one per component
+    contributions = [np.multiply.outer(A[:, j], r[o]) for j, (r, o) in enumerate(zip(ranges, orders))]
+    lowest = np.array([c.min(axis=1) for c in contributions]).T.reshape(len(b), num_components)
+    kept_levels = []
+    for j, c in enumerate(contributions):
+        slack = b + tolerance - (lowest.sum(axis=1) - lowest[:, j])
+        kept = orders[j][(c <= slack[:, None]).all(axis=0)]
+        if kept.size == 0:
+            raise ValueError("No sample can satisfy the volume constraints.")
+        kept_levels.append(kept)
+    level_counts = np.array([k.size for k in kept_levels])
+    table = np.zeros((num_components, level_counts.max(initial=1)))
+    for j, kept in enumerate(kept_levels):
+        table[j, :kept.size] = ranges[j][kept]
+        table[j, kept.size:] = table[j, kept.size - 1]
+
+    def check(indices):
+        values = table[np.arange(num_components), indices]
+        return (values @ A.T <= b + tolerance).all(axis=1)
+
+    accepted, num_accepted, num_drawn = [], 0, 0
+    # Pilot batch to choose between rejection and direct sampling
+    batch_size = min(max(num_samples, pilot_size), max_batch_size)
+    indices = lhs_indices(level_counts, batch_size, rng)
+    feasible = check(indices)
+    acceptance_rate = feasible.mean() if batch_size else 1.0
+    if acceptance_rate >= min_acceptance_rate:
+        accepted.append(indices[feasible])
+        num_accepted, num_drawn = int(feasible.sum()), batch_size
+        while num_accepted < num_samples:
+            if num_drawn >= max_draws:
+                raise ValueError(
+                    f"Only {num_accepted} feasible samples found out of {num_drawn} draws, "
+                    f"{num_samples} requested. Relax the volume constraints."
+                )
+            rate = num_accepted / num_drawn
+            batch_size = int(min(max_batch_size, np.ceil(1.2 * (num_samples - num_accepted) / rate) + 1))
+            indices = lhs_indices(level_counts, batch_size, rng)
+            feasible = check(indices)
+            accepted.append(indices[feasible])
+            num_accepted += int(feasible.sum())
+            num_drawn += batch_size
+        acceptance_rate = num_accepted / num_drawn
+    else:
+        num_drawn = 0
+        while num_accepted < num_samples:
+            if num_drawn >= max_draws:
+                raise ValueError(
+                    f"Only {num_accepted} feasible samples found out of {num_drawn} draws, "
+                    f"{num_samples} requested. Relax the volume constraints."
+                )
+            batch_size = min(num_samples - num_accepted, max_batch_size)
+            indices, feasible = _conditional_indices(table, level_counts, A, b, tolerance, batch_size, rng)
+            accepted.append(indices[feasible])
+            num_accepted += int(feasible.sum())
+            num_drawn += batch_size
+    indices = np.concatenate(accepted)[:num_samples] if accepted else np.empty((0, num_components), dtype=np.int64)
+    # Map the indices back from the kept levels to the full ranges
+    indices = np.column_stack([kept[indices[:, j]] for j, kept in enumerate(kept_levels)]) \
+        if num_components else indices
+    return indices, float(acceptance_rate)
+
+def grid_size(level_counts):
+    """
+    Returns the number of points of the full grid of component levels (exact integer).
+    """
+    size = 1
+    for count in level_counts:
+        size *= int(count)
+    return size
+
+def _strides(level_counts):
+    """
+    Returns the mixed-radix place values of each component, the last component varying fastest.
+    """
+    if grid_size(level_counts) >= 2**63:
+        raise ValueError("The grid of component levels is too large to be encoded on 64-bit integers.")
+    level_counts = np.asarray(level_counts, dtype=np.int64)
+    return np.concatenate([np.cumprod(level_counts[:0:-1])[::-1], [1]]).astype(np.int64) \
+        if level_counts.size else np.empty(0, dtype=np.int64)
+
+def encode_indices(indices, level_counts):
+    """
+    Encodes rows of level indices as single int64 codes (mixed-radix index in the grid).
+    
+    Parameters:
+    - indices: Array of shape (num_samples, num_components) with level indices.
+    - level_counts: Number of discrete levels of each component.
+    
+    Returns:
+    - Array of num_samples int64 codes.
+    """
+    return np.asarray(indices, dtype=np.int64) @ _strides(level_counts)
+
+def decode_codes(codes, level_counts):
+    """
+    Decodes int64 grid codes back into rows of level indices (inverse of encode_indices).
+    
+    Parameters:
+    - codes: Array of int64 codes.
+    - level_counts: Number of discrete levels of each component.
+    
+    Returns:
+    - Array of shape (num_codes, num_components) with level indices.
+    """
+    codes = np.asarray(codes, dtype=np.int64)
+    return (codes[:, None] // _strides(level_counts)) % np.asarray(level_counts, dtype=np.int64)
+
+def _row_keys(indices, level_counts):
+    """
+    Returns one comparable key per row: its grid code, or its raw bytes when the grid
+    is too large to be encoded on 64-bit integers.
+    """
+    if grid_size(level_counts) < 2**63:
+        return encode_indices(indices, level_counts)
+    indices = np.ascontiguousarray(indices, dtype=np.int64)
+    return indices.view(np.dtype((np.void, indices.dtype.itemsize * indices.shape[1]))).ravel()
+
+def unique_indices(indices, level_counts, num_samples, draw, max_rounds=1000, exclude=None):
+    """
+    Removes duplicate samples and replaces them by new, unseen grid points.
+    
+    Rows are compared through their int64 grid codes, so uniqueness checks are integer
+    operations on sorted arrays instead of row comparisons. The first occurrence of
+    each code is kept in place and missing samples are drawn with draw until the
+    design holds num_samples distinct grid points.
+    
+    Parameters:
+    - indices: Array of shape (num_drawn, num_components) with level indices.
+    - level_counts: Number of discrete levels of each component.
+    - num_samples: Number of distinct samples wanted.
+    - draw: Function drawing an array of k candidate rows of level indices.
+    - max_rounds: Maximum number of draws before giving up.
+    - exclude: Array of rows of level indices the samples must also differ from,
+      e.g. an existing design being augmented (optional).
+    
+    Returns:
+    - Array of shape (num_samples, num_components) with distinct level indices.
+    """
+    keys = _row_keys(indices, level_counts)
+    excluded = np.unique(_row_keys(exclude, level_counts)) if exclude is not None else keys[:0]
+    if num_samples > grid_size(level_counts) - excluded.size:
+        raise ValueError(
+            f"Cannot draw {num_samples} distinct samples from a grid of {grid_size(level_counts)} points"
+            + (f" of which {excluded.size} are excluded." if excluded.size else ".")
+        )
+    _, first = np.unique(keys, return_index=True)
+    first = np.sort(first)
+    first = first[~np.isin(keys[first], excluded)][:num_samples]
+    seen = np.union1d(excluded, keys[first])
+    rows = [np.asarray(indices)[first]]
+    num_missing = num_samples - first.size
+    for _ in range(max_rounds):
+        if num_missing == 0:
+            break
+        candidates = draw(2 * num_missing + 16)
+        keys = _row_keys(candidates, level_counts)
+        _, first = np.unique(keys, return_index=True)
+        first = np.sort(first)
+        first = first[~np.isin(keys[first], seen, assume_unique=True)][:num_missing]
+        rows.append(candidates[first])
+        seen = np.union1d(seen, keys[first])
+        num_missing -= first.size
+    if num_missing:
+        raise ValueError(f"Could not find {num_samples} distinct samples, {num_missing} missing.")
+    return np.concatenate(rows).astype(np.int64)
+
+def _uniform_grid_draw(level_counts, rng):
+    """
+    Returns a function drawing k uniformly random grid points.
+    
+    When the grid is small, points are drawn without replacement from the whole grid
+    so that nearly exhausting it stays fast.
+    """
+    level_counts = np.asarray(level_counts, dtype=np.int64)
+    total = grid_size(level_counts)
+
+    def draw(k):
+        if total <= 4 * k:
+            return decode_codes(rng.permutation(total), level_counts)
+        return rng.integers(0, level_counts, size=(k, level_counts.size))
+    return draw
+
+# Largest number of rows a factorial design is allowed to hold
+MAX_FACTORIAL_SIZE = 10**7
+
+FACTORIAL_METHODS = ('full_factorial', 'fractional_factorial')
+
+def _check_factorial_size(size, max_size):
+    """
+    Raises a ValueError if a factorial design would hold more than max_size rows.
+    """
+    if size > max_size:
+        raise ValueError(
+            f"The factorial design holds {size} rows, more than the limit of {max_size}. "
+            "Use a fraction, a coarser step, or a sampled design."
+        )
+
+def iter_full_factorial_indices(level_counts, chunk_size=None, max_size=MAX_FACTORIAL_SIZE):
+    """
+    Enumerates every point of the grid of component levels, chunk by chunk.
+    
+    Grid points are produced by decoding consecutive mixed-radix codes, the last
+    component varying fastest, so no Python loop runs over rows or components.
+    
+    Parameters:
+    - level_counts: Number of discrete levels of each component.
+    - chunk_size: Number of rows per chunk (all rows at once if None).
+    - max_size: Maximum number of rows of the design.
+    
+    Yields:
+    - Arrays of shape (rows_in_chunk, num_components) with level indices.
+    """
+    size = grid_size(level_counts)
+    _check_factorial_size(size, max_size)
+    chunk_size = chunk_size or max(size, 1)
+    for start in range(0, size, chunk_size):
+        yield decode_codes(np.arange(start, min(start + chunk_size, size)), level_counts)
+
+def full_factorial_indices(level_counts, max_size=MAX_FACTORIAL_SIZE):
+    """
+    Enumerates every point of the grid of component levels.
+    
+    Parameters:
+    - level_counts: Number of discrete levels of each component.
+    - max_size: Maximum number of rows of the design.
+    
+    Returns:
+    - Array of shape (grid_size, num_components) with level indices, the last component varying fastest.
+    """
+    _check_factorial_size(grid_size(level_counts), max_size)
+    return np.indices(level_counts, dtype=np.int64).reshape(len(level_counts), -1).T
+
+def fractional_factorial_size(level_counts, fraction):
+    """
+    Returns the number of rows of the 1/fraction fractional factorial design (see
+    fractional_factorial_indices): the number of grid points whose level indices sum to
+    0 modulo fraction, counted by convolving the residues of the components (exact integer).
+    """
+    if fraction < 2:
+        return grid_size(level_counts)
+    counts = [1] + [0] * (fraction - 1)
+    for level_count in level_counts:
+        # Number of levels of the component with each residue modulo fraction
+        residues = [len(range(r, int(level_count), fraction)) for r in range(fraction)]
+        counts = [sum(counts[(r - q) % fraction] * residues[q] for q in range(fraction)) for r in range(fraction)]
+    return counts[0]
+
+def fractional_factorial_indices(level_counts, fraction, max_size=MAX_FACTORIAL_SIZE):
+    """
+    Builds a regular 1/fraction fraction of the full factorial design.
+    
+    The fraction keeps the grid points whose level indices sum to 0 modulo fraction.
+    It is generated directly, without enumerating the full grid: one component is
+    solved from the others, the last one whose number of levels is a multiple of
+    fraction if any, which then keeps exactly 1/fraction of the grid with every level of
+    the other components appearing equally often. Otherwise the component with the
+    most levels is solved and the fraction holds about 1/fraction of the grid (see
+    fractional_factorial_size).
+    
+    Parameters:
+    - level_counts: Number of discrete levels of each component.
+    - fraction: Inverse of the fraction of the full grid to keep (2 keeps half of it).
+    - max_size: Maximum number of rows of the design.
+    
+    Returns:
+    - Array of shape (fractional_factorial_size, num_components) with level indices.
+    """
+    level_counts = np.asarray(level_counts, dtype=np.int64)
+    if fraction < 2 or level_counts.size == 0:
+        return full_factorial_indices(level_counts, max_size)
+    _check_factorial_size(fractional_factorial_size(level_counts, fraction), max_size)
+    candidates = np.flatnonzero(level_counts % fraction == 0)
+    solved = candidates[-1] if candidates.size else level_counts.size - 1 - np.argmax(level_counts[::-1])
+    others = np.delete(np.arange(level_counts.size), solved)
+    base = full_factorial_indices(level_counts[others], max_size * fraction) if others.size \
+        else np.zeros((1, 0), dtype=np.int64)
+    residue = (-base.sum(axis=1)) % fraction
+    # Each point of the other components is completed by every compatible level of the solved one
+    num_levels = np.maximum(level_counts[solved] - residue + fraction - 1, 0) // fraction
+    starts = np.cumsum(num_levels) - num_levels
+    offsets = np.arange(num_levels.sum()) - np.repeat(starts, num_levels)
+    indices = np.empty((offsets.size, level_counts.size), dtype=np.int64)
+    indices[:, others] = np.repeat(base, num_levels, axis=0)
+    indices[:, solved] = np.repeat(residue, num_levels) + fraction * offsets
+    return indices
+
+def indices_to_samples(ranges, indices, columns):
+    """
+    Converts a matrix of level indices into a DataFrame of component values.
+    
+    Parameters:
+    - ranges: List of discrete ranges, one per component.
+    - indices: Array of shape (num_samples, num_components) with level indices.
+    - columns: Component names.
+    
+    Returns:
+    - DataFrame containing the samples.
+    """
+    level_counts = [r.size for r in ranges]
+    # Pad every range into a single table so all components are gathered at once
+    table = np.zeros((len(ranges), max(level_counts, default=1)))
+    for i, component_range in enumerate(ranges):
+        table[i, :component_range.size] = component_range
+    samples = table[np.arange(len(ranges)), indices]
+    return pd.DataFrame(samples, columns=columns)
+
+def read_components(input_file):
+    """
+    Reads the input file containing components and their max values (tab-separated);
+    a DataFrame is returned as is.
+    """
+    if isinstance(input_file, pd.DataFrame):
+        return input_file
+    return pd.read_csv(input_file, sep='\t')
+
+def generate_lhs_samples(input_file, num_samples, step=None, ratios=None, fixed_values=None, seed=None,
+                         criterion=None, iterations=100, n_jobs=None, max_total_volume=None, constraints=None,
+                         method='lhs', skip=0, unique=False, fraction=1):
     """
     Generates Latin Hypercube Samples for components based on discrete ranges.
     
+    Parameters:
+    - input_file: Path to the input file containing components and their max values, or
+      DataFrame of its contents.
+    - num_samples: Number of samples to generate.
+    - step: Step size for creating discrete ranges.
+    - ratios: List of ratios for creating discrete ranges.
+    - fixed_values: Dictionary of components with fixed values (optional).
+    - seed: Random seed (or numpy SeedSequence) for reproducibility.
+    - criterion: 'maximin' or 'correlation' to keep the best of several designs (optional).
+    - iterations: Number of candidate designs drawn when a criterion is given.
+    - n_jobs: Number of worker processes used to score candidate designs.
+    - max_total_volume: Upper bound on the summed volume of the components of a sample (optional).
+    - constraints: List of (weights, bound) linear constraints, see parse_constraints (optional).
+    - method: 'lhs' for Latin Hypercube Sampling, 'sobol' or 'halton' for scrambled
+      low-discrepancy sequences, 'full_factorial' or 'fractional_factorial' to enumerate
+      the grid (num_samples is then ignored).
+    - skip: Number of points of the Sobol or Halton sequence to skip, to extend a design.
+    - unique: If True, duplicate samples are replaced by new grid points so that no
+      experiment is repeated.
+    - fraction: Inverse of the fraction of the grid kept by 'fractional_factorial'.
+    
+    Returns:
+    - DataFrame containing the generated samples. When volume constraints are given,
+      the acceptance rate of unconstrained draws (or the fraction of the factorial
+      design kept) is stored in attrs['acceptance_rate'].
+    """
+    components_df = read_components(input_file)
+    
+    # Generate discrete ranges for each component
+    ranges = discrete_ranges(components_df, step, ratios, fixed_values)
+    level_counts = [r.size for r in ranges]
+    
+    # Draw the Latin Hypercube design directly in level-index space
+    rng = np.random.default_rng(seed)
+    draw = _uniform_grid_draw(level_counts, rng)
+    acceptance_rate = None
+    if method in FACTORIAL_METHODS:
+        if method == 'full_factorial':
+            indices = full_factorial_indices(level_counts)
+        else:
+            indices = fractional_factorial_indices(level_counts, fraction)
+        if max_total_volume is not None or constraints:
+            # Keep the feasible grid points only
+            A, b = constraint_matrix(components_df['Component'], max_total_volume, constraints)
+            values = indices_to_samples(ranges, indices, components_df['Component']).to_numpy()
+            feasible = (values @ A.T <= b + 1e-9 * np.maximum(1.0, np.abs(b))).all(axis=1)
+            acceptance_rate = feasible.mean() if feasible.size else 1.0
+            indices = indices[feasible]
+    elif method != 'lhs' and (criterion or max_total_volume is not None or constraints):
+        raise ValueError("Design criteria and volume constraints are only available with the 'lhs' method.")
+    elif method != 'lhs':
+        indices = qmc_indices(level_counts, num_samples, method, seed, skip)
+    elif max_total_volume is not None or constraints:
+        if criterion:
+            raise ValueError("Design criteria cannot be combined with volume constraints.")
+        A, b = constraint_matrix(components_df['Component'], max_total_volume, constraints)
+        indices, acceptance_rate = feasible_lhs_indices(ranges, num_samples, rng, A, b)
+        draw = lambda k: feasible_lhs_indices(ranges, k, rng, A, b)[0]
+    elif criterion:
+        indices = optimized_lhs_indices(level_counts, num_samples, seed, criterion, iterations, n_jobs)
+    else:
+        indices = lhs_indices(level_counts, num_samples, rng)
+    
+    if unique and method not in FACTORIAL_METHODS:
+        indices = unique_indices(indices, level_counts, num_samples, draw)
+    
+    samples_df = indices_to_samples(ranges, indices, components_df['Component'])
+    if acceptance_rate is not None:
+        samples_df.attrs['acceptance_rate'] = acceptance_rate
+    return samples_df
+
+def iter_lhs_samples(input_file, num_samples, step=None, ratios=None, fixed_values=None, seed=None, chunk_size=100000,
+                     method='lhs', skip=0):
+    """
+    Generates Latin Hypercube Samples chunk by chunk with bounded memory.
+    
+    The concatenated chunks are identical to the output of generate_lhs_samples
+    for the same seed, whatever the chunk size.
+    
     Parameters:
     - input_file: Path to the input file containing components and their max values.
     - num_samples: Number of samples to generate.
@@ -16,53 +819,361 @@ def generate_lhs_samples(input_file, num_samples, step=None, ratios=None, fixed_
     - ratios: List of ratios for creating discrete ranges.
     - fixed_values: Dictionary of components with fixed values (optional).
     - seed: Random seed for reproducibility.
+    - chunk_size: Number of samples per chunk.
+    - method: 'lhs', 'sobol', 'halton' or 'full_factorial' (num_samples is then ignored).
+    - skip: Number of points of the Sobol or Halton sequence to skip.
+    
+    Yields:
+    - DataFrames of at most chunk_size samples.
+    """
+    components_df = pd.read_csv(input_file, sep='\t')
+    ranges = discrete_ranges(components_df, step, ratios, fixed_values)
+    level_counts = [r.size for r in ranges]
+    if method == 'lhs':
+        blocks = iter_lhs_indices(level_counts, num_samples, np.random.default_rng(seed), chunk_size)
+    elif method == 'full_factorial':
+        blocks = iter_full_factorial_indices(level_counts, chunk_size)
+    else:
+        blocks = iter_qmc_indices(level_counts, num_samples, method, seed, skip, chunk_size)
+    for indices in blocks:
+        yield indices_to_samples(ranges, indices, components_df['Component'])
+
+def snap_to_levels(values, component_range):
+    """
+    Returns the index, in component_range, of the level nearest to each value.
+    """
+    order = np.argsort(component_range, kind='stable')
+    levels = component_range[order]
+    upper = np.clip(np.searchsorted(levels, values), 0, levels.size - 1)
+    lower = np.maximum(upper - 1, 0)
+    nearest = np.where(np.abs(values - levels[lower]) <= np.abs(values - levels[upper]), lower, upper)
+    return order[nearest]
+
+def least_covered_levels(counts, num_samples, rng):
+    """
+    Picks levels for new samples so that the coverage of the levels gets as even as possible.
+    
+    Levels are filled up like water: the lowest-covered levels first, up to the level
+    count where num_samples new samples are used, ties being broken at random.
+    
+    Parameters:
+    - counts: Number of existing samples at each level.
+    - num_samples: Number of new samples.
+    - rng: numpy.random.Generator.
     
     Returns:
-    - DataFrame containing the generated samples.
+    - Array of num_samples level indices in random order.
     """
-    # Set the random seed for reproducibility across numpy and random
-    if seed is not None:
-        np.random.seed(seed)
-        random.seed(seed)
+    counts = np.asarray(counts, dtype=np.int64)
+    if num_samples == 0:
+        return np.empty(0, dtype=np.int64)
+    # Smallest height h such that filling every level up to h takes at least num_samples samples
+    low, high = int(counts.min()), int(counts.min()) + num_samples
+    while low < high:
+        middle = (low + high) // 2
+        if np.maximum(middle - counts, 0).sum() >= num_samples:
+            high = middle
+        else:
+            low = middle + 1
+    allocation = np.maximum(low - 1 - counts, 0)
+    ties = np.flatnonzero(counts <= low - 1)
+    allocation[rng.choice(ties, num_samples - allocation.sum(), replace=False)] += 1
+    return rng.permutation(np.repeat(np.arange(counts.size), allocation))
+
+def augment_samples(input_file, sampling_file, num_samples, step=None, ratios=None, fixed_values=None, seed=None,
+                    max_total_volume=None, constraints=None, unique=False, max_repairs=20):
+    """
+    Generates new samples that complete an existing design without modifying it.
     
-    # Read the input file
+    The existing values of each component are snapped to its discrete levels and
+    counted; the new samples then fill the least-covered levels of each component
+    (see least_covered_levels), levels being paired at random across components as in
+    a Latin Hypercube, so the combined design stays close to a Latin one. Apart from
+    one vectorized pass to count the existing levels, the work only depends on
+    num_samples.
+    
+    With volume constraints, the levels of the infeasible new samples are paired again
+    among themselves, which keeps the coverage of every level, up to max_repairs times;
+    the samples still infeasible are then replaced by feasible LHS samples (see
+    feasible_lhs_indices). With unique, new samples repeating an existing sample or
+    another new one are replaced as in a fresh design (see unique_indices).
+    
+    Parameters:
+    - input_file: Path to the input file containing components and their max values.
+    - sampling_file: Path to the existing sampling CSV file.
+    - num_samples: Number of samples to add.
+    - step: Step size for creating discrete ranges.
+    - ratios: List of ratios for creating discrete ranges.
+    - fixed_values: Dictionary of components with fixed values (optional).
+    - seed: Random seed (or numpy SeedSequence) for reproducibility.
+    - max_total_volume: Upper bound on the summed volume of the components of a new sample (optional).
+    - constraints: List of (weights, bound) linear constraints, see parse_constraints (optional).
+    - unique: If True, no new sample repeats an existing or another new sample.
+    - max_repairs: Maximum number of times the levels of infeasible new samples are paired again.
+    
+    Returns:
+    - DataFrame containing the new samples, with the columns of the existing file.
+    """
+    rng = np.random.default_rng(seed)
     components_df = pd.read_csv(input_file, sep='\t')
+    components = components_df['Component'].tolist()
+    ranges = discrete_ranges(components_df, step, ratios, fixed_values)
+    level_counts = [r.size for r in ranges]
+    existing_df = pd.read_csv(sampling_file)
+    if sorted(existing_df.columns) != sorted(components):
+        raise ValueError(f"Columns of {sampling_file} do not match the components of {input_file}.")
+    existing = np.column_stack([snap_to_levels(existing_df[component].to_numpy(dtype=float), component_range)
+                                for component, component_range in zip(components, ranges)])
+    indices = np.column_stack([
+        least_covered_levels(np.bincount(existing[:, j], minlength=component_range.size), num_samples, rng)
+        for j, component_range in enumerate(ranges)
+    ]).reshape(num_samples, len(ranges))
+    draw = _uniform_grid_draw(level_counts, rng)
+    if max_total_volume is not None or constraints:
+        A, b = constraint_matrix(components, max_total_volume, constraints)
+        tolerance = 1e-9 * np.maximum(1.0, np.abs(b))
+
+        def infeasible(rows):
+            values = indices_to_samples(ranges, rows, components).to_numpy()
+            return np.flatnonzero(~(values @ A.T <= b + tolerance).all(axis=1))
+
+        rows = infeasible(indices)
+        for _ in range(max_repairs):
+            if rows.size < 2:
+                break
+            indices[rows] = rng.permuted(indices[rows], axis=0)
+            rows = rows[infeasible(indices[rows])]
+        if rows.size:
+            indices[rows] = feasible_lhs_indices(ranges, rows.size, rng, A, b)[0]
+        draw = lambda k: feasible_lhs_indices(ranges, k, rng, A, b)[0]
+    if unique:
+        indices = unique_indices(indices, level_counts, num_samples, draw, exclude=existing)
+    return indices_to_samples(ranges, indices, components)[existing_df.columns]
+
+MAX_DISCREPANCY_ROWS = 5000
+
+def quality_report(samples_df, ranges, components, max_discrepancy_rows=MAX_DISCREPANCY_ROWS, seed=0):
+    """
+    Computes quality metrics of a design.
     
-    # Initialize a list to hold the discrete ranges for each component
-    discrete_ranges = []
+    Samples are snapped to their nearest levels and mapped to the centers of their level
+    cells in the unit hypercube, as in design_score, components with a single level being
+    left out. Nearest-neighbour distances are queried from a KD-tree built on the distinct
+    samples, so duplicates are counted apart and do not zero the minimum distance. The
+    centered L2 discrepancy costs O(n^2): above max_discrepancy_rows samples, it is
+    estimated on a random subset of that size.
     
-    # Generate discrete ranges for each component
-    for index, row in components_df.iterrows():
-        component_name = row['Component']
-        max_value = row['maxValue']
-        if fixed_values and component_name in fixed_values:
-            # If the component has a fixed value, use a single-element array
-            component_range = np.array([fixed_values[component_name]])
-        else:
-            if ratios is not None:
-                # Use ratios to create the discrete range
-                component_range = np.array([r * max_value for r in ratios])
-            else:
-                # Use step to create the discrete range
-                component_range = np.arange(0, max_value + step, step)
-        discrete_ranges.append(component_range)
-    
-    # Determine the number of components
-    num_components = len(discrete_ranges)
-    
-    # Generate the Latin Hypercube Sampling matrix
-    lhs_matrix = lhs(n=num_components, samples=num_samples, criterion='center', random_state=seed)
-    
-    # Map LHS samples to the discrete ranges
-    samples = np.zeros((num_samples, num_components))
-    for i in range(num_components):
-        samples[:, i] = [random.choice(discrete_ranges[i]) for _ in lhs_matrix[:, i]]
-    
-    # Create a DataFrame for the samples
-    samples_df = pd.DataFrame(samples, columns=components_df['Component'])
-    return samples_df
+    Parameters:
+    - samples_df: DataFrame of samples, with one column per component.
+    - ranges: Discrete ranges of the components (see discrete_ranges).
+    - components: Names of the components, in the order of ranges.
+    - max_discrepancy_rows: Maximum number of samples the discrepancy is computed on.
+    - seed: Random seed of the subset used to estimate the discrepancy.
+    
+    Returns:
+    - Dictionary with the metrics, ready to be dumped to JSON.
+    """
+    missing = [component for component in components if component not in samples_df.columns]
+    if missing:
+        raise ValueError(f"Components missing from the samples: {', '.join(missing)}.")
+    level_counts = [component_range.size for component_range in ranges]
+    indices = np.column_stack([
+        snap_to_levels(samples_df[component].to_numpy(dtype=float), component_range)
+        for component, component_range in zip(components, ranges)
+    ]) if len(samples_df) else np.empty((0, len(components)), dtype=np.int64)
+    num_samples = len(indices)
+    
+    coverage = {}
+    for j, (component, component_range) in enumerate(zip(components, ranges)):
+        counts = np.bincount(indices[:, j], minlength=component_range.size)
+        coverage[component] = {
+            'levels': component_range.tolist(),
+            'counts': counts.tolist(),
+            'levels_covered': int(np.count_nonzero(counts)),
+        }
+    
+    unique = np.unique(_row_keys(indices, level_counts), return_index=True)[1]
+    distinct = indices[np.sort(unique)]
+    counts_array = np.asarray(level_counts)
+    varying = counts_array > 1
+    points = (distinct[:, varying] + 0.5) / counts_array[varying]
+    
+    report = {
+        'num_samples': num_samples,
+        'num_duplicates': int(num_samples - len(distinct)),
+        'min_distance': None,
+        'mean_distance': None,
+        'centered_l2_discrepancy': None,
+        'discrepancy_sample_size': 0,
+        'coverage': coverage,
+    }
+    if len(points) >= 2 and points.shape[1] > 0:
+        distances = cKDTree(points).query(points, k=2, workers=-1)[0][:, 1]
+        report['min_distance'] = float(distances.min())
+        report['mean_distance'] = float(distances.mean())
+    if num_samples > 0 and varying.any():
+        all_points = (indices[:, varying] + 0.5) / counts_array[varying]
+        if num_samples > max_discrepancy_rows:
+            rng = np.random.default_rng(seed)
+            all_points = all_points[rng.choice(num_samples, max_discrepancy_rows, replace=False)]
+        report['centered_l2_discrepancy'] = float(qmc.discrepancy(all_points, method='CD', workers=-1))
+        report['discrepancy_sample_size'] = len(all_points)
+    return report
+
+def read_samples(sampling_file):
+    """
+    Reads a sampling file, in Parquet format if it ends with .parquet and CSV otherwise.
+    """
+    if sampling_file.endswith('.parquet'):
+        return pd.read_parquet(sampling_file)
+    return pd.read_csv(sampling_file)
+
+def write_report(input_file, sampling_file, report_file=None, step=None, ratios=None, fixed_values=None):
+    """
+    Writes the quality report of a sampling file to a JSON file.
+    
+    Parameters:
+    - input_file: Path to the input file containing components and their max values.
+    - sampling_file: Path to the sampling file to assess.
+    - report_file: Path to the JSON report; printed to the standard output if None.
+    - step: Step size for creating discrete ranges.
+    - ratios: List of ratios for creating discrete ranges.
+    - fixed_values: Dictionary of components with fixed values (optional).
+    
+    Returns:
+    - Dictionary with the metrics (see quality_report).
+    """
+    components_df = pd.read_csv(input_file, sep='\t')
+    ranges = discrete_ranges(components_df, step, ratios, fixed_values)
+    report = quality_report(read_samples(sampling_file), ranges, components_df['Component'].tolist())
+    if report_file is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(report_file, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Quality report saved to {report_file}")
+    return report
+
+def write_samples(chunks, output_file):
+    """
+    Writes sample chunks one after the other to a CSV or Parquet file.
+    
+    CSV chunks are appended to the file, so the result is byte-identical to writing
+    the concatenated samples in one go. Parquet output requires pyarrow.
+    
+    Parameters:
+    - chunks: Iterable of sample DataFrames.
+    - output_file: Path to the output file (.parquet for Parquet, CSV otherwise).
+    
+    Returns:
+    - Number of samples written.
+    """
+    num_written = 0
+    if str(output_file).endswith('.parquet'):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Writing Parquet files requires the 'pyarrow' package.") from e
+        writer = None
+        try:
+            for chunk in chunks:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(output_file, table.schema)
+                writer.write_table(table)
+                num_written += len(chunk)
+        finally:
+            if writer is not None:
+                writer.close()
+    else:
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(output_file, index=False, mode='w' if i == 0 else 'a', header=(i == 0))
+            num_written += len(chunk)
+    return num_written
+
+def describe_grid(components_df, step=None, ratios=None, fixed_values=None, fraction=1):
+    """
+    Describes the size of the grid of component levels and of its factorial design.
+    
+    Parameters:
+    - components_df: DataFrame with 'Component' and 'maxValue' columns.
+    - step: Step size for creating discrete ranges.
+    - ratios: List of ratios for creating discrete ranges.
+    - fixed_values: Dictionary of components with fixed values (optional).
+    - fraction: Inverse of the fraction of the grid of a fractional factorial design.
+    
+    Returns:
+    - Human-readable description (str).
+    """
+    ranges = discrete_ranges(components_df, step, ratios, fixed_values)
+    size = fractional_factorial_size([r.size for r in ranges], fraction)
+    memory = size * len(ranges) * 8
+    units = ['B', 'kB', 'MB', 'GB', 'TB', 'PB']
+    unit = 0
+    while memory >= 1000 and unit < len(units) - 1:
+        memory /= 1000
+        unit += 1
+    levels = ' x '.join(str(r.size) for r in ranges)
+    fraction_str = f"1/{fraction} of " if fraction > 1 else ""
+    return f"Grid of {levels} levels: {fraction_str}factorial design of {size} rows ({memory:.1f} {units[unit]})"
+
+def plate_file_name(output_file, plate):
+    """
+    Returns the name of the sampling file of a plate (1-based) of a multi-plate batch.
+    """
+    root, extension = os.path.splitext(output_file)
+    return f"{root}_plate{plate}{extension}"
+
+def generate_plates(input_file, output_file, num_plates, num_samples, step=None, ratios=None, fixed_values=None,
+                    seed=None, n_jobs=None, **options):
+    """
+    Generates the designs of several plates in parallel, each written to its own file.
+    
+    Every plate draws from its own child of SeedSequence(seed), so plates are
+    independent, reproducible, and do not depend on the number of worker processes.
+    No global random state is used.
+    
+    Parameters:
+    - input_file: Path to the input file containing components and their max values.
+    - output_file: Output file path; plate i is written to <root>_plate<i><extension>.
+    - num_plates: Number of plates.
+    - num_samples: Number of samples per plate.
+    - step: Step size for creating discrete ranges (optional).
+    - ratios: List of ratios for creating discrete ranges (optional).
+    - fixed_values: Dictionary of components with fixed values (optional).
+    - seed: Random seed for reproducibility (optional).
+    - n_jobs: Number of worker processes (all cores if None, no pool if 1).
+    - options: Other keyword arguments of main (method, criterion, unique...).
+    
+    Returns:
+    - List of the output files, in plate order.
+    """
+    seed_sequences = _seed_sequence(seed).spawn(num_plates)
+    output_files = [plate_file_name(output_file, plate + 1) for plate in range(num_plates)]
+    # Plates are the unit of parallelism, candidate designs of a plate are scored serially
+    options['n_jobs'] = 1
+    # Each plate gets its own quality report, named like its sampling file
+    plate_options = [
+        dict(options, report=plate_file_name(options['report'], plate + 1)) if options.get('report') else options
+        for plate in range(num_plates)
+    ]
+    if n_jobs == 1:
+        for plate_file, seed_sequence, opts in zip(output_files, seed_sequences, plate_options):
+            main(input_file, plate_file, num_samples, step, ratios, fixed_values, seed_sequence, **opts)
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            futures = [
+                executor.submit(main, input_file, plate_file, num_samples, step, ratios, fixed_values, seed_sequence, **opts)
+                for plate_file, seed_sequence, opts in zip(output_files, seed_sequences, plate_options)
+            ]
+            for future in futures:
+                future.result()
+    return output_files
 
-def main(input_file, output_file, num_samples, step=None, ratios=None, fixed_values=None, seed=None):
+def main(input_file, output_file, num_samples, step=None, ratios=None, fixed_values=None, seed=None, chunk_size=None,
+         criterion=None, iterations=100, n_jobs=None, max_total_volume=None, constraints=None,
+         method='lhs', skip=0, unique=False, num_plates=1, augment=False, fraction=1, report=None):
     """
     Main function to generate LHS samples and save them to a CSV file.
     
@@ -74,7 +1185,36 @@ def main(input_file, output_file, num_samples, step=None, ratios=None, fixed_val
     - ratios: List of ratios for creating discrete ranges (optional).
     - fixed_values: Dictionary of components with fixed values (optional).
     - seed: Random seed for reproducibility (optional).
+    - chunk_size: Number of samples generated and written at a time (optional). If not
+      specified, the whole design is built in memory before being written.
+    - criterion: 'maximin' or 'correlation' to keep the best of several designs (optional).
+    - iterations: Number of candidate designs drawn when a criterion is given.
+    - n_jobs: Number of worker processes used to score candidate designs or generate plates (optional).
+    - max_total_volume: Upper bound on the summed volume of the components of a sample (optional).
+    - constraints: Linear volume constraints, see parse_constraints (optional).
+    - method: 'lhs', 'sobol', 'halton', 'full_factorial' or 'fractional_factorial' (default: 'lhs').
+    - skip: Number of points of the Sobol or Halton sequence to skip, to extend a design (optional).
+    - unique: If True, no sample is repeated in the design.
+    - num_plates: Number of plates to generate in parallel, each with num_samples samples
+      and its own output file (see generate_plates).
+    - augment: If True, output_file is an existing sampling file to which num_samples
+      samples filling its least-covered levels are appended (see augment_samples), under
+      the same volume constraints and uniqueness as a new design.
+    - fraction: Inverse of the fraction of the grid kept by 'fractional_factorial'.
+    - report: Path to a JSON file where the quality report of the design is written (optional,
+      see quality_report). With several plates, <root>_plate<i> reports are written.
     """
+    if augment and (num_plates > 1 or chunk_size or criterion or method != 'lhs'):
+        raise ValueError("Augmenting a design fills its least-covered levels and cannot be combined "
+                         "with several plates, chunk_size, a design criterion or a method other than 'lhs'.")
+    if num_plates > 1:
+        generate_plates(input_file, output_file, num_plates, num_samples, step, ratios, fixed_values, seed, n_jobs,
+                        chunk_size=chunk_size, criterion=criterion, iterations=iterations,
+                        max_total_volume=max_total_volume, constraints=constraints, method=method, skip=skip,
+                        unique=unique, fraction=fraction,
+                        report=report)
+        return
+    
     # Read the input file
     components_df = pd.read_csv(input_file, sep='\t')
     
@@ -87,18 +1227,52 @@ def main(input_file, output_file, num_samples, step=None, ratios=None, fixed_val
             if component not in component_names:
                 print(f"Warning: Component '{component}' not found in the input file.")
     
-    # Generate LHS samples
-    samples_df = generate_lhs_samples(input_file, num_samples, step, ratios, fixed_values, seed)
+    # Report the size of the grid before committing memory to a design
+    print(describe_grid(components_df, step, ratios, fixed_values, fraction if method == 'fractional_factorial' else 1))
+    
+    if augment:
+        # Append the new samples, leaving the existing rows untouched
+        new_samples_df = augment_samples(input_file, output_file, num_samples, step, ratios, fixed_values, seed,
+                                         max_total_volume, parse_constraints(constraints), unique)
+        new_samples_df.to_csv(output_file, index=False, mode='a', header=False)
+        print(f"Added {num_samples} samples to {output_file}")
+        if report:
+            write_report(input_file, output_file, report, step, ratios, fixed_values)
+        return
+    
+    if chunk_size and method == 'fractional_factorial':
+        raise ValueError("Fractional factorial designs cannot be generated with chunk_size.")
+    if chunk_size and criterion:
+        raise ValueError("A design criterion needs the whole design and cannot be used with chunk_size.")
+    if chunk_size and (max_total_volume is not None or constraints):
+        raise ValueError("Volume constraints cannot be used with chunk_size.")
+    if chunk_size and unique:
+        raise ValueError("Unique samples cannot be guaranteed across chunks, do not use chunk_size.")
     
-    # Write the samples to a CSV file
-    samples_df.to_csv(output_file, index=False)
-    print(f"Generated {num_samples} samples and saved to {output_file}")
+    if chunk_size:
+        # Stream the samples to the output file chunk by chunk
+        chunks = iter_lhs_samples(input_file, num_samples, step, ratios, fixed_values, seed, chunk_size, method, skip)
+    else:
+        # Generate LHS samples
+        samples_df = generate_lhs_samples(input_file, num_samples, step, ratios, fixed_values, seed,
+                                          criterion, iterations, n_jobs, max_total_volume, parse_constraints(constraints),
+                                          method, skip, unique, fraction)
+        if 'acceptance_rate' in samples_df.attrs:
+            print(f"Acceptance rate of feasible samples: {samples_df.attrs['acceptance_rate']:.2%}")
+        chunks = [samples_df]
+    
+    # Write the samples to the output file
+    num_written = write_samples(chunks, output_file)
+    print(f"Generated {num_written} samples and saved to {output_file}")
+    
+    if report:
+        write_report(input_file, output_file, report, step, ratios, fixed_values)
 
 if __name__ == "__main__":
     # Setup command line argument parsing
-    parser = argparse.ArgumentParser(description="Generate Latin Hypercube Samples for given components.")
+    parser = argparse.ArgumentParser(description="Generate Latin Hypercube (or Sobol/Halton) Samples for given components.")
     parser.add_argument('input_file', type=str, help='Input file path with components and their max values.')
-    parser.add_argument('output_file', type=str, help='Output CSV file path for the samples.')
+    parser.add_argument('output_file', type=str, help='Output file path for the samples (CSV, or Parquet if it ends with .parquet).')
     parser.add_argument('num_samples', type=int, help='Number of samples to generate.')
     
     # Create a mutually exclusive group for step and ratios
@@ -108,6 +1282,21 @@ if __name__ == "__main__":
     
     parser.add_argument('--fixed_values', type=str, default=None, help='Fixed values for components as a dictionary (e.g., \'{"Component1": 10, "Component2": 20}\')')
     parser.add_argument('--seed', type=int, default=None, help='Seed for random number generation for reproducibility (optional).')
+    parser.add_argument('--method', type=str, choices=['lhs', 'sobol', 'halton', 'full_factorial', 'fractional_factorial'], default='lhs', help='Sampling method: Latin Hypercube, scrambled Sobol or Halton sequence, or (fractional) factorial enumeration of the grid, num_samples being then ignored (default: lhs).')
+    parser.add_argument('--fraction', type=int, default=2, help='Keep 1/fraction of the grid with --method fractional_factorial (default: 2).')
+    parser.add_argument('--grid_size', action='store_true', help='Only report the size of the grid of component levels and exit.')
+    parser.add_argument('--report', type=str, default=None, help='Write a JSON quality report (discrepancy, nearest-neighbour distances, level coverage, duplicates) of the design to this file (optional).')
+    parser.add_argument('--report_only', action='store_true', help='Only assess the existing output file, printing its quality report or writing it to --report, and exit.')
+    parser.add_argument('--skip', type=int, default=0, help='Number of points of the Sobol or Halton sequence to skip, e.g. the size of the design being extended (default: 0).')
+    parser.add_argument('--unique', action='store_true', help='Replace duplicate samples by new grid points so that no experiment is repeated.')
+    parser.add_argument('--num_plates', type=int, default=1, help='Number of plates to generate in parallel, each written to <output>_plate<i> (default: 1).')
+    parser.add_argument('--augment', action='store_true', help='Append num_samples samples filling the least-covered levels of the existing output file, under --max_total_volume, --constraints and --unique (not with --method, --criterion, --chunk_size or --num_plates).')
+    parser.add_argument('--chunk_size', type=int, default=None, help='Generate and write samples by chunks of this size to bound memory usage (optional).')
+    parser.add_argument('--criterion', type=str, choices=['maximin', 'correlation'], default=None, help='Keep the best of several LHS designs for this space-filling criterion (optional).')
+    parser.add_argument('--iterations', type=int, default=100, help='Number of candidate designs drawn when a criterion is given (default: 100).')
+    parser.add_argument('--n_jobs', type=int, default=None, help='Number of worker processes used to score candidate designs or generate plates (default: all cores).')
+    parser.add_argument('--max_total_volume', type=float, default=None, help='Maximum summed volume of the components of a sample, e.g. the well volume (optional).')
+    parser.add_argument('--constraints', type=str, default=None, help='Semicolon-separated linear constraints in format component1=weight1,component2=weight2<=bound (optional).')
     
     # Parse arguments
     args = parser.parse_args()
@@ -118,5 +1307,17 @@ if __name__ == "__main__":
     # Convert ratios argument from comma-separated string to list of floats if provided
     ratios = [float(r) for r in args.ratios.split(',')] if args.ratios else None
     
+    if args.grid_size:
+        components_df = pd.read_csv(args.input_file, sep='\t')
+        print(describe_grid(components_df, args.step, ratios, fixed_values,
+                            args.fraction if args.method == 'fractional_factorial' else 1))
+        sys.exit(0)
+    
+    if args.report_only:
+        write_report(args.input_file, args.output_file, args.report, args.step, ratios, fixed_values)
+        sys.exit(0)
+    
     # Run the main function with the parsed arguments
-    main(args.input_file, args.output_file, args.num_samples, args.step, ratios, fixed_values, args.seed)
+    main(args.input_file, args.output_file, args.num_samples, args.step, ratios, fixed_values, args.seed, args.chunk_size,
+         args.criterion, args.iterations, args.n_jobs, args.max_total_volume, args.constraints,
+         args.method, args.skip, args.unique, args.num_plates, args.augment, args.fraction, args.report)
@@ -0,0 +1,154 @@
+import unittest
+import os
+from argparse import Namespace
+from os import path as os_path
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+import pandas as pd
+from icfree.cache import file_digest, data_digest, step_key, run_step
+from icfree.__main__ import run_snakemake, stream_instruction_files
+
+
+class TestCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        self.folder = self.temp_dir.name
+        self.cache_dir = os_path.join(self.folder, 'cache')
+        self.input_file = os_path.join(self.folder, 'input.txt')
+        with open(self.input_file, 'w') as f:
+            f.write('1,2,3')
+        self.output_file = os_path.join(self.folder, 'output', 'output.txt')
+        self.runs = 0
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def run_step(self, params=None):
+        def run():
+            self.runs += 1
+            os.makedirs(os_path.dirname(self.output_file), exist_ok=True)
+            with open(self.input_file) as f, open(self.output_file, 'w') as out:
+                out.write(f.read()[::-1])
+            return pd.DataFrame({'runs': [self.runs]})
+        return run_step(self.cache_dir, 'STEP', [self.input_file], params or {'a': 1}, [self.output_file], run)
+
+    def test_step_key(self):
+        self.assertEqual(file_digest(self.input_file), '8a6ae15122001229edb8866f56e342af12ae8187203c3e3b33931743e7c0c48d')
+        key = step_key('STEP', [self.input_file], {'a': 1})
+        self.assertEqual(key, step_key('STEP', [self.input_file], {'a': 1}))
+        self.assertNotEqual(key, step_key('STEP', [self.input_file], {'a': 2}))
+        self.assertNotEqual(key, step_key('OTHER', [self.input_file], {'a': 1}))
+        with open(self.input_file, 'w') as f:
+            f.write('1,2,4')
+        self.assertNotEqual(key, step_key('STEP', [self.input_file], {'a': 1}))
+
+    def test_run_step(self):
+        self.assertEqual(self.run_step()[:2], (False, [self.output_file]))
+        mtime = os.stat(self.output_file).st_mtime_ns
+        # Unchanged: skipped, output left untouched and result unpickled
+        skipped, outputs, result = self.run_step()
+        self.assertEqual((skipped, outputs), (True, [self.output_file]))
+        pd.testing.assert_frame_equal(result, pd.DataFrame({'runs': [1]}))
+        self.assertEqual(os.stat(self.output_file).st_mtime_ns, mtime)
+        # Deleted output: restored
+        os.remove(self.output_file)
+        self.assertTrue(self.run_step()[0])
+        with open(self.output_file) as f:
+            self.assertEqual(f.read(), '3,2,1')
+        self.assertEqual(self.runs, 1)
+        # New parameters or input contents: run again
+        self.assertFalse(self.run_step({'a': 2})[0])
+        with open(self.input_file, 'w') as f:
+            f.write('4,5,6')
+        self.assertFalse(self.run_step()[0])
+        self.assertEqual(self.runs, 3)
+
+    def test_run_step_declared_outputs(self):
+        # A file written next to the outputs while the step runs, e.g. a log, is not cached
+        log_file = os_path.join(os_path.dirname(self.output_file), 'icfree.log')
+        def run():
+            os.makedirs(os_path.dirname(self.output_file), exist_ok=True)
+            for path in (self.output_file, log_file):
+                with open(path, 'w') as f:
+                    f.write(path)
+            return [self.output_file]
+        for _ in range(2):
+            if os_path.exists(log_file):
+                os.remove(log_file)
+            skipped, outputs, _ = run_step(self.cache_dir, 'STEP', [self.input_file], {}, lambda result: result, run)
+            self.assertListEqual(outputs, [self.output_file])
+        self.assertTrue(skipped)
+        self.assertFalse(os_path.exists(log_file))
+
+    def test_data_digest(self):
+        df = pd.DataFrame({'A': [1, 2], 'B': [0.5, 1.5]})
+        self.assertEqual(data_digest(df), data_digest(df.copy()))
+        self.assertNotEqual(data_digest(df), data_digest(df.astype(float)))
+        self.assertNotEqual(data_digest(df), data_digest(df.rename(columns={'A': 'C'})))
+        self.assertNotEqual(data_digest([df, df]), data_digest([df]))
+        self.assertEqual(data_digest(self.input_file), file_digest(self.input_file))
+
+    def test_run_step_no_cache(self):
+        self.cache_dir = None
+        self.assertEqual(self.run_step()[:2], (False, None))
+        self.assertEqual(self.run_step()[:2], (False, None))
+        self.assertEqual(self.runs, 2)
+
+    def pipeline_args(self, write_intermediate):
+        return Namespace(
+            sampler_input_filename=os_path.join(os_path.dirname(__file__), 'data', 'sampler', 'input', 'components.tsv'),
+            sampler_nb_samples=20, sampler_seed=42, sampler_step=10,
+            plate_designer_sample_volume=2000, plate_designer_default_dead_volume=20000,
+            plate_designer_dead_volumes='', plate_designer_num_replicates=3,
+            plate_designer_default_well_capacity=60000, plate_designer_well_capacity='',
+            plate_designer_start_well_src_plt='A1', plate_designer_start_well_dst_plt='A1',
+            plate_designer_output_folder=os_path.join(self.folder, 'plates'),
+            plate_designer_sampling_file=os_path.join(self.folder, 'sampling.csv'),
+            instructor_output_filename=os_path.join(self.folder, 'instructions.csv'),
+            instructor_max_transfer_volume=500, instructor_split_threshold=580,
+            instructor_source_plate_type='default:384PP_AQ_GP3', instructor_split_components='',
+            cache_dir=self.cache_dir, no_cache=False, write_intermediate=write_intermediate,
+        )
+
+    def test_run_snakemake(self):
+        args = self.pipeline_args(write_intermediate=True)
+        run_snakemake(args)
+        files = [args.plate_designer_sampling_file, args.instructor_output_filename,
+                 os_path.join(args.plate_designer_output_folder, 'source_plate.csv')]
+        mtimes = [os.stat(file).st_mtime_ns for file in files]
+        # Only the instructions are written again after a change of the split threshold
+        args.instructor_split_threshold = 500
+        run_snakemake(args)
+        new_mtimes = [os.stat(file).st_mtime_ns for file in files]
+        self.assertListEqual(new_mtimes[:1] + new_mtimes[2:], mtimes[:1] + mtimes[2:])
+        self.assertNotEqual(new_mtimes[1], mtimes[1])
+
+    def test_run_snakemake_dead_volumes(self):
+        # The instructor shares components over source plates with the dead volumes of the designer
+        args = self.pipeline_args(write_intermediate=False)
+        with patch('icfree.__main__.stream_instruction_files', wraps=stream_instruction_files) as stream:
+            run_snakemake(args)
+            self.assertEqual(stream.call_args.kwargs['dead_volumes'], args.plate_designer_dead_volumes)
+            self.assertEqual(stream.call_args.kwargs['default_dead_volume'], 20000)
+
+    def test_run_snakemake_in_memory(self):
+        # Same instructions as through files, no intermediate file
+        args = self.pipeline_args(write_intermediate=True)
+        args.cache_dir = None
+        run_snakemake(args)
+        with open(args.instructor_output_filename) as f:
+            expected = f.read()
+        args = self.pipeline_args(write_intermediate=False)
+        args.instructor_output_filename = os_path.join(self.folder, 'memory', 'instructions.csv')
+        args.plate_designer_output_folder = os_path.join(self.folder, 'memory', 'plates')
+        os.makedirs(os_path.dirname(args.instructor_output_filename))
+        for _ in range(2):
+            run_snakemake(args)
+            with open(args.instructor_output_filename) as f:
+                self.assertEqual(f.read(), expected)
+        self.assertListEqual(os.listdir(os_path.join(self.folder, 'memory')), ['instructions.csv'])
+
+
+if __name__ == '__main__':
+    unittest.main()
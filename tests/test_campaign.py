@@ -0,0 +1,89 @@
+import unittest
+import json
+import os
+from os import path as os_path
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+import pandas as pd
+from icfree.campaign import read_manifest, run_campaign, run_plate
+
+
+class TestCampaign(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        self.folder = self.temp_dir.name
+        self.manifest = {
+            'defaults': {
+                'sampler_input_filename': os_path.join(os_path.dirname(__file__), 'data', 'sampler', 'input', 'components.tsv'),
+                'sampler_nb_samples': 20,
+                'sampler_step': 10,
+                'plate_designer_sample_volume': 2000,
+                'plate_designer_default_well_capacity': 60000,
+                'instructor_max_transfer_volume': 500,
+                'instructor_split_threshold': 580,
+            },
+            'plates': [
+                {'name': 'P1', 'sampler_seed': 1},
+                {'name': 'P2', 'sampler_seed': 2, 'plate_designer_num_replicates': 2},
+                {'name': 'BAD', 'sampler_input_filename': 'missing.tsv'},
+            ],
+        }
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write_manifest(self, name='campaign.yaml'):
+        manifest_file = os_path.join(self.folder, name)
+        with open(manifest_file, 'w') as f:
+            if name.endswith('.json'):
+                json.dump(self.manifest, f)
+            else:
+                import yaml
+                yaml.safe_dump(self.manifest, f)
+        return manifest_file
+
+    def test_read_manifest(self):
+        plates = dict(read_manifest(self.write_manifest('campaign.json')))
+        self.assertListEqual(list(plates), ['P1', 'P2', 'BAD'])
+        # Per-plate overrides, outputs in a folder per plate, paths relative to the manifest
+        self.assertEqual(plates['P2']['plate_designer_num_replicates'], 2)
+        self.assertEqual(plates['P1']['sampler_nb_samples'], 20)
+        self.assertEqual(plates['P1']['plate_designer_output_folder'], os_path.join(self.folder, 'P1'))
+        self.assertEqual(plates['P1']['instructor_output_filename'], os_path.join(self.folder, 'P1', 'instructions.csv'))
+        self.assertEqual(plates['BAD']['sampler_input_filename'], os_path.join(self.folder, 'missing.tsv'))
+        self.manifest['plates'][0]['sampler_nb_sample'] = 10
+        with self.assertRaisesRegex(ValueError, "plate 'P1': sampler_nb_sample"):
+            read_manifest(self.write_manifest('campaign.json'))
+
+    def test_run_campaign(self):
+        manifest_file = self.write_manifest()
+        for n_jobs in (1, 2):
+            summary = run_campaign(manifest_file, n_jobs=n_jobs)
+            pd.testing.assert_frame_equal(summary, pd.read_csv(os_path.join(self.folder, 'campaign_summary.csv'),
+                                                               dtype={'Transfers': 'Int64'}, keep_default_na=False,
+                                                               na_values={'Transfers': ['']}))
+            self.assertListEqual(summary['Status'].tolist(), ['done', 'done', 'failed'])
+            # The failing plate does not stop the others and keeps its error in its log
+            self.assertIn('FileNotFoundError', summary['Error'][2])
+            with open(os_path.join(self.folder, 'BAD', 'icfree.log')) as f:
+                self.assertIn('Traceback', f.read())
+            for i, plate in enumerate(['P1', 'P2']):
+                instructions = pd.read_csv(os_path.join(self.folder, plate, 'instructions.csv'))
+                self.assertEqual(summary['Transfers'][i], len(instructions))
+            self.assertFalse(os_path.exists(os_path.join(self.folder, 'BAD', 'instructions.csv')))
+        self.assertEqual(len(os.listdir(os_path.join(self.folder, '.icfree_cache', 'steps'))), 6)
+
+    def test_run_plate_interrupt(self):
+        name, options = read_manifest(self.write_manifest())[0]
+        # Argument errors are recorded with their plate, interrupts are not
+        failed = run_plate(name, dict(options, sampler_nb_samples='many'))
+        self.assertEqual(failed['Status'], 'failed')
+        self.assertIn('SystemExit', failed['Error'])
+        with patch('icfree.campaign.run_snakemake', side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                run_plate(name, options)
+
+
+if __name__ == '__main__':
+    unittest.main()
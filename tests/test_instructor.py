@@ -1,8 +1,15 @@
+import os
 import unittest
 import pandas as pd
 import numpy as np
 from os import path as os_path
-from icfree.instructor import parse_plate_types, generate_echo_instructions, reorder_by_dispense_order
+from tempfile import TemporaryDirectory
+from icfree.instructor import (
+    parse_plate_types, generate_echo_instructions, reorder_by_dispense_order, main, assign_source_wells,
+    order_transfers, estimate_run_time, plan_transfers, validate_instructions, plan_runs, read_instructions,
+    iter_echo_instructions, write_instructions, write_instruction_files, stream_runs
+)
+from icfree.plate_designer import main as plate_designer_main
 
 
 class TestInstructorModule(unittest.TestCase):
@@ -89,6 +96,261 @@ class TestInstructorModule(unittest.TestCase):
         expected_output_file_df = pd.read_csv(expected_output_file)
         pd.testing.assert_frame_equal(result, expected_output_file_df)
 
+    def test_generate_echo_instructions_source_plates(self):
+        source_plate_df = pd.DataFrame({'Plate': [1, 1, 2], 'Well': ['A1', 'B1', 'A1'], 'C1': [100, 100, 0], 'C2': [0, 0, 100]})
+        destination_plate_df = pd.DataFrame({'Well': ['A1'], 'C1': [10], 'C2': [20]})
+        result = generate_echo_instructions(source_plate_df, destination_plate_df, {'default': '384PP_AQ_GP3'})
+        names = dict(zip(result['Sample ID'], result['Source Plate Name']))
+        self.assertDictEqual(names, {'C1': 'Source[1]', 'C2': 'Source[2]'})
+        
+    def test_generate_echo_instructions_spread_component(self):
+        # C1 spills over two source plates: 10000 then 5000 nL usable
+        source_plate_df = pd.DataFrame({'Plate': [1, 1, 2], 'Well': ['A1', 'B1', 'A1'], 'C1': [20000, 20000, 20000]})
+        destination_plate_df = pd.DataFrame({'Well': ['A1', 'B1', 'C1'], 'C1': [4000, 4000, 4000]})
+        result = generate_echo_instructions(source_plate_df, destination_plate_df, {'default': '384PP_AQ_GP3'})
+        # The third transfer straddles the end of plate 1 and is split
+        self.assertListEqual(result['Source Plate Name'].tolist(), ['Source[1]'] * 3 + ['Source[2]'])
+        self.assertListEqual(result['Source Well'].tolist(), ['{A1;B1}'] * 3 + ['A1'])
+        self.assertListEqual(result['Destination Well'].tolist(), ['A1', 'B1', 'C1', 'C1'])
+        self.assertListEqual(result['Transfer Volume'].tolist(), [4000, 4000, 2000, 2000])
+        self.assertTrue(validate_instructions(result, source_plate_df, destination_plate_df).empty)
+
+    def test_main_component_larger_than_source_plate(self):
+        # Water needs 10 wells of 45000 usable nL on 2x4 source plates: it spills over two plates
+        rng = np.random.default_rng(0)
+        sampling_df = pd.DataFrame({'A': rng.choice([500, 1000, 1500], 100), 'B': rng.choice([0, 500, 1000], 100)})
+        with TemporaryDirectory() as temp_dir:
+            sampling_file = os_path.join(temp_dir, 'sampling.csv')
+            sampling_df.to_csv(sampling_file, index=False)
+            plate_designer_main(sampling_file, 6000, default_well_capacity=60000, default_dead_volume=15000,
+                                output_folder=temp_dir, src_plate_dims='2x4')
+            source_plate_file = os_path.join(temp_dir, 'source_plate.csv')
+            source_plate_df = pd.read_csv(source_plate_file)
+            self.assertListEqual(source_plate_df.loc[source_plate_df['Water'] > 0, 'Plate'].unique().tolist(), [1, 2])
+            output_file = os_path.join(temp_dir, 'instructions.csv')
+            for assign_wells in (False, True):
+                discrepancies = main(source_plate_file, os_path.join(temp_dir, 'destination_plate.csv'), output_file,
+                                     max_transfer_volume=500, split_threshold=580, assign_wells=assign_wells, validate=True)
+                self.assertTrue(discrepancies.empty)
+                result = pd.read_csv(output_file)
+                water = result[result['Sample ID'] == 'Water']
+                self.assertListEqual(sorted(water['Source Plate Name'].unique()), ['Source[1]', 'Source[2]'])
+                self.assertEqual(water['Transfer Volume'].sum(), 6000 * 100 - sampling_df.to_numpy().sum())
+            ledger = pd.read_csv(os_path.join(temp_dir, 'instructions_ledger.csv'))
+            self.assertTrue((ledger['Remaining Volume'] >= 15000 - 1e-6).all())
+            self.assertListEqual(sorted(ledger.loc[ledger['Component'] == 'Water', 'Plate'].unique()), [1, 2])
+
+    def test_generate_echo_instructions_split(self):
+        source_plate_df = pd.DataFrame({'Well': ['A1', 'B1'], 'C1': [100000, 0], 'C2': [0, 100000]})
+        destination_plate_df = pd.DataFrame({'Well': ['A1', 'B1', 'C1'], 'C1': [1200, 1000, 450], 'C2': [550, 0, 2]})
+        result = generate_echo_instructions(source_plate_df, destination_plate_df, {'default': '384PP_AQ_GP3'}, 500, 400)
+        self.assertListEqual(result['Transfer Volume'].tolist(), [500, 500, 200, 500, 500, 450, 500, 50, 2])
+        self.assertListEqual(result['Destination Well'].tolist(), ['A1', 'A1', 'A1', 'B1', 'B1', 'C1', 'A1', 'A1', 'C1'])
+        self.assertListEqual(result['Source Well'].tolist(), ['A1'] * 6 + ['B1'] * 3)
+        self.assertListEqual(result.index.tolist(), list(range(9)))
+
+    def test_plan_transfers(self):
+        source_plate_df = pd.DataFrame({'Well': ['A1', 'B1'], 'C1': [100000, 0], 'C2': [0, 100000]})
+        destination_plate_df = pd.DataFrame({'Well': ['A1', 'B1', 'C1'], 'C1': [1200, 1100, 450], 'C2': [550, 0, 2]})
+        instructions_df = generate_echo_instructions(source_plate_df, destination_plate_df, {'default': '384PP_AQ_GP3'}, 500, 580)
+        self.assertListEqual(instructions_df['Transfer Volume'].tolist(), [500, 500, 200, 500, 500, 100, 450, 550, 2])
+        result, report = plan_transfers(instructions_df, 500, 580)
+        # Balanced chunks of at most 580 nL, in whole droplets
+        self.assertListEqual(result['Transfer Volume'].tolist(), [400, 400, 400, 550, 550, 450, 550, 2])
+        self.assertListEqual(result['Destination Well'].tolist(), ['A1', 'A1', 'A1', 'B1', 'B1', 'C1', 'A1', 'C1'])
+        self.assertDictEqual(report, {'transfers_before': 9, 'transfers_after': 8, 'transfers_saved': 1})
+        # Duplicated transfers are merged
+        result, report = plan_transfers(pd.concat([instructions_df.iloc[[8]], instructions_df.iloc[[8]]]))
+        self.assertListEqual(result['Transfer Volume'].tolist(), [4])
+        self.assertEqual(report['transfers_saved'], 1)
+
+    def test_plan_transfers_plate(self):
+        instructions_df = generate_echo_instructions(self.source_plate_df, self.destination_plate_df, {'default': '384PP_AQ_GP3'}, 500, 580)
+        result, report = plan_transfers(instructions_df, 500, 580)
+        keys = ['Source Well', 'Destination Well', 'Sample ID']
+        pd.testing.assert_series_equal(
+            result.groupby(keys)['Transfer Volume'].sum(), instructions_df.groupby(keys)['Transfer Volume'].sum()
+        )
+        self.assertLessEqual(result['Transfer Volume'].max(), 580)
+        self.assertGreater(report['transfers_saved'], 0)
+        self.assertEqual(len(result), report['transfers_after'])
+
+    def test_validate_instructions(self):
+        instructions_df = generate_echo_instructions(self.source_plate_df, self.destination_plate_df, {'default': '384PP_AQ_GP3'}, 500, 580)
+        self.assertTrue(validate_instructions(instructions_df, self.source_plate_df, self.destination_plate_df).empty)
+        assigned_df, _ = assign_source_wells(instructions_df, self.source_plate_df, {}, 15000)
+        self.assertTrue(validate_instructions(assigned_df, self.source_plate_df, self.destination_plate_df, {}, 15000).empty)
+        
+        # Wrong volume, well not holding the component, well drawn below its dead volume
+        assigned_df.loc[0, 'Transfer Volume'] += 5
+        assigned_df.loc[1, 'Source Well'] = 'P24'
+        result = validate_instructions(assigned_df, self.source_plate_df, self.destination_plate_df, {}, 15000)
+        self.assertListEqual(sorted(result['Check']), ['destination volume', 'source missing'])
+        destination = result[result['Check'] == 'destination volume'].iloc[0]
+        self.assertEqual(destination['Well'], assigned_df.loc[0, 'Destination Well'])
+        self.assertAlmostEqual(destination['Actual Volume'] - destination['Expected Volume'], 5)
+        result = validate_instructions(instructions_df, self.source_plate_df, self.destination_plate_df, {}, 20000)
+        self.assertTrue((result['Check'] == 'source overdraw').all())
+        self.assertTrue((result['Actual Volume'] > result['Expected Volume']).all())
+
+    def test_main_validate(self):
+        with TemporaryDirectory() as temp_dir:
+            output_file = os_path.join(temp_dir, 'instructions.csv')
+            result = main(self.source_plate_file, self.destination_plate_file, output_file, max_transfer_volume=500,
+                          split_threshold=580, split_components='Water', assign_wells=True, validate=True)
+            self.assertTrue(result.empty)
+            self.assertTrue(os_path.exists(os_path.join(temp_dir, 'instructions_validation.csv')))
+
+    def test_iter_echo_instructions(self):
+        source_plate_types = {'default': '384PP_AQ_GP3'}
+        expected = generate_echo_instructions(self.source_plate_df, self.destination_plate_df, source_plate_types, 500, 580)
+        blocks = list(iter_echo_instructions(self.source_plate_df, self.destination_plate_df, source_plate_types, 500, 580, block_size=50))
+        self.assertTrue(all(block['Sample ID'].nunique() == 1 for block in blocks))
+        self.assertTrue(all(len(block.drop_duplicates(['Destination Well'])) <= 50 for block in blocks))
+        pd.testing.assert_frame_equal(pd.concat(blocks, ignore_index=True), expected)
+        
+        dispense_order = ['Water', 'Reaction mix']
+        blocks = iter_echo_instructions(self.source_plate_df, self.destination_plate_df, source_plate_types, dispense_order=dispense_order)
+        result = pd.concat(blocks, ignore_index=True)
+        expected = reorder_by_dispense_order(generate_echo_instructions(self.source_plate_df, self.destination_plate_df, source_plate_types), dispense_order)
+        pd.testing.assert_frame_equal(result, expected.reset_index(drop=True))
+
+    def test_main_stream(self):
+        # Streamed files are the same as those written from all the instructions at once
+        with TemporaryDirectory() as temp_dir:
+            output_file = os_path.join(temp_dir, 'instructions.csv')
+            expected_file = os_path.join(temp_dir, 'expected.csv')
+            main(self.source_plate_file, self.destination_plate_file, output_file, max_transfer_volume=500,
+                 split_threshold=580, split_components='Water,Hela lysate', dispense_order='Water')
+            instructions_df = generate_echo_instructions(self.source_plate_df, self.destination_plate_df, {'default': '384PP_AQ_GP3'}, 500, 580)
+            write_instructions(reorder_by_dispense_order(instructions_df, ['Water']), expected_file, 'Water,Hela lysate')
+            for suffix in ['', '_Water', '_Hela lysate']:
+                with open(os_path.join(temp_dir, f'instructions{suffix}.csv')) as result, open(os_path.join(temp_dir, f'expected{suffix}.csv')) as expected:
+                    self.assertEqual(result.read(), expected.read())
+
+    def test_generate_echo_instructions_destination_plates(self):
+        source_plate_df = pd.DataFrame({'Well': ['A1', 'B1'], 'C1': [100000, 0], 'C2': [0, 100000], 'Plate': [1, 2]})
+        destination_plate_df = pd.DataFrame({'Well': ['A1', 'B1', 'A1'], 'C1': [10, 20, 30], 'C2': [0, 5, 6], 'Plate': [1, 1, 2]})
+        result = generate_echo_instructions(source_plate_df, destination_plate_df, {'default': '384PP_AQ_GP3'})
+        self.assertListEqual(result['Destination Plate Name'].tolist(), ['Destination[1]', 'Destination[1]', 'Destination[2]', 'Destination[1]', 'Destination[2]'])
+        self.assertListEqual(result['Source Plate Name'].tolist(), ['Source[1]'] * 3 + ['Source[2]'] * 2)
+        self.assertTrue(validate_instructions(result, source_plate_df, destination_plate_df, {}, 0).empty)
+        
+        runs, runs_df = plan_runs(pd.concat([result.iloc[[3]], result.iloc[[0, 2]], result.iloc[[4, 1]]]))
+        # One run per source plate, grouped by destination plate
+        self.assertListEqual(runs_df['Source Plate Name'].tolist(), ['Source[2]', 'Source[1]'])
+        self.assertListEqual(runs_df['Destination Plates'].tolist(), [2, 2])
+        self.assertListEqual(runs_df['Transfers'].tolist(), [2, 3])
+        self.assertListEqual(runs[1]['Destination Plate Name'].tolist(), ['Destination[1]', 'Destination[1]', 'Destination[2]'])
+        self.assertListEqual(runs[1]['Transfer Volume'].tolist(), [10, 20, 30])
+
+    def test_main_destination_plates(self):
+        with TemporaryDirectory() as temp_dir:
+            source_plate_file = os_path.join(temp_dir, 'source_plate.csv')
+            # Enough volume for both destination plates
+            source_plate_df = self.source_plate_df.set_index('Well').mul(2).reset_index()
+            source_plate_df['Plate'] = np.where(source_plate_df['Water'] > 0, 2, 1)
+            source_plate_df.to_csv(source_plate_file, index=False)
+            for plate in [1, 2]:
+                self.destination_plate_df.to_csv(os_path.join(temp_dir, f'destination_plate_{plate}.csv'), index=False)
+            manifest_file = os_path.join(temp_dir, 'destination_plates.csv')
+            pd.DataFrame({'Plate': [1, 2], 'File': ['destination_plate_1.csv', 'destination_plate_2.csv']}).to_csv(manifest_file, index=False)
+            output_file = os_path.join(temp_dir, 'instructions.csv')
+            result = main(source_plate_file, manifest_file, output_file, split_components='Water', validate=True)
+            self.assertTrue(result.empty)
+            runs_df = pd.read_csv(os_path.join(temp_dir, 'instructions_runs.csv'))
+            self.assertListEqual(runs_df['File'].tolist(), ['instructions_run1.csv', 'instructions_run2.csv'])
+            run = pd.read_csv(os_path.join(temp_dir, 'instructions_run2_Water.csv'))
+            self.assertSetEqual(set(run['Source Plate Name']), {'Source[2]'})
+            self.assertEqual(len(read_instructions(output_file, 'Water')), 2 * len(self.expected_output_file_df))
+
+    def test_stream_runs(self):
+        # Streamed runs are the same files as those planned from all the instructions at once
+        source_plate_df = pd.DataFrame({'Well': ['A1', 'B1', 'A1', 'B1'], 'C1': [100, 0, 60, 0], 'C2': [0, 0, 0, 100], 'Plate': [1, 1, 2, 2]})
+        destination_plate_df = pd.DataFrame({'Well': ['A1', 'B1', 'A1', 'A1'], 'C1': [30, 40, 50, 20], 'C2': [5, 0, 6, 7], 'Plate': [1, 1, 2, 3]})
+        source_plate_types = {'default': '384PP_AQ_GP3'}
+        instructions_df = generate_echo_instructions(source_plate_df, destination_plate_df, source_plate_types, dead_volumes={}, default_dead_volume=10)
+        for split_components in [None, 'C2', 'C1,C2']:
+            with TemporaryDirectory() as temp_dir:
+                os.makedirs(os_path.join(temp_dir, 'stream'))
+                os.makedirs(os_path.join(temp_dir, 'memory'))
+                blocks = iter_echo_instructions(source_plate_df, destination_plate_df, source_plate_types, block_size=1,
+                                                dead_volumes={}, default_dead_volume=10)
+                files = stream_runs(blocks, os_path.join(temp_dir, 'stream', 'instructions.csv'), split_components)
+                expected_files = write_instruction_files(instructions_df, os_path.join(temp_dir, 'memory', 'instructions.csv'), split_components, runs=True)
+                self.assertListEqual([os_path.basename(file) for file in files], [os_path.basename(file) for file in expected_files])
+                self.assertListEqual(sorted(os.listdir(os_path.join(temp_dir, 'stream'))), sorted(os.listdir(os_path.join(temp_dir, 'memory'))))
+                for file in expected_files:
+                    with open(file) as expected, open(os_path.join(temp_dir, 'stream', os_path.basename(file))) as result:
+                        self.assertEqual(result.read(), expected.read())
+
+    def test_assign_source_wells(self):
+        source_plate_df = pd.DataFrame({'Well': ['A1', 'B1', 'C1', 'D1'], 'C1': [100, 100, 0, 0], 'C2': [0, 0, 65, 100]})
+        destination_plate_df = pd.DataFrame({'Well': ['A1', 'B1', 'C1'], 'C1': [50, 40, 30], 'C2': [30, 60, 10]})
+        instructions_df = generate_echo_instructions(source_plate_df, destination_plate_df, {'default': '384PP_AQ_GP3'})
+        result, ledger = assign_source_wells(instructions_df, source_plate_df, {'C2': 10}, 10)
+        # The 60 nL transfer of C2 straddles the end of C1 and falls over to D1
+        self.assertListEqual(result['Source Well'].tolist(), ['A1', 'A1', 'B1', 'C1', 'C1', 'D1', 'D1'])
+        self.assertListEqual(result['Transfer Volume'].tolist(), [50, 40, 30, 30, 25, 35, 10])
+        self.assertListEqual(result['Destination Well'].tolist(), ['A1', 'B1', 'C1', 'A1', 'B1', 'B1', 'C1'])
+        self.assertListEqual(ledger['Remaining Volume'].tolist(), [10, 70, 10, 55])
+        with self.assertRaises(ValueError):
+            assign_source_wells(instructions_df, source_plate_df, {}, 60)
+
+    def test_assign_source_wells_plate(self):
+        instructions_df = generate_echo_instructions(self.source_plate_df, self.destination_plate_df, {'default': '384PP_AQ_GP3'}, 500, 580)
+        result, ledger = assign_source_wells(instructions_df, self.source_plate_df, {}, 15000)
+        self.assertFalse(result['Source Well'].str.startswith('{').any())
+        self.assertAlmostEqual(result['Transfer Volume'].sum(), instructions_df['Transfer Volume'].sum())
+        self.assertAlmostEqual(ledger['Drawn Volume'].sum(), instructions_df['Transfer Volume'].sum())
+        self.assertTrue((ledger['Remaining Volume'] >= 15000 - 1e-6).all())
+
+    def test_order_transfers(self):
+        instructions_df = generate_echo_instructions(self.source_plate_df, self.destination_plate_df, {'default': '384PP_AQ_GP3'}, 500, 580)
+        before = estimate_run_time(instructions_df)
+        for method in ['serpentine', 'nearest']:
+            result = order_transfers(instructions_df, method)
+            # Same transfers, components in the same order, less stage travel
+            pd.testing.assert_frame_equal(
+                result.sort_values(list(result.columns)).reset_index(drop=True),
+                instructions_df.sort_values(list(instructions_df.columns)).reset_index(drop=True)
+            )
+            self.assertListEqual(result['Sample ID'].unique().tolist(), instructions_df['Sample ID'].unique().tolist())
+            after = estimate_run_time(result)
+            self.assertLess(after['stage_travel_mm'], before['stage_travel_mm'])
+            self.assertLess(after['estimated_seconds'], before['estimated_seconds'])
+        with self.assertRaises(ValueError):
+            order_transfers(instructions_df, 'random')
+
+    def test_order_transfers_serpentine(self):
+        instructions_df = pd.DataFrame({
+            'Source Plate Name': 'Source[1]', 'Source Well': 'A1',
+            'Destination Well': ['A1', 'B1', 'A2', 'B2', 'A3', 'B3'], 'Transfer Volume': 10, 'Sample ID': 'C1'
+        })
+        result = order_transfers(instructions_df, 'serpentine')
+        self.assertListEqual(result['Destination Well'].tolist(), ['A1', 'A2', 'A3', 'B3', 'B2', 'B1'])
+
+    def test_estimate_run_time(self):
+        instructions_df = pd.DataFrame({
+            'Source Plate Name': ['Source[1]', 'Source[1]', 'Source[2]'], 'Source Well': ['A1', 'A1', 'B1'],
+            'Destination Well': ['A1', 'A3', 'B3'], 'Transfer Volume': [25, 5, 2], 'Sample ID': ['C1', 'C1', 'C2']
+        })
+        estimate = estimate_run_time(instructions_df, droplet_volume=2.5, droplet_rate=10, transfer_overhead=1,
+                                     well_pitch=4.5, stage_speed=9, plate_swap_time=60)
+        self.assertEqual(estimate['droplets'], 10 + 2 + 1)
+        self.assertEqual(estimate['source_plate_loads'], 2)
+        self.assertEqual(estimate['stage_travel_mm'], 13.5)
+        self.assertAlmostEqual(estimate['estimated_seconds'], 3 + 1.3 + 1.5 + 120)
+
+    def test_main_wells(self):
+        with TemporaryDirectory() as temp_dir:
+            output_file = os_path.join(temp_dir, 'instructions.csv')
+            main(self.source_plate_file, self.destination_plate_file, output_file, wells='b1,A1')
+            result = pd.read_csv(output_file)
+        self.assertSetEqual(set(result['Destination Well']), {'A1', 'B1'})
+        expected = self.expected_output_file_df[self.expected_output_file_df['Destination Well'].isin(['A1', 'B1'])]
+        self.assertEqual(len(result), len(expected))
+
     # def test_generate_echo_instructions_edge(self):
     #     empty_source_df = pd.DataFrame(columns=['Well', 'Component1', 'Component2'])
     #     empty_destination_df = pd.DataFrame(columns=['Source Plate Name', 'Source Plate Type', 'Source Well', 'Destination Plate Name', 'Destination Well', 'Transfer Volume', 'Sample ID'])
@@ -0,0 +1,75 @@
+import unittest
+import numpy as np
+from icfree.plate import (
+    Plate,
+    row_names,
+    well_names,
+    well_indices,
+    is_well_name
+)
+
+class TestPlate(unittest.TestCase):
+
+    def test_row_names(self):
+        self.assertListEqual(row_names([0, 25, 26, 31, 701, 702]).tolist(), ['A', 'Z', 'AA', 'AF', 'ZZ', 'AAA'])
+
+    def test_well_names_round_trip(self):
+        rows, cols = np.divmod(np.arange(1536), 48)
+        names = well_names(rows, cols)
+        self.assertEqual(names[0], 'A1')
+        self.assertEqual(names[-1], 'AF48')
+        decoded_rows, decoded_cols = well_indices(names)
+        np.testing.assert_array_equal(decoded_rows, rows)
+        np.testing.assert_array_equal(decoded_cols, cols)
+
+    def test_well_indices_case_insensitive(self):
+        rows, cols = well_indices(['p24', ' ab3 '])
+        self.assertListEqual(rows.tolist(), [15, 27])
+        self.assertListEqual(cols.tolist(), [23, 2])
+
+    def test_well_indices_invalid(self):
+        for name in ['', '1A', 'A', 'A0', 'A1B', 'Time']:
+            with self.assertRaises(ValueError):
+                well_indices([name])
+
+    def test_is_well_name(self):
+        mask = is_well_name(['Time', 'T° GFP35-50:485/20.528/20[2]', 'A1', 'AF48', 'A0'])
+        self.assertListEqual(mask.tolist(), [False, False, True, True, False])
+
+    def test_from_dims(self):
+        self.assertEqual(Plate.from_dims('16x24'), Plate(16, 24))
+        self.assertEqual(Plate.from_dims(1536), Plate(32, 48))
+        self.assertEqual(Plate.from_dims('96').size, 96)
+        with self.assertRaises(ValueError):
+            Plate.from_dims('100')
+
+    def test_positions_column_order(self):
+        plate = Plate(8, 12)
+        self.assertListEqual(plate.positions(4), ['A1', 'B1', 'C1', 'D1'])
+        # The starting row applies to every column
+        self.assertListEqual(plate.positions(4, 'G11'), ['G11', 'H11', 'G12', 'H12'])
+
+    def test_positions_row_order(self):
+        plate = Plate(8, 12)
+        self.assertListEqual(plate.positions(3, 'A11', 'row'), ['A11', 'A12', 'B11'])
+
+    def test_positions_multi_letter_rows(self):
+        plate = Plate.from_dims(1536)
+        self.assertListEqual(plate.positions(4, 'AE47'), ['AE47', 'AF47', 'AE48', 'AF48'])
+
+    def test_positions_capacity_error(self):
+        plate = Plate(8, 12)
+        self.assertEqual(plate.capacity('G11'), 4)
+        with self.assertRaises(ValueError):
+            plate.positions(5, 'G11')
+        with self.assertRaises(ValueError):
+            plate.positions(1, 'I1')
+
+    def test_sort_wells(self):
+        plate = Plate(16, 24)
+        names = np.array(['A2', 'B1', 'A10', 'A1'])
+        self.assertListEqual(names[plate.sort_wells(names)].tolist(), ['A1', 'B1', 'A2', 'A10'])
+        self.assertListEqual(names[plate.sort_wells(names, 'row')].tolist(), ['A1', 'A2', 'A10', 'B1'])
+
+if __name__ == '__main__':
+    unittest.main()
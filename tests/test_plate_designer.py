@@ -8,7 +8,10 @@ from icfree.plate_designer import (
     parse_args,
     prepare_destination_plate,
     prepare_source_plate,
-    write_output_files
+    write_output_files,
+    generate_well_positions,
+    prepare_destination_plates,
+    replan
 )
 
 class TestPlateDesigner(unittest.TestCase):
@@ -81,6 +84,70 @@ class TestPlateDesigner(unittest.TestCase):
         )
         self.assertEqual(result.shape[0], self.sampling_data.shape[0] * self.num_replicates)
 
+    def test_prepare_destination_plate_overflow(self):
+        with self.assertRaises(ValueError):
+            prepare_destination_plate(self.sampling_data, 'H12', self.plate_dims, self.sample_volume, self.num_replicates)
+
+    def test_prepare_destination_plates(self):
+        sampling_data = pd.DataFrame({'Component1': np.arange(500), 'Component2': np.arange(500)})
+        plates = prepare_destination_plates(sampling_data, 'A1', '16x24', 2000, 5)
+        # 2500 wells on 384-well plates
+        self.assertListEqual([len(plate) for plate in plates], [384] * 6 + [196])
+        self.assertEqual(plates[1]['Well'].iloc[0], 'A1')
+        replicated = pd.concat(plates, ignore_index=True)
+        np.testing.assert_array_equal(replicated['Component1'], np.tile(np.arange(500), 5))
+        np.testing.assert_array_equal(replicated['Water'], 2000 - 2 * replicated['Component1'])
+
+    def test_prepare_destination_plates_single_plate(self):
+        plates = prepare_destination_plates(self.sampling_data, self.start_well_dst_plt, self.plate_dims, self.sample_volume, self.num_replicates)
+        expected = prepare_destination_plate(self.sampling_data, self.start_well_dst_plt, self.plate_dims, self.sample_volume, self.num_replicates)
+        self.assertEqual(len(plates), 1)
+        pd.testing.assert_frame_equal(plates[0], expected)
+
+    def test_write_output_files_multiple_plates(self):
+        plates = prepare_destination_plates(self.sampling_data, 'A1', '2x2', self.sample_volume, self.num_replicates)
+        source_data = prepare_source_plate(
+            pd.concat(plates, ignore_index=True), self.dead_volumes_str, self.default_dead_volume,
+            self.well_capacity, self.default_well_capacity, self.start_well_src_plt, self.extra_wells
+        )
+        output_folder = Path(self.temp_dir.name)
+        write_output_files(source_data, plates, output_folder)
+        manifest = pd.read_csv(output_folder / 'destination_plates.csv')
+        self.assertListEqual(manifest['File'].tolist(), ['destination_plate_1.csv', 'destination_plate_2.csv'])
+        self.assertListEqual(manifest['Wells'].tolist(), [4, 2])
+        self.assertListEqual(pd.read_csv(output_folder / 'destination_plate_2.csv')['Well'].tolist(), ['A1', 'B1'])
+        self.assertFalse((output_folder / 'destination_plate.csv').exists())
+
+    def test_replan(self):
+        destination_data = prepare_destination_plate(self.sampling_data, 'A1', self.plate_dims, self.sample_volume, self.num_replicates)
+        source_data, replan_destination = replan(destination_data, ['e1', 'B1'], '', 10, '', 60000, 'A1')
+        self.assertListEqual(replan_destination['Well'].tolist(), ['E1', 'B1'])
+        pd.testing.assert_frame_equal(replan_destination, destination_data.iloc[[4, 1]].reset_index(drop=True))
+        # Source wells only hold the volume of the wells to redo
+        self.assertListEqual(source_data['Component1'].tolist(), [310, 0, 0])
+        self.assertListEqual(source_data['Water'].tolist(), [0, 0, 1210])
+        with self.assertRaises(ValueError):
+            replan(destination_data, ['H12'], '', 10, '', 60000, 'A1')
+
+    def test_main_replan(self):
+        from icfree.plate_designer import main
+        sampling_file_path = Path(self.temp_dir.name) / 'sampling_data.csv'
+        self.sampling_data.to_csv(sampling_file_path, index=False)
+        output_folder = Path(self.temp_dir.name)
+        main(str(sampling_file_path), 1000, plate_dims='8x12', num_replicates=2, default_dead_volume=10, output_folder=str(output_folder))
+        originals = {name: (output_folder / name).read_bytes() for name in ['destination_plate.csv', 'source_plate.csv']}
+        main(str(sampling_file_path), 1000, plate_dims='8x12', num_replicates=2, default_dead_volume=10, output_folder=str(output_folder), replan_wells='C1')
+        for name, content in originals.items():
+            self.assertEqual((output_folder / name).read_bytes(), content)
+        self.assertListEqual(pd.read_csv(output_folder / 'destination_plate_replan.csv')['Well'].tolist(), ['C1'])
+        self.assertTrue((output_folder / 'source_plate_replan.csv').exists())
+
+    def test_generate_well_positions_1536(self):
+        positions = generate_well_positions('AF1', '1536', 3)
+        self.assertListEqual(positions, ['AF1', 'AF2', 'AF3'])
+        positions = generate_well_positions('A1', '32x48', 3, 'row')
+        self.assertListEqual(positions, ['A1', 'A2', 'A3'])
+
     def test_prepare_source_plate(self):
         destination_data = prepare_destination_plate(
             self.sampling_data,
@@ -100,6 +167,25 @@ class TestPlateDesigner(unittest.TestCase):
         )
         self.assertEqual(result.shape[0], self.sampling_data.shape[0])
 
+    def test_prepare_source_plate_closed_form(self):
+        destination_data = pd.DataFrame({'Well': ['A1', 'B1'], 'C1': [30000, 30000], 'C2': [0, 0], 'C3': [10, 0]})
+        result = prepare_source_plate(destination_data, '', 10000, 'C3=20000', 30000, 'A1', 'C3=1')
+        # C1: 60000 nL over wells of 20000 usable nL, C2 takes no well, C3: one used well and one extra well
+        self.assertListEqual(result['Well'].tolist(), ['A1', 'B1', 'C1', 'D1', 'E1'])
+        self.assertListEqual(result['C1'].tolist(), [30000, 30000, 30000, 0, 0])
+        self.assertListEqual(result['C3'].tolist(), [0, 0, 0, 10010, 20000])
+        self.assertNotIn('C2', result.columns)
+        self.assertNotIn('Plate', result.columns)
+
+    def test_prepare_source_plate_multiple_plates(self):
+        destination_data = pd.DataFrame({'Well': ['A1'], 'C1': [20000], 'C2': [30000], 'C3': [50000]})
+        result = prepare_source_plate(destination_data, '', 0, '', 10000, 'A1', '', '2x2')
+        # C2 does not fit the rest of plate 1 and starts plate 2, C3 needs more than a whole
+        # plate and spills over from the rest of plate 2
+        self.assertListEqual(result['Plate'].tolist(), [1, 1, 2, 2, 2, 2, 3, 3, 3, 3])
+        by_component = {component: result.loc[result[component] > 0, 'Plate'].unique().tolist() for component in ['C1', 'C2', 'C3']}
+        self.assertDictEqual(by_component, {'C1': [1], 'C2': [2], 'C3': [2, 3]})
+
     def test_write_output_files(self):
         destination_data = prepare_destination_plate(
             self.sampling_data,
@@ -4,7 +4,17 @@ import pandas as pd
 import numpy as np
 import random
 from io import StringIO
-from icfree.sampler import generate_lhs_samples
+import tempfile
+import json
+from os import path as os_path
+from icfree.sampler import (
+    generate_lhs_samples, iter_lhs_samples, keyed_permutation, main,
+    design_score, lhs_indices, optimized_lhs_indices, parse_constraints,
+    discrete_ranges, constraint_matrix, feasible_lhs_indices,
+    encode_indices, decode_codes, grid_size, unique_indices, generate_plates,
+    least_covered_levels, snap_to_levels, fractional_factorial_indices, full_factorial_indices, describe_grid,
+    quality_report
+)
 
 class TestGenerateLHSSamples(unittest.TestCase):
 
@@ -67,5 +77,344 @@ class TestGenerateLHSSamples(unittest.TestCase):
         self.assertEqual(result.shape, (self.num_samples, 3))
         self.assertTrue((result['A'] == 5).all())
 
+    @patch("icfree.sampler.pd.read_csv")
+    def test_generate_lhs_samples_stratified(self, mock_read_csv):
+        mock_read_csv.return_value = self.components_df
+        
+        # A has 5 levels (0 to 10 by 2.5): 5 samples must hit every level exactly once
+        result = generate_lhs_samples("fake_path.csv", 5, self.step, None, None, self.seed)
+        
+        self.assertListEqual(sorted(result['A']), [0.0, 2.5, 5.0, 7.5, 10.0])
+
+    @patch("icfree.sampler.pd.read_csv")
+    def test_generate_lhs_samples_reproducible(self, mock_read_csv):
+        mock_read_csv.return_value = self.components_df
+        
+        first = generate_lhs_samples("fake_path.csv", 50, self.step, None, None, self.seed)
+        second = generate_lhs_samples("fake_path.csv", 50, self.step, None, None, self.seed)
+        
+        pd.testing.assert_frame_equal(first, second)
+
+    @patch("icfree.sampler.pd.read_csv")
+    def test_generate_lhs_samples_ratios(self, mock_read_csv):
+        mock_read_csv.return_value = self.components_df
+        
+        result = generate_lhs_samples("fake_path.csv", 20, None, [0, 0.5, 1], None, self.seed)
+        
+        self.assertTrue(result['C'].isin([0, 15, 30]).all())
+
+    @patch("icfree.sampler.pd.read_csv")
+    def test_iter_lhs_samples_matches_one_shot(self, mock_read_csv):
+        mock_read_csv.return_value = self.components_df
+        
+        one_shot = generate_lhs_samples("fake_path.csv", 103, self.step, None, None, self.seed)
+        chunks = list(iter_lhs_samples("fake_path.csv", 103, self.step, None, None, self.seed, chunk_size=10))
+        
+        self.assertEqual(len(chunks), 11)
+        pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), one_shot)
+
+    def test_keyed_permutation(self):
+        keys = np.arange(1, 7, dtype=np.uint64)
+        for size in [1, 2, 5, 97, 1000]:
+            permuted = keyed_permutation(np.arange(size), size, keys)
+            self.assertListEqual(sorted(permuted), list(range(size)))
+
+    def test_main_chunked_output_identical(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            input_file = os_path.join(temp_dir, 'components.tsv')
+            self.components_df.to_csv(input_file, sep='\t', index=False)
+            one_shot_file = os_path.join(temp_dir, 'one_shot.csv')
+            chunked_file = os_path.join(temp_dir, 'chunked.csv')
+            main(input_file, one_shot_file, 250, self.step, seed=self.seed)
+            main(input_file, chunked_file, 250, self.step, seed=self.seed, chunk_size=64)
+            with open(one_shot_file, 'rb') as f1, open(chunked_file, 'rb') as f2:
+                self.assertEqual(f1.read(), f2.read())
+
+    def test_optimized_lhs_indices_maximin(self):
+        level_counts = [5, 9, 13]
+        best = optimized_lhs_indices(level_counts, 40, self.seed, 'maximin', iterations=20, n_jobs=1)
+        candidates = [
+            design_score(lhs_indices(level_counts, 40, np.random.default_rng(seed_sequence)), level_counts, 'maximin')
+            for seed_sequence in np.random.SeedSequence(self.seed).spawn(20)
+        ]
+        self.assertEqual(design_score(best, level_counts, 'maximin'), max(candidates))
+
+    def test_optimized_lhs_indices_maximin_ties(self):
+        # Every candidate repeats samples on this coarse grid: the fewest repeats win
+        level_counts = [5] * 5
+        seed_sequences = np.random.SeedSequence(self.seed).spawn(20)
+        candidates = [design_score(lhs_indices(level_counts, 384, np.random.default_rng(seed_sequence)), level_counts, 'maximin')
+                      for seed_sequence in seed_sequences]
+        self.assertTrue(all(score[0] == 0.0 for score in candidates))
+        self.assertGreater(len(set(candidates)), 1)
+        best = optimized_lhs_indices(level_counts, 384, self.seed, 'maximin', iterations=20, n_jobs=1)
+        self.assertEqual(design_score(best, level_counts, 'maximin'), max(candidates))
+        self.assertGreater(design_score(best, level_counts, 'maximin'), candidates[0])
+
+    def test_optimized_lhs_indices_independent_of_jobs(self):
+        level_counts = [5, 9, 13]
+        serial = optimized_lhs_indices(level_counts, 40, self.seed, 'correlation', iterations=8, n_jobs=1)
+        parallel = optimized_lhs_indices(level_counts, 40, self.seed, 'correlation', iterations=8, n_jobs=2)
+        np.testing.assert_array_equal(serial, parallel)
+
+    def test_design_score_invalid_criterion(self):
+        with self.assertRaises(ValueError):
+            design_score(np.zeros((4, 2), dtype=int), [3, 3], 'unknown')
+
+    @patch("icfree.sampler.pd.read_csv")
+    def test_generate_lhs_samples_max_total_volume(self, mock_read_csv):
+        mock_read_csv.return_value = self.components_df
+        
+        result = generate_lhs_samples("fake_path.csv", 200, self.step, None, None, self.seed, max_total_volume=30)
+        
+        self.assertEqual(result.shape, (200, 3))
+        self.assertTrue((result.sum(axis=1) <= 30).all())
+        self.assertTrue(0 < result.attrs['acceptance_rate'] < 1)
+
+    def test_feasible_lhs_indices_direct_sampling(self):
+        ranges = discrete_ranges(self.components_df, self.step)
+        A, b = constraint_matrix(self.components_df['Component'], 10, parse_constraints("B=1,C=1<=5;A=-1,B=1<=0"))
+        
+        # Force samples to be built directly inside the feasible region
+        indices, _ = feasible_lhs_indices(ranges, 500, np.random.default_rng(self.seed), A, b, min_acceptance_rate=1.1)
+        values = np.column_stack([r[indices[:, j]] for j, r in enumerate(ranges)])
+        
+        self.assertEqual(values.shape, (500, 3))
+        self.assertTrue((values @ A.T <= b).all())
+
+    @patch("icfree.sampler.pd.read_csv")
+    def test_generate_lhs_samples_infeasible_constraints(self, mock_read_csv):
+        mock_read_csv.return_value = self.components_df
+        
+        with self.assertRaises(ValueError):
+            generate_lhs_samples("fake_path.csv", 10, self.step, None, {'A': 5}, self.seed, max_total_volume=2)
+
+    def test_parse_constraints(self):
+        self.assertEqual(
+            parse_constraints("A=1,B=2<=100;C=-1<=0"),
+            [({'A': 1.0, 'B': 2.0}, 100.0), ({'C': -1.0}, 0.0)]
+        )
+        self.assertEqual(parse_constraints(None), [])
+
+    @patch("icfree.sampler.pd.read_csv")
+    def test_generate_lhs_samples_sobol_extension(self, mock_read_csv):
+        mock_read_csv.return_value = self.components_df
+        
+        full = generate_lhs_samples("fake_path.csv", 64, self.step, None, None, self.seed, method='sobol')
+        first = generate_lhs_samples("fake_path.csv", 40, self.step, None, None, self.seed, method='sobol')
+        top_up = generate_lhs_samples("fake_path.csv", 24, self.step, None, None, self.seed, method='sobol', skip=40)
+        
+        pd.testing.assert_frame_equal(pd.concat([first, top_up], ignore_index=True), full)
+        self.assertTrue(full['A'].isin([0.0, 2.5, 5.0, 7.5, 10.0]).all())
+
+    @patch("icfree.sampler.pd.read_csv")
+    def test_generate_lhs_samples_halton_fixed_value(self, mock_read_csv):
+        mock_read_csv.return_value = self.components_df
+        
+        result = generate_lhs_samples("fake_path.csv", 30, self.step, None, {'B': 5}, self.seed, method='halton')
+        chunks = list(iter_lhs_samples("fake_path.csv", 30, self.step, None, {'B': 5}, self.seed, 7, method='halton'))
+        
+        self.assertTrue((result['B'] == 5).all())
+        pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), result)
+
+    @patch("icfree.sampler.pd.read_csv")
+    def test_generate_lhs_samples_invalid_method(self, mock_read_csv):
+        mock_read_csv.return_value = self.components_df
+        
+        with self.assertRaises(ValueError):
+            generate_lhs_samples("fake_path.csv", 10, self.step, None, None, self.seed, method='grid')
+
+    def test_encode_decode_codes(self):
+        level_counts = [5, 1, 9, 13]
+        indices = np.random.default_rng(self.seed).integers(0, level_counts, size=(100, 4))
+        codes = encode_indices(indices, level_counts)
+        self.assertTrue(((codes >= 0) & (codes < grid_size(level_counts))).all())
+        np.testing.assert_array_equal(decode_codes(codes, level_counts), indices)
+        with self.assertRaises(ValueError):
+            encode_indices(indices[:, :2], [2**40, 2**40])
+
+    def test_unique_indices_large_grid(self):
+        # Grids beyond 64-bit codes fall back to comparing raw rows
+        level_counts = [2**40, 2**40]
+        indices = np.array([[1, 2], [1, 2], [3, 4]])
+        result = unique_indices(indices, level_counts, 3, lambda k: np.array([[3, 4], [5, 6]]))
+        np.testing.assert_array_equal(result, [[1, 2], [3, 4], [5, 6]])
+
+    @patch("icfree.sampler.pd.read_csv")
+    def test_generate_lhs_samples_unique(self, mock_read_csv):
+        mock_read_csv.return_value = self.components_df
+        
+        # 5 x 9 x 13 = 585 grid points: 500 samples almost exhaust the grid
+        result = generate_lhs_samples("fake_path.csv", 500, self.step, None, None, self.seed, unique=True)
+        
+        self.assertEqual(len(result), 500)
+        self.assertFalse(result.duplicated().any())
+        with self.assertRaises(ValueError):
+            generate_lhs_samples("fake_path.csv", 600, self.step, None, None, self.seed, unique=True)
+
+    @patch("icfree.sampler.pd.read_csv")
+    def test_generate_lhs_samples_unique_with_constraints(self, mock_read_csv):
+        mock_read_csv.return_value = self.components_df
+        
+        result = generate_lhs_samples("fake_path.csv", 60, self.step, None, None, self.seed,
+                                      max_total_volume=20, unique=True)
+        
+        self.assertFalse(result.duplicated().any())
+        self.assertTrue((result.sum(axis=1) <= 20).all())
+
+    def test_generate_plates(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            input_file = os_path.join(temp_dir, 'components.tsv')
+            self.components_df.to_csv(input_file, sep='\t', index=False)
+            serial = generate_plates(input_file, os_path.join(temp_dir, 'serial.csv'), 3, 20, self.step,
+                                     seed=self.seed, n_jobs=1)
+            parallel = generate_plates(input_file, os_path.join(temp_dir, 'parallel.csv'), 3, 20, self.step,
+                                       seed=self.seed, n_jobs=2, unique=True)
+            self.assertEqual([os_path.basename(f) for f in serial], ['serial_plate1.csv', 'serial_plate2.csv', 'serial_plate3.csv'])
+            serial_plates = [pd.read_csv(f) for f in serial]
+            parallel_plates = [pd.read_csv(f) for f in parallel]
+            for serial_plate, parallel_plate in zip(serial_plates, parallel_plates):
+                # These designs have no duplicates, so unique=True leaves them untouched
+                pd.testing.assert_frame_equal(serial_plate, parallel_plate)
+            self.assertFalse(serial_plates[0].equals(serial_plates[1]))
+
+    def test_least_covered_levels(self):
+        counts = np.array([5, 0, 2, 7, 2])
+        new_levels = least_covered_levels(counts, 6, np.random.default_rng(self.seed))
+        self.assertEqual(len(new_levels), 6)
+        self.assertListEqual(sorted(counts + np.bincount(new_levels, minlength=5)), [3, 3, 4, 5, 7])
+
+    def test_snap_to_levels(self):
+        levels = np.array([0.0, 10.0, 5.0])
+        np.testing.assert_array_equal(snap_to_levels(np.array([0.0, 4.0, 6.0, 12.0, -1.0]), levels), [0, 2, 2, 1, 0])
+
+    def test_main_augment(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            input_file = os_path.join(temp_dir, 'components.tsv')
+            self.components_df.to_csv(input_file, sep='\t', index=False)
+            sampling_file = os_path.join(temp_dir, 'sampling.csv')
+            main(input_file, sampling_file, 3, self.step, seed=self.seed)
+            with open(sampling_file, 'rb') as f:
+                existing = f.read()
+            main(input_file, sampling_file, 7, self.step, seed=self.seed, augment=True)
+            with open(sampling_file, 'rb') as f:
+                augmented = f.read()
+            self.assertTrue(augmented.startswith(existing))
+            result = pd.read_csv(sampling_file)
+            self.assertEqual(len(result), 10)
+            # A has 5 levels: 10 samples cover each of them twice
+            self.assertListEqual(result['A'].value_counts().tolist(), [2] * 5)
+
+    def test_main_augment_constraints(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            input_file = os_path.join(temp_dir, 'components.tsv')
+            pd.read_csv(os_path.join(os_path.dirname(__file__), 'data', 'sampler', 'input', 'components.tsv'), sep='\t') \
+                .to_csv(input_file, sep='\t', index=False)
+            sampling_file = os_path.join(temp_dir, 'sampling.csv')
+            main(input_file, sampling_file, 50, 10, seed=self.seed, max_total_volume=600)
+            main(input_file, sampling_file, 200, 10, seed=self.seed, augment=True, max_total_volume=600, unique=True)
+            result = pd.read_csv(sampling_file)
+            self.assertEqual(len(result), 250)
+            # Every appended sample is within the budget and new
+            self.assertTrue((result.iloc[50:].sum(axis=1) <= 600 + 1e-9).all())
+            self.assertFalse(result.iloc[50:].merge(result.iloc[:50].drop_duplicates()).shape[0])
+            self.assertFalse(result.iloc[50:].duplicated().any())
+            with self.assertRaisesRegex(ValueError, "Augmenting"):
+                main(input_file, sampling_file, 10, 10, augment=True, criterion='maximin')
+
+    @patch("icfree.sampler.pd.read_csv")
+    def test_generate_lhs_samples_full_factorial(self, mock_read_csv):
+        mock_read_csv.return_value = self.components_df
+        
+        result = generate_lhs_samples("fake_path.csv", 0, self.step, None, None, method='full_factorial')
+        chunks = list(iter_lhs_samples("fake_path.csv", 0, self.step, None, None, chunk_size=100, method='full_factorial'))
+        
+        # 5 x 9 x 13 grid points, all distinct
+        self.assertEqual(result.shape, (585, 3))
+        self.assertFalse(result.duplicated().any())
+        pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), result)
+
+    @patch("icfree.sampler.pd.read_csv")
+    def test_generate_lhs_samples_factorial_with_constraints(self, mock_read_csv):
+        mock_read_csv.return_value = self.components_df
+        
+        result = generate_lhs_samples("fake_path.csv", 0, self.step, None, None, method='full_factorial',
+                                      max_total_volume=5)
+        
+        # Index sums of at most 2 in a 3-component grid
+        self.assertEqual(len(result), 10)
+        self.assertAlmostEqual(result.attrs['acceptance_rate'], 10 / 585)
+
+    def test_fractional_factorial_indices(self):
+        indices = fractional_factorial_indices([3, 3, 3, 3], 3)
+        self.assertEqual(len(indices), 27)
+        self.assertTrue((indices.sum(axis=1) % 3 == 0).all())
+        for j in range(4):
+            self.assertListEqual(np.bincount(indices[:, j]).tolist(), [9, 9, 9])
+        # No level count divisible by the fraction: points of even index sum, about half of the grid
+        indices = fractional_factorial_indices([3, 5], 2)
+        self.assertEqual(len(indices), 8)
+        self.assertTrue((indices.sum(axis=1) % 2 == 0).all())
+        self.assertEqual(len(np.unique(indices, axis=0)), 8)
+
+    def test_describe_grid_fraction(self):
+        self.assertEqual(
+            describe_grid(self.components_df, self.step, fraction=2),
+            "Grid of 5 x 9 x 13 levels: 1/2 of factorial design of 293 rows (7.0 kB)"
+        )
+        self.assertEqual(len(fractional_factorial_indices([5, 9, 13], 2)), 293)
+
+    def test_full_factorial_indices_too_large(self):
+        with self.assertRaises(ValueError):
+            full_factorial_indices([10] * 8)
+
+    def test_describe_grid(self):
+        self.assertEqual(
+            describe_grid(self.components_df, self.step),
+            "Grid of 5 x 9 x 13 levels: factorial design of 585 rows (14.0 kB)"
+        )
+
+    def test_quality_report(self):
+        ranges = discrete_ranges(self.components_df, self.step)
+        samples_df = pd.DataFrame({'A': [0.0, 0.0, 10.0, 5.1], 'B': [0.0, 0.0, 20.0, 10.0], 'C': [0.0, 0.0, 30.0, 15.0]})
+        report = quality_report(samples_df, ranges, ['A', 'B', 'C'])
+        
+        self.assertEqual(report['num_samples'], 4)
+        self.assertEqual(report['num_duplicates'], 1)
+        # Duplicates do not zero the nearest-neighbour distance
+        self.assertGreater(report['min_distance'], 0)
+        self.assertGreaterEqual(report['mean_distance'], report['min_distance'])
+        self.assertListEqual(report['coverage']['A']['counts'], [2, 0, 1, 0, 1])
+        self.assertEqual(report['coverage']['A']['levels_covered'], 3)
+        self.assertEqual(report['discrepancy_sample_size'], 4)
+        self.assertGreater(report['centered_l2_discrepancy'], 0)
+
+    @patch("icfree.sampler.pd.read_csv")
+    def test_quality_report_discrepancy_subset(self, mock_read_csv):
+        mock_read_csv.return_value = self.components_df
+        ranges = discrete_ranges(self.components_df, self.step)
+        samples_df = generate_lhs_samples("fake_path.csv", 0, self.step, None, None, method='full_factorial')
+        
+        full = quality_report(samples_df, ranges, ['A', 'B', 'C'])
+        estimate = quality_report(samples_df, ranges, ['A', 'B', 'C'], max_discrepancy_rows=200)
+        
+        self.assertEqual(full['discrepancy_sample_size'], 585)
+        self.assertEqual(estimate['discrepancy_sample_size'], 200)
+        # The full factorial design has every level equally covered and no duplicate
+        self.assertEqual(full['num_duplicates'], 0)
+        self.assertListEqual(full['coverage']['A']['counts'], [117] * 5)
+
+    def test_main_report(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            input_file = os_path.join(temp_dir, 'components.tsv')
+            self.components_df.to_csv(input_file, sep='\t', index=False)
+            sampling_file = os_path.join(temp_dir, 'sampling.csv')
+            report_file = os_path.join(temp_dir, 'report.json')
+            main(input_file, sampling_file, 10, self.step, seed=self.seed, report=report_file)
+            with open(report_file) as f:
+                report = json.load(f)
+            self.assertEqual(report['num_samples'], 10)
+            self.assertSetEqual(set(report['coverage']), {'A', 'B', 'C'})
+
 if __name__ == "__main__":
     unittest.main()